@@ -0,0 +1,348 @@
+# /backtest_engine.py
+import numpy as np
+import pandas as pd
+
+# Motor vectorizado de la estrategia V4: indicadores, señales candidatas y resolución
+# de salidas por SL/TP sin recorrer el DataFrame fila a fila.
+
+FEATURE_COLUMNS = ['rsi', 'macd_hist', 'adx', 'atr_normalized']
+
+# Tamaño máximo (en celdas) de las matrices de búsqueda, para acotar la memoria
+MAX_SEARCH_CELLS = 1 << 22
+
+
+def add_v4_indicators(df, rsi_period, macd_fast, macd_slow, macd_signal, adx_period, atr_period):
+    """Añade al DataFrame las columnas de indicadores de la V4 (mismos cálculos que los backtesters)."""
+    ema_fast = df['close'].ewm(span=macd_fast, adjust=False).mean()
+    ema_slow = df['close'].ewm(span=macd_slow, adjust=False).mean()
+    df['macd_hist'] = (ema_fast - ema_slow) - (ema_fast - ema_slow).ewm(span=macd_signal, adjust=False).mean()
+    df['macd_hist_prev'] = df['macd_hist'].shift(1)
+    delta = df['close'].diff(1)
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.ewm(span=rsi_period, adjust=False).mean()
+    avg_loss = loss.ewm(span=rsi_period, adjust=False).mean()
+    df['rsi'] = 100 - (100 / (1 + avg_gain / avg_loss))
+    high_low = df['high'] - df['low']
+    high_prev_close = abs(df['high'] - df['close'].shift())
+    low_prev_close = abs(df['low'] - df['close'].shift())
+    tr = pd.concat([high_low, high_prev_close, low_prev_close], axis=1).max(axis=1)
+    df['atr'] = tr.ewm(span=atr_period, adjust=False).mean()
+    df['atr_normalized'] = df['atr'] / df['close']
+    plus_dm = df['high'].diff()
+    minus_dm = df['low'].diff()
+    plus_dm[plus_dm < 0] = 0
+    minus_dm[minus_dm > 0] = 0
+    tr_adx = pd.DataFrame({'tr': tr, 'plus_dm': plus_dm, 'minus_dm': abs(minus_dm)})
+    atr_adx = tr_adx['tr'].ewm(span=adx_period, adjust=False).mean()
+    plus_di = 100 * (tr_adx['plus_dm'].ewm(span=adx_period, adjust=False).mean() / atr_adx)
+    minus_di = 100 * (tr_adx['minus_dm'].ewm(span=adx_period, adjust=False).mean() / atr_adx)
+    dx = 100 * (abs(plus_di - minus_di) / (plus_di + minus_di))
+    df['adx'] = dx.ewm(span=adx_period, adjust=False).mean()
+    return df
+
+
+def sma_atr(high, low, close, period):
+    """
+    ATR como lo calcula el bot para el trailing stop (indicators.get_atr): media simple de los
+    últimos `period` rangos verdaderos, no la EWM de add_v4_indicators. NaN en las primeras barras.
+    """
+    prev_close = np.r_[np.nan, close[:-1]]
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return pd.Series(tr).rolling(period).mean().to_numpy()
+
+
+def v4_candidates(df, adx_threshold, rsi_buy_threshold=50, rsi_sell_threshold=50):
+    """Máscaras booleanas (buy, sell) de las barras con señal candidata V4."""
+    adx = df['adx'].to_numpy()
+    hist = df['macd_hist'].to_numpy()
+    hist_prev = df['macd_hist_prev'].to_numpy()
+    rsi = df['rsi'].to_numpy()
+    trend = adx > adx_threshold
+    buy = trend & (hist > 0) & (hist_prev < 0) & (rsi > rsi_buy_threshold)
+    sell = trend & (hist < 0) & (hist_prev > 0) & (rsi < rsi_sell_threshold)
+    return buy, sell
+
+
+def first_hit(values, start, level, above, window=64):
+    """
+    Para cada entrada, índice de la primera barra >= start[k] en la que `values` alcanza
+    level[k] (>= si above[k], <= si no). Devuelve len(values) si nunca lo alcanza.
+    Busca por ventanas que se duplican, así que el coste es proporcional a la duración real.
+    """
+    values = np.asarray(values)
+    n = len(values)
+    start = np.asarray(start, dtype=np.int64)
+    level = np.asarray(level, dtype=float)
+    above = np.broadcast_to(np.asarray(above, dtype=bool), start.shape)
+    result = np.full(len(start), n, dtype=np.int64)
+    pending = np.flatnonzero(start < n)
+    offset = 0
+    while pending.size:
+        window = min(window, max(n, 1))
+        rows = max(1, MAX_SEARCH_CELLS // window)
+        still_pending = []
+        for chunk_start in range(0, pending.size, rows):
+            p = pending[chunk_start:chunk_start + rows]
+            idx = start[p, None] + offset + np.arange(window)
+            valid = idx < n
+            vals = values[np.minimum(idx, n - 1)]
+            lvl = level[p, None]
+            hit = np.where(above[p, None], vals >= lvl, vals <= lvl) & valid
+            any_hit = hit.any(axis=1)
+            result[p[any_hit]] = idx[any_hit, hit[any_hit].argmax(axis=1)]
+            still_pending.append(p[~any_hit & valid[:, -1]])
+        pending = np.concatenate(still_pending)
+        offset += window
+        window *= 2
+    return result
+
+
+def intrabar_tp_first(intrabar, bar_times, is_buy, sl, tp, default_tp=False):
+    """
+    Para trades cuyo SL y TP se tocan en la misma vela, decide con las velas finas de
+    `intrabar` (bar_store.IntrabarStore) cuál se tocó antes. Si tampoco las velas finas lo
+    distinguen (mismo minuto o sin datos), se usa `default_tp`. Devuelve True donde gana el TP.
+    """
+    if not len(bar_times):
+        return np.zeros(0, dtype=bool)
+    high, low, valid = intrabar.slices(bar_times)
+    d = np.where(np.asarray(is_buy, dtype=bool), 1.0, -1.0)[:, None]
+    adverse = np.where(d > 0, low, -high)
+    favorable = np.where(d > 0, high, -low)
+    sl_hit = (adverse <= d * np.asarray(sl, dtype=float)[:, None]) & valid
+    tp_hit = (favorable >= d * np.asarray(tp, dtype=float)[:, None]) & valid
+    width = high.shape[1]
+    first_sl = np.where(sl_hit.any(axis=1), sl_hit.argmax(axis=1), width)
+    first_tp = np.where(tp_hit.any(axis=1), tp_hit.argmax(axis=1), width)
+    intrabar.resolved += int((first_tp != first_sl).sum())
+    return np.where(first_tp != first_sl, first_tp < first_sl, default_tp)
+
+
+def resolve_exits(high, low, entry_idx, is_buy, sl, tp, tie_break='sl', intrabar=None, times=None):
+    """
+    Resuelve la salida de cada entrada buscando el primer toque de SL o TP a partir de la
+    barra siguiente. Si ambos se tocan en la misma barra, `tie_break` decide ('sl' o 'tp'),
+    salvo que se pase `intrabar` (con `times` de las barras en segundos): entonces solo esas
+    barras ambiguas se resuelven con sus velas M1 (intrabar_tp_first).
+    Devuelve (exit_idx, hit_tp, exit_price); exit_idx == len(high) si el trade no se cierra.
+    """
+    n = len(high)
+    is_buy = np.asarray(is_buy, dtype=bool)
+    start = np.asarray(entry_idx, dtype=np.int64) + 1
+    tp_idx = np.full(len(start), n, dtype=np.int64)
+    sl_idx = np.full(len(start), n, dtype=np.int64)
+    for side, tp_series, sl_series, long_side in ((is_buy, high, low, True), (~is_buy, low, high, False)):
+        if not side.any():
+            continue
+        tp_idx[side] = first_hit(tp_series, start[side], tp[side], above=long_side)
+        sl_idx[side] = first_hit(sl_series, start[side], sl[side], above=not long_side)
+    exit_idx = np.minimum(tp_idx, sl_idx)
+    if tie_break == 'tp':
+        hit_tp = (tp_idx <= sl_idx) & (tp_idx < n)
+    else:
+        hit_tp = tp_idx < sl_idx
+    if intrabar is not None:
+        tie = np.flatnonzero((tp_idx == sl_idx) & (tp_idx < n))
+        hit_tp[tie] = intrabar_tp_first(intrabar, times[exit_idx[tie]], is_buy[tie], sl[tie], tp[tie],
+                                        tie_break == 'tp')
+    exit_price = np.where(hit_tp, tp, sl)
+    return exit_idx, hit_tp, exit_price
+
+
+def resolve_exits_trailing(high, low, close, atr, entry_idx, is_buy, entry_price, sl, tp,
+                           trail_distance, min_profit, tie_break='sl', window=64, intrabar=None, times=None):
+    """
+    Como resolve_exits, pero con la regla del trailing stop del bot (manage_trailing_stops): al
+    cierre de cada barra desde la de entrada, si el precio lleva >= min_profit * ATR a favor, el SL
+    pasa a close -/+ trail_distance * ATR cuando eso lo mejora, y rige desde la barra siguiente.
+    `atr` debe ser el del bot (sma_atr). Es una aproximación: el bot evalúa la regla con cada tick
+    (bid para compras, ask para ventas) una vez por ciclo; aquí, con el cierre de cada barra y sin
+    spread, así que no ve los SL que el precio habría movido y devuelto dentro de la barra.
+    Una barra con ATR NaN (sin historia suficiente) no mueve el SL, como get_atr sin datos.
+    El SL vigente es el máximo acumulado (np.maximum.accumulate) de los candidatos, por ventanas
+    que se duplican; el SL alcanzado al final de una ventana se arrastra a la siguiente.
+    Las ventas se tratan como compras con los precios cambiados de signo. Con `intrabar`, las
+    barras que tocan el SL vigente y el TP se resuelven con sus velas M1 como en resolve_exits.
+    Devuelve (exit_idx, hit_tp, exit_price); exit_idx == len(high) si el trade no se cierra.
+    """
+    n = len(high)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    direction = np.where(np.asarray(is_buy, dtype=bool), 1.0, -1.0)
+    entry_price = np.asarray(entry_price, dtype=float)
+    tp = np.asarray(tp, dtype=float)
+    stop = direction * np.asarray(sl, dtype=float)  # SL vigente (con signo), arrastrado entre ventanas
+    target = direction * tp
+    exit_idx = np.full(len(entry_idx), n, dtype=np.int64)
+    hit_tp = np.zeros(len(entry_idx), dtype=bool)
+    exit_price = np.full(len(entry_idx), np.nan)
+    pending = np.flatnonzero(entry_idx + 1 < n)
+    offset = 0
+    while pending.size:
+        window = min(window, max(n, 1))
+        rows = max(1, MAX_SEARCH_CELLS // window)
+        still_pending = []
+        for chunk_start in range(0, pending.size, rows):
+            p = pending[chunk_start:chunk_start + rows]
+            # Columna j: el cierre de la barra idx decide el SL con el que se evalúa la barra idx + 1
+            idx = entry_idx[p, None] + offset + np.arange(window)
+            bar = idx + 1
+            valid = bar < n
+            idx, bar = np.minimum(idx, n - 1), np.minimum(bar, n - 1)
+            d = direction[p, None]
+            level = d * close[idx]
+            bar_atr = atr[idx]
+            candidate = np.where(level - d * entry_price[p, None] >= min_profit * bar_atr,
+                                 level - trail_distance * bar_atr, -np.inf)
+            effective = np.maximum(np.maximum.accumulate(candidate, axis=1), stop[p, None])
+            adverse = np.where(d > 0, low[bar], -high[bar])
+            favorable = np.where(d > 0, high[bar], -low[bar])
+            sl_hit = (adverse <= effective) & valid
+            tp_hit = (favorable >= target[p, None]) & valid
+            any_hit = (sl_hit | tp_hit).any(axis=1)
+            rows_hit = np.flatnonzero(any_hit)
+            col = (sl_hit | tp_hit)[rows_hit].argmax(axis=1)
+            take_tp = tp_hit[rows_hit, col] & (~sl_hit[rows_hit, col] | (tie_break == 'tp'))
+            done = p[rows_hit]
+            if intrabar is not None:
+                tie = np.flatnonzero(tp_hit[rows_hit, col] & sl_hit[rows_hit, col])
+                take_tp[tie] = intrabar_tp_first(
+                    intrabar, times[bar[rows_hit[tie], col[tie]]], direction[done[tie]] > 0,
+                    direction[done[tie]] * effective[rows_hit[tie], col[tie]], tp[done[tie]], tie_break == 'tp')
+            exit_idx[done] = bar[rows_hit, col]
+            hit_tp[done] = take_tp
+            exit_price[done] = np.where(take_tp, tp[done], direction[done] * effective[rows_hit, col])
+            stop[p] = effective[:, -1]
+            still_pending.append(p[~any_hit & valid[:, -1]])
+        pending = np.concatenate(still_pending)
+        offset += window
+        window *= 2
+    return exit_idx, hit_tp, exit_price
+
+
+def select_sequential(entry_idx, exit_idx, reentry_on_exit_bar=False):
+    """
+    Aplica la regla de una sola posición a la vez: recorre solo los trades tomados,
+    saltando con searchsorted a la primera candidata libre tras cada salida.
+    Devuelve las posiciones (en los arrays de candidatas) de los trades abiertos.
+    """
+    shift = 0 if reentry_on_exit_bar else 1
+    selected = []
+    pos = 0
+    while pos < len(entry_idx):
+        selected.append(pos)
+        pos = int(np.searchsorted(entry_idx, exit_idx[pos] + shift, side='left'))
+    return np.asarray(selected, dtype=np.int64)
+
+
+def _resolve(df, entry_idx, is_buy, entry_price, sl, tp, tie_break, trailing, intrabar):
+    high, low = df['high'].to_numpy(), df['low'].to_numpy()
+    times = None
+    if intrabar is not None:
+        times = df['time'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    if trailing is None:
+        return resolve_exits(high, low, entry_idx, is_buy, sl, tp, tie_break, intrabar, times)
+    trail_distance, min_profit, atr_period = trailing
+    close = df['close'].to_numpy()
+    return resolve_exits_trailing(high, low, close, sma_atr(high, low, close, atr_period), entry_idx, is_buy,
+                                  entry_price, sl, tp, trail_distance, min_profit, tie_break,
+                                  intrabar=intrabar, times=times)
+
+
+def simulate_v4_trades(df, adx_threshold, sl_mult, tp_mult, accept=None,
+                       tie_break='sl', reentry_on_exit_bar=False, trailing=None, intrabar=None):
+    """
+    Simula la V4 (entrada al open de la barra de señal, SL/TP por ATR) de forma vectorizada.
+    `accept` es una máscara opcional por barra (p. ej. el filtro ML) que descarta candidatas.
+    `trailing` = (TRAILING_STOP_DISTANCE_ATR, MIN_PROFIT_TO_TRAIL_ATR, ATR_PERIOD) activa la regla
+    del trailing stop del bot (con su ATR de media simple, sma_atr; ver resolve_exits_trailing);
+    entonces is_winner indica si el trade cerró con beneficio (no solo si tocó el TP).
+    `intrabar` (bar_store.IntrabarStore) resuelve con velas M1 las barras que tocan SL y TP;
+    `tie_break` queda para cuando ni las M1 lo deciden.
+    Devuelve un DataFrame con un trade cerrado por fila, en el orden en que se abrieron.
+    """
+    buy, sell = v4_candidates(df, adx_threshold)
+    candidate = buy | sell
+    if accept is not None:
+        candidate &= np.asarray(accept, dtype=bool)
+    entry_idx = np.flatnonzero(candidate)
+    is_buy = buy[entry_idx]
+    direction = np.where(is_buy, 1.0, -1.0)
+    entry_price = df['open'].to_numpy()[entry_idx]
+    atr = df['atr'].to_numpy()[entry_idx]
+    sl = entry_price - direction * atr * sl_mult
+    tp = entry_price + direction * atr * tp_mult
+
+    exit_idx, hit_tp, exit_price = _resolve(df, entry_idx, is_buy, entry_price, sl, tp, tie_break, trailing, intrabar)
+    taken = select_sequential(entry_idx, exit_idx, reentry_on_exit_bar)
+    # Un trade que sigue abierto al final de los datos no cuenta (igual que en los backtesters)
+    taken = taken[exit_idx[taken] < len(df)]
+
+    times = df['time'].to_numpy()
+    return pd.DataFrame({
+        'entry_idx': entry_idx[taken],
+        'exit_idx': exit_idx[taken],
+        'type': np.where(is_buy[taken], 'BUY', 'SELL'),
+        'entry_price': entry_price[taken],
+        'sl': sl[taken],
+        'tp': tp[taken],
+        'exit_price': exit_price[taken],
+        'is_winner': (hit_tp[taken] if trailing is None else
+                      (exit_price[taken] - entry_price[taken]) * direction[taken] > 0).astype(int),
+        'entry_time': times[entry_idx[taken]],
+        'exit_time': times[exit_idx[taken]],
+    })
+
+
+def sweep_thresholds(df, confidence, thresholds, adx_threshold, sl_mult, tp_mult,
+                     tie_break='sl', reentry_on_exit_bar=False, trailing=None, intrabar=None):
+    """
+    Evalúa un vector de umbrales de confianza del filtro ML en una sola pasada.
+    `confidence` trae, por barra, la probabilidad de ganar que dio el modelo (NaN si la barra
+    no es candidata). Las salidas de todas las candidatas se resuelven una vez; después se
+    recorren las candidatas en orden manteniendo, para cada umbral a la vez, hasta qué barra
+    está ocupado (una posición a la vez). Devuelve una tabla con una fila por umbral.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    buy, sell = v4_candidates(df, adx_threshold)
+    entry_idx = np.flatnonzero(buy | sell)
+    is_buy = buy[entry_idx]
+    direction = np.where(is_buy, 1.0, -1.0)
+    entry_price = df['open'].to_numpy()[entry_idx]
+    atr = df['atr'].to_numpy()[entry_idx]
+    sl = entry_price - direction * atr * sl_mult
+    tp = entry_price + direction * atr * tp_mult
+    exit_idx, _, exit_price = _resolve(df, entry_idx, is_buy, entry_price, sl, tp, tie_break, trailing, intrabar)
+    profit = (exit_price - entry_price) * direction
+    resolved = exit_idx < len(df)
+    conf = np.asarray(confidence, dtype=float)[entry_idx]
+
+    shift = 0 if reentry_on_exit_bar else 1
+    free_from = np.zeros(len(thresholds), dtype=np.int64)
+    trades = np.zeros(len(thresholds), dtype=np.int64)
+    wins = np.zeros(len(thresholds), dtype=np.int64)
+    gross_profit = np.zeros(len(thresholds))
+    gross_loss = np.zeros(len(thresholds))
+    for k in range(len(entry_idx)):
+        take = (conf[k] >= thresholds) & (entry_idx[k] >= free_from)
+        if not take.any():
+            continue
+        free_from[take] = exit_idx[k] + shift
+        if resolved[k]:
+            trades += take
+            if profit[k] > 0:
+                wins += take
+                gross_profit += take * profit[k]
+            else:
+                gross_loss += take * -profit[k]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(trades > 0, wins / trades * 100, 0.0)
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, np.inf)
+    return pd.DataFrame({
+        'threshold': thresholds,
+        'trades': trades,
+        'win_rate': win_rate,
+        'profit_factor': profit_factor,
+        'net_profit': gross_profit - gross_loss,
+    })
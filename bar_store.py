@@ -0,0 +1,125 @@
+# /bar_store.py
+import os
+
+import numpy as np
+import pandas as pd
+
+import config as cfg
+
+# Velas locales en formato .npy (array estructurado BAR_DTYPE, tiempo en segundos UNIX) para
+# abrirlas con np.load(mmap_mode='r'). Los procesos de un backtest en paralelo leen así las
+# mismas páginas del archivo (caché del sistema) en lugar de parsear y copiar cada uno el CSV;
+# to_frame las envuelve en un DataFrame sin copiarlas.
+# El .npy se regenera automáticamente cuando el CSV de origen es más reciente.
+# IntrabarStore da, para cada vela gruesa (M5), las velas finas (M1) que contiene.
+
+TIMEFRAME_SECONDS = {'M1': 60, 'M5': 300, 'M15': 900, 'M30': 1800, 'H1': 3600, 'H4': 14400, 'D1': 86400}
+
+BAR_DTYPE = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                      ('tick_volume', '<i8')])
+
+
+def csv_path(symbol, timeframe='M5', data_dir=None):
+    return os.path.join(data_dir or cfg.BAR_DATA_DIR, cfg.BAR_DATA_FILE_PATTERN.format(symbol=symbol, timeframe=timeframe))
+
+
+def store_path(symbol, timeframe='M5', store_dir=None):
+    return os.path.join(store_dir or cfg.BAR_STORE_DIR, f"{symbol}_{timeframe}.npy")
+
+
+def build(symbol, timeframe='M5', data_dir=None, store_dir=None):
+    """Convierte el CSV de velas a .npy si hace falta. Devuelve la ruta del .npy."""
+    source = csv_path(symbol, timeframe, data_dir)
+    target = store_path(symbol, timeframe, store_dir)
+    if os.path.exists(target) and (not os.path.exists(source) or os.path.getmtime(target) >= os.path.getmtime(source)):
+        return target
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"No hay datos para {symbol} {timeframe} ({source})")
+    df = pd.read_csv(source, parse_dates=['time'])
+    df.sort_values('time', inplace=True)
+    df.drop_duplicates(subset='time', keep='first', inplace=True)
+    return save(from_frame(df), target)
+
+
+def from_frame(df):
+    """Array BAR_DTYPE a partir de un DataFrame de velas (time datetime y precios)."""
+    bars = np.zeros(len(df), dtype=BAR_DTYPE)
+    bars['time'] = df['time'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    for column in ('open', 'high', 'low', 'close', 'tick_volume'):
+        if column in df.columns:
+            bars[column] = df[column].to_numpy()
+    return bars
+
+
+def save(bars, target):
+    """Guarda `bars` en `target` de forma atómica. Devuelve la ruta."""
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp.npy"  # Único por proceso: varios workers pueden construirlo a la vez
+    np.save(tmp_path, bars)
+    os.replace(tmp_path, target)
+    return target
+
+
+def open_bars(symbol, timeframe='M5', store_dir=None):
+    """Velas de `symbol` mapeadas en memoria (solo lectura). Llamar antes a build()."""
+    return np.load(store_path(symbol, timeframe, store_dir), mmap_mode='r')
+
+
+def to_frame(bars):
+    """
+    DataFrame con time (datetime) y precios, como el de leer el CSV con parse_dates=['time'].
+    Las columnas son vistas de `bars`, sin copia: con un .npy mapeado en memoria las velas se leen
+    de las páginas compartidas del archivo y solo ocupan memoria propia las columnas que se añadan.
+    """
+    columns = {name: bars[name] for name in BAR_DTYPE.names}
+    columns['time'] = bars['time'].view('datetime64[s]')
+    return pd.DataFrame(columns, copy=False)
+
+
+class IntrabarStore:
+    """
+    Velas `fine` (M1) de un símbolo, mapeadas en memoria, para consultar las que forman cada
+    vela `timeframe` (M5). Los tiempos de las velas gruesas se buscan directamente en los de las
+    finas, así que sirve para velas M5 de cualquier origen (p. ej. los CSV de varios años del
+    generador de datasets). Solo se leen las páginas de las velas que se piden.
+    """
+
+    def __init__(self, symbol, timeframe='M5', fine='M1', data_dir=None, store_dir=None):
+        build(symbol, fine, data_dir, store_dir)
+        self.symbol = symbol
+        self.fine = open_bars(symbol, fine, store_dir)
+        self.fine_times = self.fine['time']
+        self.seconds = TIMEFRAME_SECONDS[timeframe]
+        self.width = self.seconds // TIMEFRAME_SECONDS[fine]
+        self.lookups = 0    # Velas consultadas
+        self.resolved = 0   # Velas en las que las velas finas decidieron el orden
+        self.uncovered = 0  # Velas consultadas sin ninguna vela fina (fuera del rango de datos M1)
+
+    def slices(self, bar_times):
+        """
+        (high, low, valid) de forma (len(bar_times), width): las velas finas de cada vela gruesa
+        (tiempos en segundos), en orden. `valid` es False en el relleno y si no hay velas finas.
+        """
+        bar_times = np.asarray(bar_times, dtype=np.int64)
+        start = np.searchsorted(self.fine_times, bar_times, side='left')
+        end = np.searchsorted(self.fine_times, bar_times + self.seconds, side='left')
+        rows = start[:, None] + np.arange(self.width)
+        valid = rows < end[:, None]
+        rows = np.minimum(rows, len(self.fine) - 1)
+        self.lookups += len(bar_times)
+        self.uncovered += int((end == start).sum())
+        return self.fine['high'][rows], self.fine['low'][rows], valid
+
+    def report(self):
+        """Resumen de las consultas, para mostrar al final de un backtest o de un tramo."""
+        return (f"{self.resolved} de {self.lookups} velas con TP y SL resueltas con M1"
+                f" ({self.uncovered} sin datos M1)")
+
+
+def open_intrabar(symbol, timeframe='M5', fine='M1', data_dir=None, store_dir=None):
+    """IntrabarStore de `symbol`, o None (con aviso) si no hay velas `fine` para él."""
+    try:
+        return IntrabarStore(symbol, timeframe, fine, data_dir, store_dir)
+    except FileNotFoundError as e:
+        print(f"⚠️ {e}. Las velas que tocan SL y TP se resuelven con la regla por defecto.")
+        return None
@@ -1,11 +1,16 @@
 # config.py
-import MetaTrader5 as mt5
+import os
+
+# --- Backend de MT5: 'terminal' (MetaTrader5 real) o 'simulator' (mt5_simulator, velas locales) ---
+# config no importa MetaTrader5: los valores con nombre (TIMEFRAME, FILLING_MODE) se traducen a las
+# constantes del backend al usarlos (mt5_backend.timeframe / filling_mode).
+MT5_BACKEND = os.environ.get('MT5_BACKEND', 'terminal')
 
 
 ML_CONFIDENCE_THRESHOLD = 0.60 # Umbral de confianza (60%). Solo operamos si el modelo está más seguro que esto.
 # --- Parámetros del bot (OPTIMIZADOS) ---------------------------------------
 SYMBOLS = ["EURUSD", "GBPUSD", "USDJPY"]
-TIMEFRAME = mt5.TIMEFRAME_M5
+TIMEFRAME = 'M5' # mt5.TIMEFRAME_M5
 
 # === PARÁMETROS DE LA ESTRATEGIA V4 OPTIMIZADA ===
 RSI_PERIOD = 19
@@ -29,13 +34,87 @@ TP_ATR_MULT = 2.504770076551997
 # --- Configuración General del Bot ---
 CHECK_INTERVAL = 60
 MAGIC_NUMBER = 123456
-FILLING_MODE = mt5.ORDER_FILLING_FOK
+FILLING_MODE = 'FOK' # mt5.ORDER_FILLING_FOK
 RISK_PERCENT = 0.005 # 0.5% de riesgo por operación. ¡MUY IMPORTANTE!
 DEVIATION_PIPS = 20
+MAX_RETRIES = 3 # Reintentos de order_send en send_trade_request
 STATE_FILE = 'trailing_stops_state.json'
+STATE_JOURNAL_FILE = 'trailing_stops_state.journal' # Cambios incrementales (append) sobre STATE_FILE
+STATE_COMPACT_EVERY = 500 # Registros en el journal antes de reescribir el snapshot completo
+STATE_WRITE_BEHIND = True # Los cambios de estado se escriben en segundo plano, una vez por ciclo
+STATE_FLUSH_INTERVAL = 5.0 # Segundos máximos que un cambio puede quedar sin escribir
+
+# --- Almacén operativo (SQLite): estado, señales y órdenes para reportes y post-mortems ---
+OPS_STORE_ENABLED = True
+OPS_DB_FILE = 'bot_operations.sqlite'
+
+# --- Tabla local de metadatos de símbolos (backtests sin terminal; se actualiza con symbol_metadata.py) ---
+SYMBOL_METADATA_FILE = 'symbol_metadata.json'
+
+# --- Caché local del historial de deals (reports/) ---
+DEALS_CACHE_FILE = 'deals_cache.sqlite'
+DEALS_CACHE_HISTORY_DAYS = 365 # Historia que se descarga la primera vez
+REPORT_CHUNK_ROWS = 50000 # Filas por bloque al leer la caché y escribir los reportes
+
+# --- Logging (asíncrono: el hilo de trading solo encola; un hilo de fondo formatea y escribe) ---
+LOG_FILE = 'bot.log'
+LOG_LEVEL = 'INFO'
+LOG_ASYNC = True
+LOG_CONSOLE = True # Eco en consola de los mensajes del ciclo
+LOG_THROTTLE_SECONDS = 300 # Frecuencia máxima en consola de los mensajes de diagnóstico (motivo de cada HOLD)
+
+# --- Latencia por etapa del ciclo (p50/p95/p99 por símbolo) ---
+LATENCY_ENABLED = False # También con --latency al arrancar el bot
+LATENCY_FILE = 'latency_stats.json'
+LATENCY_DUMP_INTERVAL = 300 # Segundos entre volcados del archivo
+
+# --- Servidor de métricas (solo localhost; requiere fastapi y uvicorn) ---
+METRICS_SERVER_ENABLED = False # También con --metrics al arrancar el bot
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 8765
+
+# --- Simulador offline (MT5_BACKEND = 'simulator') ---
+SIM_DATA_DIR = '.'
+SIM_DATA_FILE_PATTERN = '{symbol}_M5_data_1Y.csv' # Velas M5 descargadas con test/get_data.py
+SIM_INITIAL_BALANCE = 10000.0
+SIM_ACCOUNT_CURRENCY = 'USD'
+SIM_START_BAR = 500 # Velas de historia disponibles antes del inicio del replay
+REPLAY_MAX_BARS = None # Velas a reproducir en modo replay (None = hasta el final de los datos)
+REPLAY_TRADES_FILE = 'replay_trades.csv' # Deals del replay, para compararlos con el backtester
+
+if MT5_BACKEND == 'simulator':
+    # El simulador usa su propio estado y almacén para no mezclarse con los del bot real
+    STATE_FILE = 'sim_' + STATE_FILE
+    STATE_JOURNAL_FILE = 'sim_' + STATE_JOURNAL_FILE
+    OPS_DB_FILE = 'sim_' + OPS_DB_FILE
+    LOG_FILE = 'sim_' + LOG_FILE
+    DEALS_CACHE_FILE = 'sim_' + DEALS_CACHE_FILE
+
+# --- Almacén local de velas (.npy mapeados en memoria, compartidos entre procesos de backtest) ---
+BAR_DATA_DIR = '.'
+BAR_DATA_FILE_PATTERN = '{symbol}_{timeframe}_data_1Y.csv' # CSV de origen (test/get_data.py)
+BAR_STORE_DIR = 'bar_store'
+
+# --- Caché de resultados de backtests (clave: hash de velas + parámetros + modelo + código) ---
+RESULT_CACHE_DIR = 'backtest_cache'
+RESULT_CACHE_MAX_MB = 512 # Por encima se borran las entradas usadas hace más tiempo
+
+# --- Cuenta de los backtests de riesgo y de cartera ---
+BACKTEST_INITIAL_BALANCE = 10000.0
+BACKTEST_ACCOUNT_CURRENCY = 'USD'
+
+# --- Monte Carlo de riesgo (test/monte_carlo_riesgo.py) ---
+MC_SIMULATIONS = 10000 # Secuencias de trades remuestreadas
+MC_CHUNK_SIMS = 2000 # Simulaciones por bloque (acota la memoria: bloque x trades)
+MC_RUIN_LEVEL = 0.5 # Ruina: el balance cae por debajo de esta fracción del inicial
+
+# --- Modelo de ML (registro con recarga en caliente) ---
+MODEL_DIR = 'models'
+MODEL_BASENAME = 'trading_filter_model' # Artefactos: trading_filter_model.joblib o trading_filter_model_v<N>.joblib
 
 # --- Parámetros de Trailing Stop ---
 TRAILING_STOP_ACTIVE = True
+LIVE_TRAILING_STOP = False # El bot en vivo mueve el SL de las posiciones abiertas. Desactivado: no envía modificaciones de SL, solo guarda el SL de cada posición abierta
 TRAILING_STOP_DISTANCE_ATR = 1.0
 MIN_PROFIT_TO_TRAIL_ATR = 0.5
 
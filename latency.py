@@ -0,0 +1,148 @@
+# /latency.py
+import contextlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from config import LATENCY_ENABLED, LATENCY_FILE, LATENCY_DUMP_INTERVAL
+
+# Tiempos por etapa del ciclo (get_rates, indicadores, predict_proba, order_send, trailing...),
+# agregados por (símbolo, etapa) en histogramas de cubetas logarítmicas: memoria fija por clave
+# y percentiles con un error máximo del ancho de una cubeta (~10%).
+# Desactivado, stage() devuelve un contexto vacío compartido y no se mide nada.
+
+_MIN_SECONDS = 1e-5   # Límite inferior de la primera cubeta (10 µs)
+_GROWTH = 1.1         # Cada cubeta es un 10% más ancha que la anterior
+_BUCKETS = 200        # Hasta ~1.900 s; lo que exceda cae en la última cubeta
+_LOG_GROWTH = math.log(_GROWTH)
+
+_enabled = LATENCY_ENABLED
+_lock = threading.Lock()
+_histograms = {}  # (symbol, stage) -> _Histogram
+_last_dump = time.monotonic()
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= _MIN_SECONDS:
+            index = 0
+        else:
+            index = min(int(math.log(seconds / _MIN_SECONDS) / _LOG_GROWTH) + 1, _BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+def _percentile(counts, count, max_seconds, q):
+    """Límite superior de la cubeta donde cae el percentil q (0-100), en segundos."""
+    target = q / 100.0 * count
+    cumulative = 0
+    for index, n in enumerate(counts):
+        cumulative += n
+        if n and cumulative >= target:
+            return min(_MIN_SECONDS * _GROWTH ** index, max_seconds)
+    return max_seconds
+
+
+class _StageTimer:
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record(self.key, time.perf_counter() - self.start)
+        return False
+
+
+def _record(key, seconds):
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.add(seconds)
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+def stage(symbol, name):
+    """Contexto que mide la etapa `name` del símbolo `symbol` ('ALL' para el ciclo completo)."""
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _StageTimer((symbol, name))
+
+
+def record(symbol, name, seconds):
+    """Añade una medida ya tomada (por ejemplo, un tiempo calculado fuera de un `with`)."""
+    if _enabled:
+        _record((symbol, name), seconds)
+
+
+def snapshot():
+    """{symbol: {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}} con lo medido hasta ahora."""
+    # Bajo el lock solo se copian los contadores; los percentiles se calculan fuera
+    with _lock:
+        items = [(key, list(histogram.counts), histogram.count, histogram.total, histogram.max)
+                 for key, histogram in _histograms.items()]
+    stats = {}
+    for (symbol, name), counts, count, total, max_seconds in sorted(items):
+        stats.setdefault(symbol, {})[name] = {
+            'count': count,
+            'mean_ms': round(total / count * 1000, 3),
+            'p50_ms': round(_percentile(counts, count, max_seconds, 50) * 1000, 3),
+            'p95_ms': round(_percentile(counts, count, max_seconds, 95) * 1000, 3),
+            'p99_ms': round(_percentile(counts, count, max_seconds, 99) * 1000, 3),
+            'max_ms': round(max_seconds * 1000, 3),
+        }
+    return stats
+
+
+def dump(path=None):
+    """Escribe el snapshot en JSON de forma atómica (archivo temporal + rename)."""
+    global _last_dump
+    path = path or LATENCY_FILE
+    _last_dump = time.monotonic()
+    if not _histograms:
+        return
+    tmp_file = f"{path}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump({'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'stages': snapshot()}, f, indent=4)
+        os.replace(tmp_file, path)
+    except Exception as e:
+        logging.error(f"Error al guardar las latencias en '{path}': {e}")
+
+
+def maybe_dump():
+    """Vuelca el snapshot si han pasado LATENCY_DUMP_INTERVAL segundos desde el último (al final de cada ciclo)."""
+    if _enabled and time.monotonic() - _last_dump >= LATENCY_DUMP_INTERVAL:
+        dump()
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
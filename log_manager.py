@@ -0,0 +1,115 @@
+# /log_manager.py
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from config import LOG_FILE, LOG_LEVEL, LOG_ASYNC, LOG_CONSOLE, LOG_THROTTLE_SECONDS
+
+# Salida del bot en dos canales:
+#  - `console`: los mensajes con emojis que antes eran print() (solo a la consola, opcional).
+#  - logging normal (logging.info/error...): al archivo LOG_FILE.
+# En modo asíncrono el hilo de trading solo encola el LogRecord sin formatear; un hilo de fondo
+# (QueueListener) construye el texto y escribe, así la E/S nunca retrasa una orden.
+# Los mensajes con extra=throttled(clave) se muestran en consola como mucho una vez cada
+# LOG_THROTTLE_SECONDS por clave (p. ej. el motivo completo de cada HOLD).
+
+console = logging.getLogger('bot.console')
+console.setLevel(logging.INFO)
+console.propagate = False
+# Hasta que se llame a setup_logging (scripts sueltos, backtests), la consola se comporta como print()
+_default_console_handler = logging.StreamHandler(sys.stdout)
+_default_console_handler.setFormatter(logging.Formatter('%(message)s'))
+console.addHandler(_default_console_handler)
+
+_listener = None
+_atexit_registered = False
+
+
+def throttled(key):
+    """`extra` para limitar la frecuencia de un mensaje de consola por clave."""
+    return {'throttle': key}
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler que no formatea en el hilo que escribe: el mensaje se construye en el listener."""
+
+    def prepare(self, record):
+        return record
+
+
+class _ThrottleFilter(logging.Filter):
+    def __init__(self, interval):
+        super().__init__()
+        self.interval = interval
+        self._last = {}
+        self._suppressed = {}
+
+    def filter(self, record):
+        key = getattr(record, 'throttle', None)
+        if key is None or self.interval <= 0:
+            return True
+        last = self._last.get(key)
+        if last is not None and record.created - last < self.interval:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return False
+        self._last[key] = record.created
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.msg = f"{record.msg} (+{suppressed} similares omitidos)"
+        return True
+
+
+def setup_logging(log_file=LOG_FILE, level=LOG_LEVEL, console_echo=LOG_CONSOLE, async_mode=LOG_ASYNC,
+                  throttle_seconds=LOG_THROTTLE_SECONDS):
+    """Configura el logging del bot. Se llama una vez al arrancar."""
+    global _listener, _atexit_registered
+    shutdown_logging()
+
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    console_handlers = []
+    if console_echo:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter('%(message)s'))
+        console_handler.addFilter(_ThrottleFilter(throttle_seconds))
+        console_handlers.append(console_handler)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in list(console.handlers):
+        console.removeHandler(handler)
+
+    # Sin eco, los mensajes de consola ni siquiera crean el LogRecord
+    console.setLevel(logging.INFO if console_echo else logging.CRITICAL + 1)
+
+    if async_mode:
+        records = queue.SimpleQueue()
+        root.addHandler(_DeferredQueueHandler(records))
+        if console_echo:
+            console.addHandler(_DeferredQueueHandler(records))
+        # Cada registro va a su canal: los de `console` a la consola, el resto al archivo
+        file_handler.addFilter(lambda record: record.name != console.name)
+        for handler in console_handlers:
+            handler.addFilter(lambda record: record.name == console.name)
+        _listener = QueueListener(records, file_handler, *console_handlers, respect_handler_level=True)
+        _listener.start()
+        if not _atexit_registered:
+            atexit.register(shutdown_logging)
+            _atexit_registered = True
+    else:
+        root.addHandler(file_handler)
+        for handler in console_handlers:
+            console.addHandler(handler)
+    if not console.handlers:
+        console.addHandler(logging.NullHandler())
+
+
+def shutdown_logging():
+    """Detiene el hilo de escritura tras vaciar la cola (al salir del bot)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
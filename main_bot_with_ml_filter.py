@@ -1,28 +1,55 @@
 # main_bot_diagnostico_final.py
-import pandas as pd
-import MetaTrader5 as mt5
 import time
+import importlib
+import argparse
+import contextlib
+import os
+import sys
 import logging
-import joblib
 
-# Importar nuestros módulos y configuraciones
-import config as cfg
-import mt5_manager as mt5_man
-import state_manager as sm
+# Tiempos de arranque (importación e inicialización), para --profile-startup
+_startup_times = []
 
-# ... (El código para cargar el modelo no cambia) ...
-try:
-    ml_model = joblib.load('models/trading_filter_model.joblib')
-    print("✅ Modelo de Machine Learning cargado exitosamente.")
-except FileNotFoundError:
-    print("❌ ERROR: No se encontró el archivo del modelo 'trading_filter_model.joblib'.")
-    ml_model = None
+def _import(name):
+    """Importa un módulo anotando cuánto tarda."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _startup_times.append((f"import {name}", time.perf_counter() - start))
+    return module
+
+@contextlib.contextmanager
+def _startup_step(name):
+    start = time.perf_counter()
+    yield
+    _startup_times.append((name, time.perf_counter() - start))
+
+# Importar nuestros módulos y configuraciones. pandas, numpy, indicators y joblib/sklearn
+# (lo más pesado) se importan al usarse por primera vez, después de conectar y de gestionar
+# las posiciones abiertas.
+cfg = _import('config')
+mt5_backend = _import('mt5_backend')
+mt5_man = _import('mt5_manager')
+sm = _import('state_manager')
+ops = _import('operational_store')
+latency = _import('latency')
+metrics = _import('metrics')
+log_manager = _import('log_manager')
+console = log_manager.console
+ModelRegistry = _import('model_registry').ModelRegistry
+
+with _startup_step(f"import backend MT5 ({cfg.MT5_BACKEND})"):
+    mt5 = mt5_backend.get_mt5(cfg.MT5_BACKEND)
+
+# El modelo se carga bajo demanda (primera señal candidata) y se recarga entre ciclos
+# si aparece un artefacto nuevo en cfg.MODEL_DIR.
+model_registry = ModelRegistry(cfg.MODEL_DIR, cfg.MODEL_BASENAME)
 
 # --- LÓGICA DE LA ESTRATEGIA V4 CON DIAGNÓSTICO FINAL ---
 def get_v4_signal_candidate_reviewed(df, adx_threshold, rsi_buy_threshold, rsi_sell_threshold):
     """
     Genera una señal de trading con diagnóstico, mayor robustez y parámetros configurables.
     """
+    import pandas as pd
     if df.empty or len(df) < 100:
         return "HOLD", "Datos insuficientes", None
 
@@ -102,102 +129,325 @@ def get_v4_signal_candidate_reviewed(df, adx_threshold, rsi_buy_threshold, rsi_s
 
     return "HOLD", "Condición no determinada", None
 # --- El resto del archivo (función main) es idéntico al anterior ---
-def main():
-    if ml_model is None:
+def main(replay=False, max_bars=None, verbose=False, profile_startup=False, measure_latency=False,
+         metrics_server=False):
+    if replay and cfg.MT5_BACKEND != 'simulator':
+        print("❌ ERROR: El modo replay requiere el simulador (MT5_BACKEND=simulator).")
+        return
+
+    if not model_registry.available():
+        print(f"❌ ERROR: No se encontró ningún modelo '{cfg.MODEL_BASENAME}*.joblib' en '{cfg.MODEL_DIR}'.")
         return
         
+    # Con el replay silencioso, la salida de cada ciclo no llega a la consola
+    log_manager.setup_logging(console_echo=cfg.LOG_CONSOLE and (verbose or not replay))
     print("🚀 Iniciando Bot Híbrido Final (con Diagnóstico v2)...")
-    if not mt5.initialize():
+    if measure_latency:
+        latency.set_enabled(True)
+    if metrics_server or cfg.METRICS_SERVER_ENABLED:
+        metrics.start_server(cfg.METRICS_HOST, cfg.METRICS_PORT)
+    with _startup_step("mt5.initialize"):
+        connected = mt5.initialize()
+    if not connected:
         print("❌ ERROR: No se pudo inicializar MetaTrader5.")
         return
 
-    for symbol in cfg.SYMBOLS:
-        if not mt5.symbol_select(symbol, True):
-            print(f"❌ ERROR: No se pudo seleccionar {symbol}.")
-            mt5.shutdown()
-            return
+    with _startup_step("mt5.symbol_select"):
+        for symbol in cfg.SYMBOLS:
+            if not mt5.symbol_select(symbol, True):
+                print(f"❌ ERROR: No se pudo seleccionar {symbol}.")
+                mt5.shutdown()
+                return
             
     print(f"✅ Bot iniciado. Monitoreando: {', '.join(cfg.SYMBOLS)}")
+    with _startup_step("abrir almacén operativo"):
+        if cfg.OPS_STORE_ENABLED:
+            ops.open_store(cfg.OPS_DB_FILE)
+    if replay:
+        # Cada replay empieza sin estado: los tickets del simulador vuelven a empezar en 1
+        sm.save_trailing_stop_state({})
+    with _startup_step("cargar estado del trailing stop"):
+        managed_trailing_stops = sm.load_trailing_stop_state()
 
-    while True:
-        try:
-            account_info = mt5.account_info()
-            if account_info is None:
-                print("⚠️ No se pudo obtener la info de la cuenta. Reintentando...")
-                time.sleep(cfg.CHECK_INTERVAL)
-                continue
+    try:
+        # Lo primero tras un reinicio: volver a gestionar las posiciones que quedaron abiertas
+        with _startup_step("gestión inicial de posiciones"):
+            ops.set_cycle_time(cycle_time())
+            reconcile_positions(managed_trailing_stops)
+            sm.flush_trailing_stop_state()
+            ops.flush()
+        if profile_startup:
+            # Lo que se importa/carga bajo demanda en el primer ciclo se mide aparte
+            # (~0 ms si la gestión inicial de posiciones ya lo necesitó)
+            _import('pandas')
+            _import('indicators')
+            with _startup_step("cargar modelo de ML (bajo demanda)"):
+                model_registry.get()
+            print_startup_profile()
+
+        if replay:
+            run_replay(managed_trailing_stops, max_bars, verbose)
+        else:
+            run_loop(managed_trailing_stops)
+    finally:
+        # Escribe los cambios de estado pendientes antes de salir (Ctrl+C o error fatal)
+        sm.shutdown_state_writer()
+        ops.close_store()
+        if latency.is_enabled():
+            latency.dump()
+        mt5.shutdown()
+        log_manager.shutdown_logging()
+
+def print_startup_profile():
+    """Muestra los tiempos de importación e inicialización medidos durante el arranque."""
+    print("\n⏱️ Perfil de arranque:")
+    for name, seconds in _startup_times:
+        print(f"   {name:<45} {seconds * 1000:9.1f} ms")
+    print(f"   {'TOTAL':<45} {sum(seconds for _, seconds in _startup_times) * 1000:9.1f} ms")
+    print("   (Para el detalle por submódulo: python -X importtime main_bot_with_ml_filter.py)")
+
+def manage_positions(symbol, managed_trailing_stops):
+    """
+    Trailing stop de las posiciones abiertas de `symbol`. Sin LIVE_TRAILING_STOP no se mueve
+    ningún SL: solo se concilia el estado guardado con las posiciones abiertas.
+    """
+    positions = mt5.positions_get(symbol=symbol) or []
+    if not positions and not managed_trailing_stops.get((symbol, cfg.MAGIC_NUMBER)):
+        return
+    if not cfg.LIVE_TRAILING_STOP:
+        mt5_man.manage_trailing_stops(symbol, positions, None, None, None, managed_trailing_stops, modify_sl=False)
+        return
+    tick = mt5.symbol_info_tick(symbol)
+    if tick:
+        import indicators as ind
+        df_atr = mt5_man.get_rates(symbol, cfg.TIMEFRAME, cfg.ATR_PERIOD * 3)
+        atr_val = ind.get_atr(df_atr, cfg.ATR_PERIOD) if not df_atr.empty else None
+        mt5_man.manage_trailing_stops(symbol, positions, atr_val, tick.ask, tick.bid,
+                                      managed_trailing_stops)
+
+def _managed_count(managed_trailing_stops):
+    return sum(len(tickets) for (_, magic), tickets in managed_trailing_stops.items() if magic == cfg.MAGIC_NUMBER)
+
+def reconcile_positions(managed_trailing_stops):
+    """
+    Al arrancar, concilia el estado guardado con las posiciones abiertas: los símbolos de
+    SYMBOLS y los de cualquier partición guardada de este magic (aunque el símbolo ya no se opere),
+    para que no queden tickets cerrados mientras el bot estaba parado.
+    """
+    saved = _managed_count(managed_trailing_stops)
+    symbols = dict.fromkeys(list(cfg.SYMBOLS) + [symbol for symbol, magic in managed_trailing_stops
+                                                 if magic == cfg.MAGIC_NUMBER])
+    for symbol in symbols:
+        manage_positions(symbol, managed_trailing_stops)
+    console.info("🔁 Estado conciliado al arrancar: %d posiciones guardadas, %d abiertas gestionadas.",
+                 saved, _managed_count(managed_trailing_stops))
+
+def cycle_time():
+    """
+    Hora del ciclo (segundos UNIX) para el almacén operativo: el reloj simulado en el simulador y,
+    en vivo, la del último tick (hora del servidor, como los deals). Sin tick, el reloj local.
+    """
+    if hasattr(mt5, 'current_time'):
+        return mt5.current_time()
+    for symbol in cfg.SYMBOLS:
+        tick = mt5.symbol_info_tick(symbol)
+        if tick:
+            return tick.time
+    return int(time.time())
+
+def run_cycle(managed_trailing_stops):
+    """Un ciclo del bot: señal, filtro de ML, órdenes y trailing stop de cada símbolo."""
+    metrics.increment('cycles')
+    ops.set_cycle_time(cycle_time())
+    model_registry.refresh()
+    account_info = mt5.account_info()
+    if account_info is None:
+        console.warning("⚠️ No se pudo obtener la info de la cuenta. Reintentando...")
+        return False
+
+    console.info("\n--- Nuevo ciclo --- Balance: %.2f %s ---", account_info.balance, account_info.currency)
+
+    for symbol in cfg.SYMBOLS:
+        console.info("\n--- Analizando %s ---", symbol)
+        
+        positions = mt5.positions_get(symbol=symbol) or []
+        my_positions = [p for p in positions if p.magic == cfg.MAGIC_NUMBER]
 
-            print(f"\n--- Nuevo ciclo --- Balance: {account_info.balance:.2f} {account_info.currency} ---")
+        if not my_positions:
+            console.info("[%s] ℹ️ No hay posiciones abiertas. Buscando nueva señal...", symbol)
+            
+            bars_needed = 100
+            console.info("[%s] 📈 Obteniendo %d velas para análisis...", symbol, bars_needed)
+            df = mt5_man.get_rates(symbol, cfg.TIMEFRAME, bars_needed)
+            
+            if df.empty or len(df) < bars_needed:
+                console.warning("[%s] ⚠️ Datos insuficientes para el análisis. Saltando.", symbol)
+                continue
 
-            for symbol in cfg.SYMBOLS:
-                print(f"\n--- Analizando {symbol} ---")
+            with latency.stage(symbol, 'indicators'):
+                signal_candidate, reason, features_df = get_v4_signal_candidate_reviewed(
+                    df,
+                    cfg.ADX_THRESHOLD,
+                    cfg.RSI_BUY_THRESHOLD,
+                    cfg.RSI_SELL_THRESHOLD
+                )
+            if signal_candidate == "HOLD":
+                metrics.increment('signals_hold')
+                ops.record_signal(symbol, signal_candidate, reason)
+                # El motivo completo de cada HOLD se muestra como mucho una vez por LOG_THROTTLE_SECONDS
+                console.info("[%s] 🤖 Resultado: HOLD. Razón: %s", symbol, reason,
+                             extra=log_manager.throttled(f"{symbol}:hold"))
+            else: 
+                console.info("[%s] 🤖 ¡Señal candidata detectada: %s!", symbol, signal_candidate)
+                console.info("[%s] 🔍 Razón: %s. Pasando al filtro de ML...", symbol, reason)
+                
+                ml_model, model_version = model_registry.get()
+                features = features_df[['rsi', 'macd_hist', 'adx', 'atr_normalized']]
+                with latency.stage(symbol, 'predict_proba'):
+                    probabilities = ml_model.predict_proba(features)[0]
+                confidence_in_winner = probabilities[1] 
+                metrics.observe_confidence(float(confidence_in_winner))
+                
+                logging.info("[%s] Señal %s evaluada con el modelo %s. Confianza: %.4f",
+                             symbol, signal_candidate, model_version, confidence_in_winner)
+                console.info("[%s] 🧠 Confianza del modelo ML (%s) en el éxito: %.2f%%",
+                             symbol, model_version, confidence_in_winner * 100)
+                ops.record_signal(symbol, signal_candidate, reason, float(confidence_in_winner), model_version,
+                                  accepted=confidence_in_winner > cfg.ML_CONFIDENCE_THRESHOLD)
                 
-                positions = mt5.positions_get(symbol=symbol) or []
-                my_positions = [p for p in positions if p.magic == cfg.MAGIC_NUMBER]
+                if confidence_in_winner > cfg.ML_CONFIDENCE_THRESHOLD:
+                    metrics.increment('signals_accepted')
+                    console.info("[%s] ✅ Confianza suficiente. Ejecutando operación.", symbol)
+                    logging.info("[%s] Operación %s aprobada por el modelo %s (confianza %.4f).",
+                                 symbol, signal_candidate, model_version, confidence_in_winner)
+                    tick = mt5.symbol_info_tick(symbol)
+                    if tick is None: continue
 
-                if not my_positions:
-                    print(f"[{symbol}] ℹ️ No hay posiciones abiertas. Buscando nueva señal...")
+                    atr_val = features_df['atr_normalized'].iloc[-1] * tick.ask
+                    lot = mt5_man.calculate_universal_lot_size(symbol, account_info, atr_val)
                     
-                    bars_needed = 100
-                    print(f"[{symbol}] 📈 Obteniendo {bars_needed} velas para análisis...")
-                    df = mt5_man.get_rates(symbol, cfg.TIMEFRAME, bars_needed)
-                    
-                    if df.empty or len(df) < bars_needed:
-                        print(f"[{symbol}] ⚠️ Datos insuficientes para el análisis. Saltando.")
-                        continue
-
-                    signal_candidate, reason, features_df = get_v4_signal_candidate_reviewed(
-                        df,
-                        cfg.ADX_THRESHOLD,
-                        cfg.RSI_BUY_THRESHOLD,
-                        cfg.RSI_SELL_THRESHOLD
-                    )
-                    if signal_candidate == "HOLD":
-                        print(f"[{symbol}] 🤖 Resultado: HOLD. Razón: {reason}")
-                    else: 
-                        print(f"[{symbol}] 🤖 ¡Señal candidata detectada: {signal_candidate}!")
-                        print(f"[{symbol}] 🔍 Razón: {reason}. Pasando al filtro de ML...")
-                        
-                        features = features_df[['rsi', 'macd_hist', 'adx', 'atr_normalized']]
-                        probabilities = ml_model.predict_proba(features)[0]
-                        confidence_in_winner = probabilities[1] 
-                        
-                        print(f"[{symbol}] 🧠 Confianza del modelo ML en el éxito: {confidence_in_winner:.2%}")
-                        
-                        if confidence_in_winner > cfg.ML_CONFIDENCE_THRESHOLD:
-                            print(f"[{symbol}] ✅ Confianza suficiente. Ejecutando operación.")
-                            tick = mt5.symbol_info_tick(symbol)
-                            if tick is None: continue
-
-                            atr_val = features_df['atr_normalized'].iloc[-1] * tick.ask
-                            lot = mt5_man.calculate_universal_lot_size(symbol, account_info, atr_val)
-                            
-                            if signal_candidate == "BUY":
-                                sl = tick.ask - atr_val * cfg.SL_ATR_MULT
-                                tp = tick.ask + atr_val * cfg.TP_ATR_MULT
-                                mt5_man.open_position(symbol, mt5.ORDER_TYPE_BUY, lot, tick.ask, sl, tp)
-                            else: # SELL
-                                sl = tick.bid + atr_val * cfg.SL_ATR_MULT
-                                tp = tick.bid - atr_val * cfg.TP_ATR_MULT
-                                mt5_man.open_position(symbol, mt5.ORDER_TYPE_SELL, lot, tick.bid, sl, tp)
-                        else:
-                            print(f"[{symbol}] ❌ Confianza insuficiente. Operación filtrada por el modelo ML.")
+                    with latency.stage(symbol, 'open_position'):  # Incluye los reintentos
+                        if signal_candidate == "BUY":
+                            sl = tick.ask - atr_val * cfg.SL_ATR_MULT
+                            tp = tick.ask + atr_val * cfg.TP_ATR_MULT
+                            mt5_man.open_position(symbol, mt5.ORDER_TYPE_BUY, lot, tick.ask, sl, tp)
+                        else: # SELL
+                            sl = tick.bid + atr_val * cfg.SL_ATR_MULT
+                            tp = tick.bid - atr_val * cfg.TP_ATR_MULT
+                            mt5_man.open_position(symbol, mt5.ORDER_TYPE_SELL, lot, tick.bid, sl, tp)
                 else:
-                    print(f"[{symbol}] ℹ️ Posición abierta detectada. Saltando búsqueda de señal.")
+                    metrics.increment('signals_filtered')
+                    console.info("[%s] ❌ Confianza insuficiente. Operación filtrada por el modelo ML.", symbol)
+        else:
+            console.info("[%s] ℹ️ Posición abierta detectada. Saltando búsqueda de señal.", symbol)
 
-                print(f"[{symbol}] 🔒 Gestionando Trailing Stop para posiciones existentes...")
-                positions_after = mt5.positions_get(symbol=symbol) or []
-                tick = mt5.symbol_info_tick(symbol)
-                if tick:
-                    # ... (código de gestión de Trailing Stop sin cambios)
-                    pass
+        if cfg.LIVE_TRAILING_STOP:
+            console.info("[%s] 🔒 Gestionando Trailing Stop para posiciones existentes...", symbol)
+        with latency.stage(symbol, 'trailing_stop'):
+            manage_positions(symbol, managed_trailing_stops)
+    return True
 
+def run_loop(managed_trailing_stops):
+    while True:
+        try:
+            with latency.stage('ALL', 'cycle'):
+                run_cycle(managed_trailing_stops)
         except Exception as e:
-            logging.critical(f"Error crítico en el bucle principal: {e}", exc_info=True)
-            print(f"🔥🔥🔥 ERROR CRÍTICO: {e}")
+            metrics.increment('cycle_errors')
+            logging.critical("Error crítico en el bucle principal: %s", e, exc_info=True)
+            console.critical("🔥🔥🔥 ERROR CRÍTICO: %s", e)
         finally:
-            print(f"\n--- Ciclo finalizado. Esperando {cfg.CHECK_INTERVAL} segundos... ---")
+            # Un único volcado del estado por ciclo, en segundo plano
+            sm.flush_trailing_stop_state()
+            ops.flush()
+            latency.maybe_dump()
+            console.info("\n--- Ciclo finalizado. Esperando %s segundos... ---", cfg.CHECK_INTERVAL)
             time.sleep(cfg.CHECK_INTERVAL)
 
+def run_replay(managed_trailing_stops, max_bars=None, verbose=False):
+    """
+    Modo replay (solo con el simulador): ejecuta el mismo ciclo que el bot real, pero en lugar de
+    esperar CHECK_INTERVAL avanza el reloj simulado una vela por ciclo, tan rápido como se pueda.
+    Mide el tiempo de CPU de cada ciclo y al terminar muestra un resumen y guarda los deals.
+    """
+    step = mt5.bar_seconds()
+    start, end = mt5.current_time(), mt5.data_end()
+    cycle_cpu = []
+    cycle_output = sys.stdout if verbose else open(os.devnull, 'w')
+    wall_start = time.perf_counter()
+    print(f"⏩ Replay desde {_format_time(start)} hasta {_format_time(end)} (una vela por ciclo)...")
+    try:
+        while mt5.current_time() < end and (max_bars is None or len(cycle_cpu) < max_bars):
+            cpu_start = time.process_time()
+            try:
+                with contextlib.redirect_stdout(cycle_output), latency.stage('ALL', 'cycle'):
+                    run_cycle(managed_trailing_stops)
+            except Exception as e:
+                metrics.increment('cycle_errors')
+                logging.critical("Error crítico en el replay (%s): %s", _format_time(mt5.current_time()), e, exc_info=True)
+                print(f"🔥🔥🔥 ERROR CRÍTICO ({_format_time(mt5.current_time())}): {e}")
+            finally:
+                sm.flush_trailing_stop_state()
+                ops.flush()
+                latency.maybe_dump()
+            cycle_cpu.append(time.process_time() - cpu_start)
+            mt5.advance(step)
+            if not verbose and len(cycle_cpu) % 1000 == 0:
+                print(f"   ... {len(cycle_cpu)} ciclos, reloj en {_format_time(mt5.current_time())}")
+    finally:
+        if cycle_output is not sys.stdout:
+            cycle_output.close()
+    print_replay_summary(cycle_cpu, start, time.perf_counter() - wall_start)
+
+def print_replay_summary(cycle_cpu, start, wall_seconds):
+    """Resumen del replay: velocidad, coste de CPU por ciclo y resultado de las operaciones."""
+    import numpy as np
+    import pandas as pd
+    if not cycle_cpu:
+        print("⚠️ El replay no ejecutó ningún ciclo.")
+        return
+    cpu_ms = np.asarray(cycle_cpu) * 1000
+    p50, p95, p99 = np.percentile(cpu_ms, [50, 95, 99])
+    virtual_seconds = mt5.current_time() - start
+    deals = pd.DataFrame([d._asdict() for d in mt5.history_deals_get()])
+    closed = deals[deals['entry'] == mt5.DEAL_ENTRY_OUT] if not deals.empty else deals
+    account_info = mt5.account_info()
+
+    print("\n" + "="*50)
+    print("📊 RESUMEN DEL REPLAY")
+    print("="*50)
+    print(f"Ciclos (velas):           {len(cycle_cpu)}")
+    print(f"Periodo simulado:         {_format_time(start)} → {_format_time(mt5.current_time())}")
+    print(f"Tiempo real:              {wall_seconds:.1f} s ({virtual_seconds / max(wall_seconds, 1e-9):,.0f}x)")
+    print(f"CPU por ciclo (ms):       media {cpu_ms.mean():.2f} | p50 {p50:.2f} | p95 {p95:.2f} | p99 {p99:.2f} | máx {cpu_ms.max():.2f}")
+    print(f"Operaciones cerradas:     {len(closed)}")
+    if len(closed) > 0:
+        print(f"Tasa de acierto:          {(closed['profit'] > 0).mean():.2%}")
+    print(f"Balance final:            {account_info.balance:.2f} {account_info.currency}")
+    print("="*50)
+
+    if not deals.empty and cfg.REPLAY_TRADES_FILE:
+        deals['time'] = pd.to_datetime(deals['time'], unit='s')
+        deals.to_csv(cfg.REPLAY_TRADES_FILE, index=False)
+        print(f"💾 Deals del replay guardados en '{cfg.REPLAY_TRADES_FILE}'.")
+
+def _format_time(timestamp):
+    import pandas as pd
+    return pd.to_datetime(timestamp, unit='s').strftime('%Y-%m-%d %H:%M') if timestamp is not None else '-'
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Bot híbrido V4 + filtro de ML.")
+    parser.add_argument('--replay', action='store_true',
+                        help="Reproduce los datos del simulador con reloj virtual, una vela por ciclo y sin esperas.")
+    parser.add_argument('--bars', type=int, default=cfg.REPLAY_MAX_BARS,
+                        help="Número máximo de velas a reproducir en modo replay.")
+    parser.add_argument('--verbose', action='store_true', help="Muestra la salida de cada ciclo durante el replay.")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Muestra el tiempo de importación e inicialización de cada módulo al arrancar.")
+    parser.add_argument('--latency', action='store_true',
+                        help=f"Mide la latencia de cada etapa del ciclo y la vuelca en '{cfg.LATENCY_FILE}'.")
+    parser.add_argument('--metrics', action='store_true',
+                        help=f"Publica las métricas del bot en http://{cfg.METRICS_HOST}:{cfg.METRICS_PORT}/metrics.")
+    args = parser.parse_args()
+    main(replay=args.replay, max_bars=args.bars, verbose=args.verbose, profile_startup=args.profile_startup,
+         measure_latency=args.latency, metrics_server=args.metrics)
@@ -0,0 +1,113 @@
+# /metrics.py
+import logging
+import threading
+import latency
+
+# Contadores en memoria del bot en ejecución (ciclos, reintentos de órdenes, escrituras de estado,
+# aciertos de caché, distribución de la confianza del modelo) y un servidor HTTP opcional en
+# localhost que los publica junto con las latencias de latency.py.
+# El hilo de trading solo incrementa contadores bajo un lock; el servidor corre en su propio hilo
+# y trabaja sobre copias, así que una consulta nunca bloquea ni ralentiza el ciclo.
+
+_CONFIDENCE_BINS = 20  # Histograma de confianza en tramos de 0.05
+
+_lock = threading.Lock()
+_counters = {}
+_caches = {}  # nombre -> [aciertos, fallos]
+_confidence_counts = [0] * _CONFIDENCE_BINS
+_confidence_total = 0.0
+_server_thread = None
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def cache_hit(name):
+    with _lock:
+        _caches.setdefault(name, [0, 0])[0] += 1
+
+
+def cache_miss(name):
+    with _lock:
+        _caches.setdefault(name, [0, 0])[1] += 1
+
+
+def observe_confidence(confidence):
+    """Registra la confianza del modelo (0-1) de una señal candidata."""
+    global _confidence_total
+    index = min(max(int(confidence * _CONFIDENCE_BINS), 0), _CONFIDENCE_BINS - 1)
+    with _lock:
+        _confidence_counts[index] += 1
+        _confidence_total += confidence
+
+
+def snapshot():
+    """Copia de todas las métricas, lista para serializar en JSON."""
+    with _lock:
+        counters = dict(_counters)
+        caches = {name: tuple(values) for name, values in _caches.items()}
+        confidence_counts = list(_confidence_counts)
+        confidence_total = _confidence_total
+    observed = sum(confidence_counts)
+    return {
+        'counters': counters,
+        'caches': {
+            name: {'hits': hits, 'misses': misses,
+                   'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None}
+            for name, (hits, misses) in caches.items()
+        },
+        'ml_confidence': {
+            'count': observed,
+            'mean': round(confidence_total / observed, 4) if observed else None,
+            'histogram': [{'from': round(i / _CONFIDENCE_BINS, 2), 'to': round((i + 1) / _CONFIDENCE_BINS, 2),
+                           'count': n} for i, n in enumerate(confidence_counts)],
+        },
+        'latency': latency.snapshot(),
+    }
+
+
+def _build_app():
+    from fastapi import FastAPI
+
+    app = FastAPI(title="Bot Machine - métricas", docs_url=None, redoc_url=None)
+
+    @app.get("/health")
+    def health():
+        return {'status': 'ok'}
+
+    @app.get("/metrics")
+    def all_metrics():
+        return snapshot()
+
+    @app.get("/metrics/latency")
+    def latency_metrics():
+        return latency.snapshot()
+
+    return app
+
+
+def start_server(host='127.0.0.1', port=8765):
+    """
+    Arranca el servidor de métricas en un hilo daemon. Requiere fastapi y uvicorn; si no están
+    instalados se avisa y el bot sigue sin servidor. Activa también la medición de latencias.
+    """
+    global _server_thread
+    if _server_thread is not None:
+        return True
+    try:
+        import uvicorn
+        app = _build_app()
+    except ImportError as e:
+        logging.error(f"No se pudo arrancar el servidor de métricas: {e}")
+        print(f"⚠️ Servidor de métricas desactivado: falta una dependencia ({e.name}).")
+        return False
+
+    latency.set_enabled(True)
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level='warning', access_log=False))
+    _server_thread = threading.Thread(target=server.run, name="metrics-server", daemon=True)
+    _server_thread.start()
+    logging.info(f"Servidor de métricas escuchando en http://{host}:{port}/metrics")
+    print(f"📊 Métricas disponibles en http://{host}:{port}/metrics")
+    return True
@@ -1,26 +1,214 @@
 # ml_filter_trainer.py
+import argparse
+import itertools
+import os
+import re
+import tempfile
+import time
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, TimeSeriesSplit
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import classification_report, confusion_matrix, precision_score, accuracy_score
 import joblib
+from joblib import Parallel, delayed
+
+import config as cfg
 
 # --- PARÁMETROS ---
 DATA_FILE = "v4_trades_for_ml.csv"
+FEATURES = ['rsi', 'macd_hist', 'adx', 'atr_normalized']
+LABEL = 'is_winner'
 
-if __name__ == "__main__":
-    # 1. Cargar el dataset de trades
-    print(f"Cargando datos de trades desde '{DATA_FILE}'...")
-    df = pd.read_csv(DATA_FILE)
+# --- PARÁMETROS DE LA VALIDACIÓN CRUZADA (modo --cv) ---
+CV_SPLITS = 5 # Ventanas expansivas: cada fold entrena con todo lo anterior y prueba con el bloque siguiente
+PARAM_GRID = {
+    'n_estimators': [50, 100, 150, 300],
+    'max_depth': [None, 6, 10],
+    'min_samples_leaf': [1, 5, 20],
+}
+CV_REPORT_FILE = "cv_report.csv"
+
+# --- SELECCIÓN POR LATENCIA (modo --select) ---
+MODEL_OUTPUT_FILE = "models/trading_filter_model.joblib"
+SELECTION_REPORT_FILE = "model_selection_report.csv"
+SELECT_TOP_K = 10           # Mejores configuraciones del CV que se evalúan en latencia
+LATENCY_SINGLE_CALLS = 300  # Llamadas de una fila para estimar p50/p99 (como en el bucle en vivo)
+LATENCY_BATCH_ROWS = 1000
+
+def load_dataset(path):
+    """Carga el dataset de trades (CSV o Parquet) en orden temporal si trae la columna 'time'."""
+    df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    if 'time' in df.columns:
+        df = df.sort_values('time', kind='stable').reset_index(drop=True)
+    return df
+
+def param_candidates(grid=PARAM_GRID):
+    """Todas las combinaciones de hiperparámetros de la rejilla."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def _fit_and_score(params, fold, train_idx, test_idx, X, y, threshold):
+    """
+    Entrena un candidato en un fold y mide precisión y tiempos. Se ejecuta en un worker.
+    Una predicción es "ganadora" si su probabilidad llega a `threshold`, como en el bot.
+    """
+    model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    train_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    probabilities = model.predict_proba(X[test_idx])[:, 1]
+    score_time = time.perf_counter() - start
+
+    predictions = (probabilities >= threshold).astype(int)
+    return {
+        'config': ', '.join(f"{k}={v}" for k, v in params.items()),
+        **params,
+        'fold': fold,
+        'precision': precision_score(y[test_idx], predictions, zero_division=0),
+        'accuracy': accuracy_score(y[test_idx], predictions),
+        'signal_rate': predictions.mean(),
+        'train_time_s': train_time,
+        'score_time_us_per_row': score_time / len(test_idx) * 1e6,
+    }
+
+def run_cv_search(df, n_splits=CV_SPLITS, n_jobs=-1, grid=PARAM_GRID, threshold=None):
+    """
+    Validación cruzada temporal con ventana expansiva sobre toda la rejilla, puntuada en el
+    umbral de confianza del bot (cfg.ML_CONFIDENCE_THRESHOLD por defecto). Los folds se
+    calculan una sola vez y todas las combinaciones (fold x candidato) se reparten entre núcleos;
+    joblib comparte X/y con los workers mediante memmap en lugar de copiarlos.
+    """
+    threshold = cfg.ML_CONFIDENCE_THRESHOLD if threshold is None else threshold
+    X = df[FEATURES].to_numpy(dtype=float)
+    y = df[LABEL].to_numpy()
+    splits = list(TimeSeriesSplit(n_splits=n_splits).split(X))
+    candidates = param_candidates(grid)
+    print(f"⏳ Evaluando {len(candidates)} configuraciones x {len(splits)} folds ({len(candidates) * len(splits)} entrenamientos)...")
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_and_score)(params, fold, train_idx, test_idx, X, y, threshold)
+        for params in candidates
+        for fold, (train_idx, test_idx) in enumerate(splits)
+    )
+
+    per_fold = pd.DataFrame(results)
+    # Se agrupa por la etiqueta de texto de la configuración porque max_depth=None rompería el groupby
+    report = per_fold.groupby('config', sort=False).agg(
+        precision_mean=('precision', 'mean'),
+        precision_std=('precision', 'std'),
+        accuracy_mean=('accuracy', 'mean'),
+        signal_rate=('signal_rate', 'mean'),
+        train_time_s=('train_time_s', 'mean'),
+        score_time_us_per_row=('score_time_us_per_row', 'mean'),
+    ).reset_index()
+    return report.sort_values(['precision_mean', 'score_time_us_per_row'], ascending=[False, True]).reset_index(drop=True)
+
+def benchmark_model(model, X_sample):
+    """
+    Mide lo que cuesta el modelo en el bucle en vivo: latencia de predict_proba de una fila
+    (DataFrame con nombres de columnas, igual que el bot) y por lotes, tamaño en disco y
+    tiempo de carga (como lo carga el registro de modelos).
+    """
+    single = X_sample.iloc[[0]]
+    model.predict_proba(single)  # Calentamiento
+    timings = np.empty(LATENCY_SINGLE_CALLS)
+    for i in range(LATENCY_SINGLE_CALLS):
+        row = X_sample.iloc[[i % len(X_sample)]]
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings[i] = time.perf_counter() - start
 
+    batch = X_sample.iloc[np.arange(LATENCY_BATCH_ROWS) % len(X_sample)]
+    start = time.perf_counter()
+    model.predict_proba(batch)
+    batch_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'candidate.joblib')
+        joblib.dump(model, path)
+        size = os.path.getsize(path)
+        load_times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            loaded = joblib.load(path)
+            load_times.append(time.perf_counter() - start)
+            del loaded
+
+    return {
+        'single_p50_ms': np.percentile(timings, 50) * 1e3,
+        'single_p99_ms': np.percentile(timings, 99) * 1e3,
+        'batch_us_per_row': batch_time / len(batch) * 1e6,
+        'size_mb': size / 1e6,
+        'load_time_ms': min(load_times) * 1e3,
+    }
+
+def save_model(model, path=MODEL_OUTPUT_FILE):
+    """
+    Guarda el modelo de forma atómica (archivo temporal + rename). Si el destino está en uso
+    (en Windows, abierto por el bot), lo guarda como la siguiente versión `<nombre>_v<N>.joblib`,
+    que el registro de modelos del bot detecta y carga entre ciclos. Una vez que existe alguna
+    versión `_v<N>`, las siguientes también se guardan versionadas: el registro elige la de mayor
+    N y un archivo sin sufijo más reciente quedaría por debajo.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    pattern = re.compile(rf"^{re.escape(stem)}_v(\d+)\.joblib$")
+    versions = [int(m.group(1)) for m in map(pattern.match, os.listdir(directory)) if m]
+    versioned = os.path.join(directory, f"{stem}_v{max(versions, default=0) + 1}.joblib")
+    tmp_path = f"{path}.tmp"
+    joblib.dump(model, tmp_path)
+    if versions:
+        os.replace(tmp_path, versioned)
+        return versioned
+    try:
+        os.replace(tmp_path, path)
+        return path
+    except PermissionError:
+        os.replace(tmp_path, versioned)
+        return versioned
+
+def select_model(df, cv_report, top_k=SELECT_TOP_K, max_p99_ms=None, grid=PARAM_GRID):
+    """
+    Reentrena con todos los datos las `top_k` mejores configuraciones del CV, mide su coste
+    de inferencia y elige la de mayor precisión que cumpla la restricción de p99 (si la hay;
+    a igual precisión, la más rápida). Solo se conserva en memoria el mejor modelo hasta el momento.
+    Devuelve (reporte, modelo elegido o None).
+    """
+    X = df[FEATURES]
+    y = df[LABEL]
+    params_by_config = {', '.join(f"{k}={v}" for k, v in p.items()): p for p in param_candidates(grid)}
+
+    rows = []
+    best_model, best_key, best_config = None, None, None
+    for _, candidate in cv_report.head(top_k).iterrows():
+        params = params_by_config[candidate['config']]
+        model = RandomForestClassifier(random_state=42, n_jobs=-1, **params)
+        model.fit(X, y)
+        model.n_jobs = 1 # Puntuación de una fila: sin pool de hilos
+        metrics = benchmark_model(model, X)
+        meets = max_p99_ms is None or metrics['single_p99_ms'] < max_p99_ms
+        rows.append({**candidate.to_dict(), **metrics, 'meets_constraint': meets})
+        print(f"  -> {candidate['config']}: p99 {metrics['single_p99_ms']:.3f} ms, {metrics['size_mb']:.1f} MB")
+        key = (-candidate['precision_mean'], metrics['single_p99_ms'])
+        if meets and (best_key is None or key < best_key):
+            best_model, best_key, best_config = model, key, candidate['config']
+        del model
+
+    report = pd.DataFrame(rows)
+    report['selected'] = report['config'] == best_config
+    return report, best_model
+
+def train_fixed(df, output=MODEL_OUTPUT_FILE):
+    """Entrenamiento original: un único split temporal 70/30 y un RandomForest fijo."""
     # 2. Definir Features (X) y Labels (y)
     # Las features son los indicadores que guardamos
-    features = ['rsi', 'macd_hist', 'adx', 'atr_normalized']
     # La label es si el trade fue ganador o no
-    label = 'is_winner'
-
-    X = df[features]
-    y = df[label]
+    X = df[FEATURES]
+    y = df[LABEL]
 
     # 3. Dividir los datos para entrenamiento y prueba
     # Mantenemos shuffle=False por buenas prácticas con datos de series de tiempo
@@ -54,6 +242,51 @@ if __name__ == "__main__":
     print(classification_report(y_test, predictions, target_names=['Loser (0)', 'Winner (1)']))
 
     # 6. Guardar el modelo de filtro final
-    model_filename = '/models/trading_filter_model.joblib'
-    joblib.dump(model, model_filename)
-    print(f"\n✅ Modelo de FILTRO guardado como '{model_filename}'")
\ No newline at end of file
+    model.n_jobs = 1 # En vivo se puntúa una fila a la vez: sin pool de hilos la latencia es menor
+    model_filename = save_model(model, output)
+    print(f"\n✅ Modelo de FILTRO guardado como '{model_filename}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrena el modelo de filtro ML de la estrategia V4.")
+    parser.add_argument('--data', default=DATA_FILE, help="Dataset de trades (.csv o .parquet)")
+    parser.add_argument('--cv', action='store_true', help="Validación cruzada temporal + búsqueda de hiperparámetros")
+    parser.add_argument('--splits', type=int, default=CV_SPLITS)
+    parser.add_argument('--jobs', type=int, default=-1, help="Procesos para la búsqueda (-1 = todos los núcleos)")
+    parser.add_argument('--report', default=CV_REPORT_FILE)
+    parser.add_argument('--umbral', type=float, default=cfg.ML_CONFIDENCE_THRESHOLD,
+                        help="Umbral de confianza con el que se puntúan los folds (el del bot por defecto)")
+    parser.add_argument('--select', action='store_true',
+                        help="Tras el CV, mide la latencia de los mejores candidatos y guarda el elegido")
+    parser.add_argument('--top', type=int, default=SELECT_TOP_K)
+    parser.add_argument('--max-p99-ms', type=float, default=None,
+                        help="Restricción opcional: p99 de predict_proba de una fila por debajo de este valor")
+    parser.add_argument('--output', default=MODEL_OUTPUT_FILE)
+    args = parser.parse_args()
+
+    # 1. Cargar el dataset de trades
+    print(f"Cargando datos de trades desde '{args.data}'...")
+    df = load_dataset(args.data)
+
+    if args.cv or args.select:
+        report = run_cv_search(df, args.splits, args.jobs, threshold=args.umbral)
+        print(f"\n--- 📊 Validación cruzada temporal, umbral {args.umbral:.2f} (ordenado por precisión) ---")
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        report.to_csv(args.report, index=False)
+        print(f"\n✅ Reporte guardado en '{args.report}'")
+
+    if args.select:
+        print(f"\n⏳ Midiendo latencia de inferencia de los {args.top} mejores candidatos...")
+        selection, model = select_model(df, report, args.top, args.max_p99_ms)
+        print("\n--- ⏱️ Selección por precisión y latencia ---")
+        columns = ['config', 'precision_mean', 'single_p50_ms', 'single_p99_ms', 'batch_us_per_row',
+                   'size_mb', 'load_time_ms', 'meets_constraint']
+        print(selection[columns].to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        selection.to_csv(SELECTION_REPORT_FILE, index=False)
+        print(f"\n✅ Reporte de selección guardado en '{SELECTION_REPORT_FILE}'")
+        if model is None:
+            print(f"❌ Ningún candidato cumple p99 < {args.max_p99_ms} ms. No se guardó ningún modelo.")
+        else:
+            model_filename = save_model(model, args.output)
+            print(f"✅ Modelo elegido ({selection.loc[selection['selected'], 'config'].iloc[0]}) guardado como '{model_filename}'")
+    elif not args.cv:
+        train_fixed(df, args.output)
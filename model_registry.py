@@ -0,0 +1,89 @@
+# /model_registry.py
+import os
+import re
+import logging
+import metrics
+from log_manager import console
+
+
+class ModelRegistry:
+    """
+    Registro del modelo de filtro ML con carga perezosa y recarga en caliente.
+
+    Busca en `model_dir` artefactos `<basename>.joblib` o `<basename>_v<N>.joblib`;
+    gana el de mayor N (el archivo sin sufijo cuenta como versión 0). El modelo no se
+    lee hasta que se pide por primera vez. Se carga entero en RAM: con `mmap_mode` el
+    RandomForest no ganaría nada, porque sklearn copia los arrays de los árboles al deserializarlos.
+    `refresh()` se llama entre ciclos: si aparece un artefacto más nuevo (o el actual se
+    reescribe) se carga aparte y se intercambia la referencia de una sola vez.
+    """
+
+    def __init__(self, model_dir, basename):
+        self.model_dir = model_dir
+        self.basename = basename
+        self._pattern = re.compile(rf"^{re.escape(basename)}(?:_v(\d+))?\.joblib$")
+        self._artifact = None  # (ruta, versión) del artefacto más reciente en disco
+        self._loaded = None    # (modelo, versión) actualmente en uso
+
+    def _scan(self):
+        """Devuelve (ruta, versión) del artefacto más reciente, o None si no hay ninguno."""
+        best = None
+        try:
+            entries = list(os.scandir(self.model_dir))
+        except FileNotFoundError:
+            return None
+        for entry in entries:
+            match = self._pattern.match(entry.name)
+            if not match or not entry.is_file():
+                continue
+            number = int(match.group(1) or 0)
+            mtime_ns = entry.stat().st_mtime_ns
+            if best is None or (number, mtime_ns) > best[0]:
+                best = ((number, mtime_ns), entry.path, entry.name)
+        if best is None:
+            return None
+        (number, mtime_ns), path, name = best
+        return path, f"{name}@{mtime_ns // 1_000_000_000}"
+
+    def _load(self, path, version):
+        import joblib  # Diferido: joblib/sklearn solo se importan al cargar el modelo
+        model = joblib.load(path)
+        self._loaded = (model, version)
+        logging.info("Modelo de ML cargado: %s", version)
+        console.info("✅ Modelo de Machine Learning cargado: %s", version)
+
+    def available(self):
+        """Indica si existe algún artefacto de modelo, sin cargarlo."""
+        self._artifact = self._scan()
+        return self._artifact is not None
+
+    def refresh(self):
+        """Detecta un artefacto nuevo y, si el modelo ya estaba en uso, lo intercambia."""
+        artifact = self._scan()
+        if artifact is None or artifact == self._artifact:
+            return False
+        self._artifact = artifact
+        if self._loaded is None:
+            return False  # Aún no se ha usado: se cargará la versión nueva cuando se pida
+        path, version = artifact
+        try:
+            self._load(path, version)
+        except Exception as e:
+            # Artefacto incompleto o corrupto: seguimos con el modelo anterior
+            logging.error("No se pudo recargar el modelo '%s': %s. Se mantiene %s", path, e, self._loaded[1])
+            console.warning("⚠️ No se pudo recargar el modelo '%s'. Se mantiene la versión %s.", path, self._loaded[1])
+            return False
+        metrics.increment('model_reloads')
+        return True
+
+    def get(self):
+        """Devuelve (modelo, versión), cargándolo la primera vez. (None, None) si no hay modelo."""
+        if self._loaded is None:
+            if self._artifact is None and not self.available():
+                return None, None
+            path, version = self._artifact
+            metrics.cache_miss('model')
+            self._load(path, version)
+        else:
+            metrics.cache_hit('model')
+        return self._loaded
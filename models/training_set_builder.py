@@ -0,0 +1,163 @@
+# training_set_builder.py
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import glob
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import bar_store
+from data_generator_for_ml import label_v4_trades
+
+# --- PARÁMETROS ---
+DATA_DIR = "."
+DATA_FILE_PATTERN = "{symbol}_{timeframe}_data_*.csv" # Ej.: EURUSD_M5_data_1Y.csv, EURUSD_M5_data_5Y.csv
+OUTPUT_FILE = "v4_training_set.parquet"
+WARMUP_BARS = 500      # Velas previas al rango para que los indicadores (EWM) se estabilicen
+LOOKAHEAD_BARS = 5000  # Velas posteriores al rango para resolver los trades abiertos al final
+
+def data_files(symbol, timeframe, data_dir=DATA_DIR):
+    """CSV locales de un símbolo/timeframe (FileNotFoundError si no hay ninguno)."""
+    pattern = os.path.join(data_dir, DATA_FILE_PATTERN.format(symbol=symbol, timeframe=timeframe))
+    files = sorted(glob.glob(pattern))
+    if not files:
+        raise FileNotFoundError(f"No hay datos para {symbol} {timeframe} ({pattern})")
+    return files
+
+def load_bars(symbol, timeframe, data_dir=DATA_DIR):
+    """Carga y une todos los CSV locales de un símbolo/timeframe, sin velas duplicadas."""
+    files = data_files(symbol, timeframe, data_dir)
+    df = pd.concat([pd.read_csv(f, parse_dates=['time']) for f in files], ignore_index=True)
+    df.sort_values('time', inplace=True)
+    df.drop_duplicates(subset='time', keep='first', inplace=True)
+    return df.reset_index(drop=True)
+
+def merged_path(symbol, timeframe, store_dir=None):
+    return bar_store.store_path(symbol, f"{timeframe}_all", store_dir)
+
+def build_merged(symbol, timeframe, data_dir=DATA_DIR, store_dir=None):
+    """
+    Une una sola vez todos los CSV del símbolo en un .npy de bar_store, que los tramos abren
+    mapeado en memoria para leer solo su rango. Se regenera si algún CSV es más reciente.
+    """
+    files = data_files(symbol, timeframe, data_dir)
+    target = merged_path(symbol, timeframe, store_dir)
+    if os.path.exists(target) and os.path.getmtime(target) >= max(map(os.path.getmtime, files)):
+        return target
+    return bar_store.save(bar_store.from_frame(load_bars(symbol, timeframe, data_dir)), target)
+
+def build_job(symbol, timeframe, start, end, data_dir=DATA_DIR, use_m1=False):
+    """
+    Genera las filas etiquetadas de un símbolo en [start, end). Se ejecuta en un proceso
+    del pool, sobre el .npy de build_merged: solo se copian a memoria las velas del tramo
+    (con el calentamiento y el margen para cerrar trades). Cada tramo arranca sin posición
+    abierta, así que un trade que cruce el inicio del tramo puede diferir del que saldría
+    procesando toda la historia de una vez.
+    Con `use_m1`, las velas que tocan TP y SL se resuelven con las M1 de bar_store.
+    Devuelve (filas, resumen de la resolución con M1 o None).
+    """
+    bars = np.load(merged_path(symbol, timeframe), mmap_mode='r')
+    seconds = [pd.Timestamp(t).to_datetime64().astype('datetime64[s]').astype(np.int64) for t in (start, end)]
+    first, last = np.searchsorted(bars['time'], seconds)
+    window = bar_store.to_frame(bars[max(0, first - WARMUP_BARS):last + LOOKAHEAD_BARS])
+
+    intrabar = bar_store.open_intrabar(symbol, timeframe, data_dir=data_dir) if use_m1 else None
+    rows = label_v4_trades(window, intrabar)
+    rows = rows[(rows['time'] >= start) & (rows['time'] < end)]
+    rows.insert(0, 'timeframe', timeframe)
+    rows.insert(0, 'symbol', symbol)
+    return rows.reset_index(drop=True), intrabar.report() if intrabar is not None else None
+
+def split_jobs(symbols, timeframe, start, end, months_per_job=12):
+    """Divide cada símbolo en tramos de `months_per_job` meses para repartirlos entre núcleos."""
+    edges = list(pd.date_range(start, end, freq=pd.DateOffset(months=months_per_job)))
+    if not edges or edges[-1] < pd.Timestamp(end):
+        edges.append(pd.Timestamp(end))
+    return [(symbol, timeframe, a, b) for symbol in symbols for a, b in zip(edges[:-1], edges[1:])]
+
+class _TrainingSetWriter:
+    """Escribe por lotes en Parquet (si pyarrow está instalado) o en CSV como alternativa."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._writer = None
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            self._pa = pyarrow
+        except ImportError:
+            self._pa = None
+            if path.endswith('.parquet'):
+                self.path = path[:-len('.parquet')] + '.csv'
+            print(f"⚠️ pyarrow no está instalado. Se escribirá en CSV: '{self.path}'")
+
+    def write(self, df):
+        if df.empty:
+            return
+        if self._pa is None:
+            df.to_csv(self.path, mode='a', header=self.rows == 0, index=False)
+        else:
+            table = self._pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = self._pa.parquet.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def build_training_set(jobs, output_file=OUTPUT_FILE, workers=None, data_dir=DATA_DIR, use_m1=False):
+    """Ejecuta los tramos en un pool de procesos y vuelca cada resultado al archivo según llega."""
+    writer = _TrainingSetWriter(output_file)
+    if os.path.exists(writer.path):  # Sin pyarrow es el .csv: no hay que añadir filas a uno anterior
+        os.remove(writer.path)
+    available = set()
+    for symbol, timeframe in dict.fromkeys((job[0], job[1]) for job in jobs):
+        try:
+            build_merged(symbol, timeframe, data_dir)
+            available.add((symbol, timeframe))
+        except FileNotFoundError as e:
+            print(f"⚠️ {e}. Símbolo omitido.")
+    jobs = [job for job in jobs if (job[0], job[1]) in available]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(build_job, *job, data_dir=data_dir, use_m1=use_m1): job for job in jobs}
+            for future in as_completed(futures):
+                symbol, timeframe, start, end = futures[future]
+                try:
+                    rows, m1_report = future.result()
+                except FileNotFoundError as e:
+                    print(f"⚠️ {e}. Tramo omitido.")
+                    continue
+                writer.write(rows)
+                print(f"  -> {symbol} {timeframe} {start:%Y-%m-%d} a {end:%Y-%m-%d}: {len(rows)} trades")
+                if m1_report:
+                    print(f"     🔍 {m1_report}")
+    finally:
+        writer.close()
+    return writer.path, writer.rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el dataset de entrenamiento V4 para varios símbolos y años en paralelo.")
+    parser.add_argument('--symbols', nargs='+', default=["EURUSD", "GBPUSD", "USDJPY"])
+    parser.add_argument('--timeframe', default="M5")
+    parser.add_argument('--start', required=True, help="Fecha inicial, p. ej. 2020-01-01")
+    parser.add_argument('--end', required=True, help="Fecha final (excluida)")
+    parser.add_argument('--months-per-job', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=None, help="Procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--m1', action='store_true',
+                        help="Resuelve con velas M1 (bar_store) las velas que tocan TP y SL.")
+    args = parser.parse_args()
+
+    jobs = split_jobs(args.symbols, args.timeframe, args.start, args.end, args.months_per_job)
+    print(f"🚀 Generando dataset: {len(args.symbols)} símbolo(s), {len(jobs)} tramo(s)...")
+    path, total = build_training_set(jobs, args.output, args.workers, args.data_dir, args.m1)
+    print(f"\n✅ ¡Éxito! Se guardaron {total} trades en '{path}'")
@@ -0,0 +1,99 @@
+# /monte_carlo.py
+import numpy as np
+import pandas as pd
+
+# Monte Carlo de riesgo sobre los trades de un backtest: se remuestrean (bootstrap, con
+# reemplazo) los R-múltiplos de los trades miles de veces y cada secuencia se opera con el mismo
+# dimensionado que el bot (calculate_universal_lot_size: riesgo fijo sobre el balance, lote
+# redondeado al volume_step y acotado a volume_min/volume_max). Todas las simulaciones de un
+# bloque avanzan a la vez como columnas de un array; los bloques acotan la memoria.
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def r_multiples(trades):
+    """R-múltiplo de cada trade (resultado / distancia al SL): -1 en un SL, TP_MULT/SL_MULT en un TP."""
+    direction = np.where(trades['type'].to_numpy() == 'BUY', 1.0, -1.0)
+    entry = trades['entry_price'].to_numpy(dtype=float)
+    risk = np.abs(entry - trades['sl'].to_numpy(dtype=float))
+    return (trades['exit_price'].to_numpy(dtype=float) - entry) * direction / risk
+
+
+def loss_per_lot(trades, meta, account_currency, conversion_rate=None):
+    """
+    Pérdida en la divisa de la cuenta de 1 lote si salta el SL, con la misma conversión que
+    calculate_universal_lot_size (divisa de margen del símbolo -> divisa de la cuenta). Si el par
+    de conversión es el propio símbolo se usa su precio de entrada; en un cruce hay que pasar
+    `conversion_rate` (precio de <margen><cuenta>, p. ej. EURUSD para EURGBP en una cuenta USD).
+    Sin él se lanza ValueError, igual que el bot no opera si no encuentra el par de conversión.
+    """
+    entry = trades['entry_price'].to_numpy(dtype=float)
+    loss = np.abs(entry - trades['sl'].to_numpy(dtype=float)) * meta.trade_contract_size
+    quote_currency = meta.currency_margin
+    if quote_currency == account_currency:
+        return loss
+    if meta.name == f"{quote_currency}{account_currency}":
+        return loss * entry
+    if meta.name == f"{account_currency}{quote_currency}":
+        return loss / entry
+    if conversion_rate is None or conversion_rate <= 0:
+        raise ValueError(f"{meta.name}: hace falta el tipo {quote_currency}{account_currency} "
+                         f"para convertir la pérdida a {account_currency}")
+    return loss * conversion_rate
+
+
+def simulate(r, risk_per_lot, meta, risk_percent, initial_balance, n_sims, n_trades=None,
+             ruin_level=0.5, chunk_sims=2000, seed=None):
+    """
+    `n_sims` secuencias de `n_trades` trades (por defecto, tantos como en el backtest) sacados
+    con reemplazo de (r, risk_per_lot). Devuelve un dict con el drawdown máximo (fracción del
+    pico) y el balance final de cada simulación, y si cayó alguna vez por debajo de
+    `ruin_level` * balance inicial (ruina).
+    """
+    r = np.asarray(r, dtype=float)
+    risk_per_lot = np.asarray(risk_per_lot, dtype=float)
+    n_trades = n_trades or len(r)
+    rng = np.random.default_rng(seed)
+    max_drawdown = np.empty(n_sims)
+    final_balance = np.empty(n_sims)
+    ruined = np.empty(n_sims, dtype=bool)
+    ruin_balance = initial_balance * ruin_level
+
+    for start in range(0, n_sims, chunk_sims):
+        size = min(chunk_sims, n_sims - start)
+        picks = rng.integers(0, len(r), size=(size, n_trades))
+        sample_r = r[picks]
+        sample_loss = risk_per_lot[picks]
+        balance = np.full(size, float(initial_balance))
+        peak = balance.copy()
+        worst = np.zeros(size)
+        alive = np.ones(size, dtype=bool)
+        # El lote depende del balance de cada momento: se avanza trade a trade, todas las simulaciones a la vez
+        for t in range(n_trades):
+            lot = balance * risk_percent / sample_loss[:, t]
+            if meta.volume_step > 0:
+                lot = np.round(lot / meta.volume_step) * meta.volume_step
+            lot = np.clip(lot, meta.volume_min, meta.volume_max)
+            # Una cuenta arruinada deja de operar
+            balance += np.where(alive, lot * sample_loss[:, t] * sample_r[:, t], 0.0)
+            np.maximum(peak, balance, out=peak)
+            np.maximum(worst, 1.0 - balance / peak, out=worst)
+            alive &= balance > ruin_balance
+        max_drawdown[start:start + size] = worst
+        final_balance[start:start + size] = balance
+        ruined[start:start + size] = ~alive
+
+    return {'max_drawdown': max_drawdown, 'final_balance': final_balance, 'ruined': ruined}
+
+
+def summarize(results, initial_balance, percentiles=PERCENTILES):
+    """Percentiles de drawdown máximo y balance final, y probabilidad de ruina."""
+    dd = np.percentile(results['max_drawdown'], percentiles) * 100
+    final = np.percentile(results['final_balance'], percentiles)
+    table = pd.DataFrame({
+        'percentil': percentiles,
+        'drawdown_max_%': dd,
+        'balance_final': final,
+        'retorno_%': (final / initial_balance - 1) * 100,
+    })
+    return table, float(results['ruined'].mean())
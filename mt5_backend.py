@@ -0,0 +1,22 @@
+# /mt5_backend.py
+import os
+
+def get_mt5(backend=None):
+    """
+    Devuelve el módulo con la API de MetaTrader5 según el backend configurado:
+    'terminal' (paquete MetaTrader5 real, solo Windows) o 'simulator' (mt5_simulator, offline).
+    """
+    backend = backend or os.environ.get('MT5_BACKEND', 'terminal')
+    if backend == 'simulator':
+        import mt5_simulator as mt5
+    else:
+        import MetaTrader5 as mt5
+    return mt5
+
+def timeframe(mt5, value):
+    """Traduce un timeframe con nombre ('M5', 'H1', ...) a la constante del backend."""
+    return getattr(mt5, f"TIMEFRAME_{value}") if isinstance(value, str) else value
+
+def filling_mode(mt5, value):
+    """Traduce un modo de llenado con nombre ('FOK', 'IOC', 'RETURN') a la constante del backend."""
+    return getattr(mt5, f"ORDER_FILLING_{value}") if isinstance(value, str) else value
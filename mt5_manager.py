@@ -1,49 +1,66 @@
 # /mt5_manager.py
-import MetaTrader5 as mt5
-import pandas as pd
 import logging
 import config as cfg
+import mt5_backend
 import time
 from config import *
-from state_manager import save_trailing_stop_state
+from state_manager import queue_trailing_stop_records
+import operational_store as ops
+import latency
+import metrics
+from log_manager import console
+
+mt5 = mt5_backend.get_mt5(cfg.MT5_BACKEND)
 
 def get_rates(symbol, timeframe, bars):
     """Obtiene datos de velas de MT5 y los convierte a un DataFrame de Pandas."""
+    import pandas as pd  # Diferido: no hace falta para conectar ni para arrancar el bot
     try:
-        data = mt5.copy_rates_from_pos(symbol, timeframe, 0, bars)
+        with latency.stage(symbol, 'get_rates'):
+            data = mt5.copy_rates_from_pos(symbol, mt5_backend.timeframe(mt5, timeframe), 0, bars)
         if data is None or len(data) == 0:
-            logging.warning(f"[{symbol}] No se pudieron obtener datos históricos. Error: {mt5.last_error()}")
-            print(f"[{symbol}] ⚠️ Advertencia: No se pudieron obtener datos históricos.")
+            logging.warning("[%s] No se pudieron obtener datos históricos. Error: %s", symbol, mt5.last_error())
+            console.warning("[%s] ⚠️ Advertencia: No se pudieron obtener datos históricos.", symbol)
             return pd.DataFrame()
         df = pd.DataFrame(data)
         df['time'] = pd.to_datetime(df['time'], unit='s')
         return df
     except Exception as e:
-        logging.error(f"[{symbol}] Error al obtener o procesar datos de velas: {e}")
-        print(f"[{symbol}] ❌ Error: Fallo al procesar datos de velas.")
+        logging.error("[%s] Error al obtener o procesar datos de velas: %s", symbol, e)
+        console.error("[%s] ❌ Error: Fallo al procesar datos de velas.", symbol)
         return pd.DataFrame()
 
 def send_trade_request(request, symbol):
     for i in range(cfg.MAX_RETRIES):
-        result = mt5.order_send(request)
+        metrics.increment('order_send_attempts')
+        if i > 0:
+            metrics.increment('order_send_retries')
+        with latency.stage(symbol, 'order_send'):
+            result = mt5.order_send(request)
+        ops.record_order(symbol, request, i + 1, result)
         if result.retcode == mt5.TRADE_RETCODE_DONE:
             action_desc = request.get('action_description', request['action'])
-            logging.info(f"[{symbol}] Operación exitosa. Tipo: {action_desc}, Volumen: {request['volume']:.2f}. Ticket: {result.order}. Retcode: {result.retcode}")
-            print(f"✅ [{symbol}] Operación exitosa. Ticket: {result.order}, Tipo: {action_desc}, Vol: {request['volume']:.2f}")
+            logging.info("[%s] Operación exitosa. Tipo: %s, Volumen: %.2f. Ticket: %s. Retcode: %s",
+                         symbol, action_desc, request.get('volume', 0.0), result.order, result.retcode)
+            console.info("✅ [%s] Operación exitosa. Ticket: %s, Tipo: %s, Vol: %.2f",
+                         symbol, result.order, action_desc, request.get('volume', 0.0))
             return True, result
         else:
-            logging.error(f"[{symbol}] Falló la operación ({i+1}/{cfg.MAX_RETRIES}). Error: {result.retcode} - {result.comment}. Solicitud: {request}")
-            print(f"❌ [{symbol}] Falló la operación. Código: {result.retcode}, Comentario: {result.comment}. Reintento {i+1}/{cfg.MAX_RETRIES}")
+            logging.error("[%s] Falló la operación (%d/%d). Error: %s - %s. Solicitud: %s",
+                          symbol, i + 1, cfg.MAX_RETRIES, result.retcode, result.comment, request)
+            console.error("❌ [%s] Falló la operación. Código: %s, Comentario: %s. Reintento %d/%d",
+                          symbol, result.retcode, result.comment, i + 1, cfg.MAX_RETRIES)
             if result.retcode == mt5.TRADE_RETCODE_REQUOTE:
-                logging.warning(f"[{symbol}] Requote detectado. Reintentando...")
+                logging.warning("[%s] Requote detectado. Reintentando...", symbol)
                 time.sleep(1)
             elif result.retcode == mt5.TRADE_RETCODE_NO_CHANGES:
-                logging.info(f"[{symbol}] No se requiere ningún cambio o la orden ya fue procesada: {result.comment}")
+                logging.info("[%s] No se requiere ningún cambio o la orden ya fue procesada: %s", symbol, result.comment)
                 return True, result
             else:
                 time.sleep(1)
-    logging.error(f"[{symbol}] Fallo definitivo de la operación después de {cfg.MAX_RETRIES} reintentos.")
-    print(f"🔴 [{symbol}] Fallo definitivo después de {cfg.MAX_RETRIES} intentos.")
+    metrics.increment('order_requests_failed')
+    logging.error("[%s] Fallo definitivo de la operación después de %d reintentos.", symbol, cfg.MAX_RETRIES)
+    console.error("🔴 [%s] Fallo definitivo después de %d intentos.", symbol, cfg.MAX_RETRIES)
     return False, None
 
 def calculate_universal_lot_size(symbol, account_info, atr_val):
@@ -95,7 +112,7 @@ def open_position(symbol, trade_type, lot, price, sl, tp):
     request = {
         "action": mt5.TRADE_ACTION_DEAL, "symbol": symbol, "volume": lot, "type": trade_type,
         "price": price, "sl": sl, "tp": tp, "deviation": DEVIATION_PIPS, "magic": MAGIC_NUMBER,
-        "type_time": mt5.ORDER_TIME_GTC, "type_filling": FILLING_MODE,
+        "type_time": mt5.ORDER_TIME_GTC, "type_filling": mt5_backend.filling_mode(mt5, FILLING_MODE),
         "action_description": action_description
     }
     return send_trade_request(request, symbol)
@@ -103,8 +120,8 @@ def open_position(symbol, trade_type, lot, price, sl, tp):
 def close_position(position, symbol, price_type):
     current_tick = mt5.symbol_info_tick(symbol)
     if current_tick is None:
-        logging.error(f"[{symbol}] No se pudo obtener el tick para cerrar posición.")
-        print(f"❌ [{symbol}] No se pudo obtener el precio actual para cerrar la posición {position.ticket}.")
+        logging.error("[%s] No se pudo obtener el tick para cerrar posición.", symbol)
+        console.error("❌ [%s] No se pudo obtener el precio actual para cerrar la posición %s.", symbol, position.ticket)
         return False, None
 
     price_to_use = current_tick.ask if price_type == mt5.ORDER_TYPE_BUY else current_tick.bid
@@ -113,31 +130,46 @@ def close_position(position, symbol, price_type):
         "action": mt5.TRADE_ACTION_DEAL, "symbol": symbol, "volume": position.volume,
         "type": price_type, "position": position.ticket, "price": price_to_use,
         "deviation": DEVIATION_PIPS, "magic": MAGIC_NUMBER, "type_time": mt5.ORDER_TIME_GTC,
-        "type_filling": FILLING_MODE, "action_description": action_description
+        "type_filling": mt5_backend.filling_mode(mt5, FILLING_MODE), "action_description": action_description
     }
     return send_trade_request(request, symbol)
 
 
-def manage_trailing_stops(symbol, current_positions, atr_val, current_ask, current_bid, managed_trailing_stops_dict):
-    if not TRAILING_STOP_ACTIVE or atr_val is None or atr_val <= 0:
+def manage_trailing_stops(symbol, current_positions, atr_val, current_ask, current_bid, managed_trailing_stops_dict,
+                          modify_sl=True):
+    """
+    Gestiona el trailing stop de las posiciones de `symbol`. El estado está particionado por
+    (símbolo, magic): cada pasada solo recorre y modifica su propia partición.
+    Con modify_sl=False (LIVE_TRAILING_STOP desactivado) no se envía ningún TRADE_ACTION_SLTP:
+    solo se concilia el estado con las posiciones abiertas (altas, bajas y SL actual de cada una).
+    """
+    if not TRAILING_STOP_ACTIVE:
+        return
+    trailing = modify_sl and atr_val is not None and atr_val > 0
+    if modify_sl and not trailing:
         return
 
-    trailing_distance_points = atr_val * TRAILING_STOP_DISTANCE_ATR
-    min_profit_for_trail_points = atr_val * MIN_PROFIT_TO_TRAIL_ATR
-    active_tickets_for_symbol = {pos.ticket for pos in current_positions if pos.symbol == symbol}
-    state_changed = False
-
-    for pos in current_positions:
-        if pos.symbol != symbol or pos.magic != MAGIC_NUMBER:
+    managed_for_symbol = managed_trailing_stops_dict.setdefault((symbol, MAGIC_NUMBER), {})
+    my_positions = [pos for pos in current_positions if pos.symbol == symbol and pos.magic == MAGIC_NUMBER]
+    active_tickets_for_symbol = {pos.ticket for pos in my_positions}
+    state_changes = []  # (ticket, sl) para el journal; sl=None si el ticket deja de gestionarse
+
+    for pos in my_positions:
+        if pos.ticket not in managed_for_symbol:
+            managed_for_symbol[pos.ticket] = pos.sl
+            state_changes.append((pos.ticket, pos.sl))
+            logging.info("[%s] Posición %s añadida a gestión de TS. SL actual: %.5f", symbol, pos.ticket, pos.sl)
+            console.info("[%s] ℹ️ Posición %s añadida a gestión de Trailing Stop.", symbol, pos.ticket)
+        elif not trailing and managed_for_symbol[pos.ticket] != pos.sl:
+            # Sin trailing el SL solo cambia fuera del bot: se guarda el que tiene la posición
+            managed_for_symbol[pos.ticket] = pos.sl
+            state_changes.append((pos.ticket, pos.sl))
+        if not trailing:
             continue
-        
-        if pos.ticket not in managed_trailing_stops_dict:
-            managed_trailing_stops_dict[pos.ticket] = pos.sl
-            state_changed = True
-            logging.info(f"[{symbol}] Posición {pos.ticket} añadida a gestión de TS. SL actual: {pos.sl:.5f}")
-            print(f"[{symbol}] ℹ️ Posición {pos.ticket} añadida a gestión de Trailing Stop.")
 
-        last_known_sl = managed_trailing_stops_dict.get(pos.ticket, pos.sl)
+        trailing_distance_points = atr_val * TRAILING_STOP_DISTANCE_ATR
+        min_profit_for_trail_points = atr_val * MIN_PROFIT_TO_TRAIL_ATR
+        last_known_sl = managed_for_symbol.get(pos.ticket, pos.sl)
         is_buy = pos.type == mt5.POSITION_TYPE_BUY
         
         if is_buy:
@@ -159,17 +191,19 @@ def manage_trailing_stops(symbol, current_positions, atr_val, current_ask, curre
             }
             success, _ = send_trade_request(request, symbol)
             if success:
-                managed_trailing_stops_dict[pos.ticket] = new_sl_potential
-                state_changed = True
-                logging.info(f"[{symbol}] Trailing SL de {'Compra' if is_buy else 'Venta'} actualizado para {pos.ticket} a {new_sl_potential:.5f}")
-                print(f"[{symbol}] {'📈' if is_buy else '📉'} Trailing SL actualizado para {'Compra' if is_buy else 'Venta'} {pos.ticket} a {new_sl_potential:.5f}")
-
-    tickets_to_remove = [t for t in managed_trailing_stops_dict if t not in active_tickets_for_symbol]
+                managed_for_symbol[pos.ticket] = new_sl_potential
+                state_changes.append((pos.ticket, new_sl_potential))
+                side = 'Compra' if is_buy else 'Venta'
+                logging.info("[%s] Trailing SL de %s actualizado para %s a %.5f", symbol, side, pos.ticket, new_sl_potential)
+                console.info("[%s] %s Trailing SL actualizado para %s %s a %.5f",
+                             symbol, '📈' if is_buy else '📉', side, pos.ticket, new_sl_potential)
+
+    tickets_to_remove = [t for t in managed_for_symbol if t not in active_tickets_for_symbol]
     if tickets_to_remove:
         for t in tickets_to_remove:
-            del managed_trailing_stops_dict[t]
-            logging.info(f"[{symbol}] Posición {t} eliminada de la gestión de Trailing Stop (cerrada).")
-        state_changed = True
+            del managed_for_symbol[t]
+            state_changes.append((t, None))
+            logging.info("[%s] Posición %s eliminada de la gestión de Trailing Stop (cerrada).", symbol, t)
 
-    if state_changed:
-        save_trailing_stop_state(managed_trailing_stops_dict)
\ No newline at end of file
+    if state_changes:
+        queue_trailing_stop_records(symbol, MAGIC_NUMBER, state_changes)
\ No newline at end of file
@@ -0,0 +1,415 @@
+# /mt5_simulator.py
+"""
+Sustituto offline del paquete MetaTrader5 para replay y benchmarks en Linux.
+
+Implementa el subconjunto de la API que usa el bot (initialize, copy_rates_from_pos,
+copy_rates_range, symbol_info, symbol_info_tick, positions_get, order_send,
+history_deals_get, account_info, ...) sobre velas guardadas en CSV. El tiempo es un reloj
+simulado: la vela en la posición 0 es la última cuyo inicio es <= al reloj y se trata como
+cerrada (su close es el precio actual). `advance()` mueve el reloj y ejecuta los SL/TP que
+se toquen entre medias (si una vela toca ambos, se asume SL primero).
+"""
+import logging
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from symbol_metadata import DEFAULT_SYMBOLS  # Metadatos por defecto (compartidos con los backtests)
+
+# --- Constantes de la API (mismos valores que MetaTrader5) ---
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_SLTP = 6
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+ORDER_TIME_GTC = 0
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+DEAL_REASON_EXPERT = 3
+DEAL_REASON_SL = 4
+DEAL_REASON_TP = 5
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_NO_CHANGES = 10025
+TRADE_RETCODE_POSITION_CLOSED = 10036
+
+_TIMEFRAME_SECONDS = {TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900, TIMEFRAME_M30: 1800,
+                      TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400, TIMEFRAME_D1: 86400}
+
+RATES_DTYPE = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                        ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')])
+
+SymbolInfo = namedtuple('SymbolInfo', 'name point digits trade_contract_size currency_base currency_profit '
+                                      'currency_margin volume_min volume_max volume_step spread')
+Tick = namedtuple('Tick', 'time bid ask last volume time_msc')
+TradePosition = namedtuple('TradePosition', 'ticket time type magic volume price_open sl tp price_current '
+                                            'profit symbol comment')
+TradeDeal = namedtuple('TradeDeal', 'ticket order time time_msc type entry magic position_id reason volume '
+                                    'price commission swap profit fee symbol comment external_id')
+AccountInfo = namedtuple('AccountInfo', 'login balance equity profit margin margin_free leverage currency')
+OrderSendResult = namedtuple('OrderSendResult', 'retcode deal order volume price bid ask comment request_id request')
+
+DEFAULT_SPREAD_POINTS = 10
+
+
+class _Simulator:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.data_dir = '.'
+        self.file_pattern = "{symbol}_M5_data_1Y.csv"
+        self.timeframe = TIMEFRAME_M5
+        self.currency = 'USD'
+        self.balance = 10000.0
+        self.start_bar = 500
+        self.bars = {}
+        self.now = None
+        self.positions = {}
+        self.deals = []
+        self.next_ticket = 1
+        self.last_error = (1, 'Success')
+        self.initialized = False
+
+
+_sim = _Simulator()
+
+
+def configure(data_dir=None, file_pattern=None, timeframe=None, balance=None, currency=None, start_bar=None):
+    """Ajusta la fuente de velas y la cuenta simulada. Se aplica en el siguiente initialize()."""
+    if data_dir is not None: _sim.data_dir = data_dir
+    if file_pattern is not None: _sim.file_pattern = file_pattern
+    if timeframe is not None: _sim.timeframe = timeframe
+    if balance is not None: _sim.balance = float(balance)
+    if currency is not None: _sim.currency = currency
+    if start_bar is not None: _sim.start_bar = start_bar
+
+
+def load_bars(symbol, bars):
+    """Registra velas de un símbolo (DataFrame con time/open/high/low/close o array RATES_DTYPE)."""
+    if isinstance(bars, pd.DataFrame):
+        rates = np.zeros(len(bars), dtype=RATES_DTYPE)
+        times = bars['time']
+        if not pd.api.types.is_numeric_dtype(times):
+            times = pd.to_datetime(times).astype('datetime64[s]').astype('int64')
+        rates['time'] = np.asarray(times, dtype=np.int64)
+        for column in ('open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume'):
+            if column in bars.columns:
+                rates[column] = bars[column].to_numpy()
+        if 'spread' not in bars.columns:
+            rates['spread'] = DEFAULT_SPREAD_POINTS
+        bars = rates
+    _sim.bars[symbol] = np.asarray(bars, dtype=RATES_DTYPE)
+
+
+def _bars(symbol):
+    if symbol not in _sim.bars:
+        path = os.path.join(_sim.data_dir, _sim.file_pattern.format(symbol=symbol))
+        if not os.path.exists(path):
+            return None
+        load_bars(symbol, pd.read_csv(path))
+    return _sim.bars[symbol]
+
+
+def _current_index(symbol):
+    bars = _bars(symbol)
+    if bars is None or _sim.now is None:
+        return None, -1
+    return bars, int(np.searchsorted(bars['time'], _sim.now, side='right')) - 1
+
+
+def _fail(code, message):
+    _sim.last_error = (code, message)
+    return None
+
+
+# --- Reloj simulado ---
+
+def bar_seconds():
+    """Duración en segundos de la vela del timeframe simulado."""
+    return _TIMEFRAME_SECONDS[_sim.timeframe]
+
+
+def current_time():
+    """Hora del reloj simulado (segundos UNIX)."""
+    return _sim.now
+
+
+def data_end():
+    """Hora de la última vela común a todos los símbolos cargados (fin del replay)."""
+    ends = [int(bars['time'][-1]) for bars in _sim.bars.values() if len(bars)]
+    return min(ends) if ends else None
+
+
+def set_time(timestamp):
+    """Sitúa el reloj sin ejecutar SL/TP (para posicionar el inicio del replay)."""
+    _sim.now = int(timestamp)
+
+
+def advance(seconds):
+    """Avanza el reloj y cierra las posiciones cuyo SL o TP se haya tocado en las velas intermedias."""
+    previous = _sim.now
+    _sim.now = previous + int(seconds)
+    for ticket, pos in list(_sim.positions.items()):
+        bars = _bars(pos['symbol'])
+        first = int(np.searchsorted(bars['time'], previous, side='right'))
+        last = int(np.searchsorted(bars['time'], _sim.now, side='right'))
+        if first >= last:
+            continue
+        window = bars[first:last]
+        is_buy = pos['type'] == POSITION_TYPE_BUY
+        sl_hit = (window['low'] <= pos['sl']) if is_buy else (window['high'] >= pos['sl'])
+        tp_hit = (window['high'] >= pos['tp']) if is_buy else (window['low'] <= pos['tp'])
+        if not pos['sl']:
+            sl_hit[:] = False
+        if not pos['tp']:
+            tp_hit[:] = False
+        sl_idx = int(sl_hit.argmax()) if sl_hit.any() else len(window)
+        tp_idx = int(tp_hit.argmax()) if tp_hit.any() else len(window)
+        if sl_idx == len(window) and tp_idx == len(window):
+            continue
+        if sl_idx <= tp_idx:
+            _close(ticket, pos['sl'], int(window['time'][sl_idx]), DEAL_REASON_SL)
+        else:
+            _close(ticket, pos['tp'], int(window['time'][tp_idx]), DEAL_REASON_TP)
+
+
+# --- API de MetaTrader5 ---
+
+def initialize(*args, **kwargs):
+    import config as cfg
+    if not _sim.initialized:
+        configure(cfg.SIM_DATA_DIR, cfg.SIM_DATA_FILE_PATTERN, None, cfg.SIM_INITIAL_BALANCE,
+                  cfg.SIM_ACCOUNT_CURRENCY, cfg.SIM_START_BAR)
+        starts = []
+        for symbol in cfg.SYMBOLS:
+            bars = _bars(symbol)
+            if bars is None or len(bars) == 0:
+                logging.warning(f"[{symbol}] Simulador: no hay velas en '{_sim.data_dir}'.")
+                continue
+            starts.append(int(bars['time'][min(_sim.start_bar, len(bars) - 1)]))
+        if not starts:
+            _fail(-10003, 'No data for simulation')
+            return False
+        if _sim.now is None:
+            _sim.now = max(starts)
+        _sim.initialized = True
+    _sim.last_error = (1, 'Success')
+    return True
+
+
+def shutdown():
+    return True
+
+
+def last_error():
+    return _sim.last_error
+
+
+def symbol_select(symbol, enable=True):
+    return _bars(symbol) is not None
+
+
+def copy_rates_from_pos(symbol, timeframe, start_pos, count):
+    if timeframe != _sim.timeframe:
+        return _fail(-2, f'Timeframe {timeframe} not available in simulator')
+    bars, idx = _current_index(symbol)
+    if bars is None:
+        return _fail(-4, f'Unknown symbol {symbol}')
+    end = idx - start_pos + 1
+    if end <= 0:
+        return _fail(-1, 'No data')
+    return bars[max(0, end - count):end].copy()
+
+
+def copy_rates_range(symbol, timeframe, date_from, date_to):
+    if timeframe != _sim.timeframe:
+        return _fail(-2, f'Timeframe {timeframe} not available in simulator')
+    bars, idx = _current_index(symbol)
+    if bars is None:
+        return _fail(-4, f'Unknown symbol {symbol}')
+    first = int(np.searchsorted(bars['time'], _to_seconds(date_from), side='left'))
+    last = min(int(np.searchsorted(bars['time'], _to_seconds(date_to), side='right')), idx + 1)
+    return bars[first:last].copy()
+
+
+def symbol_info(symbol):
+    if _bars(symbol) is None:
+        return _fail(-4, f'Unknown symbol {symbol}')
+    meta = DEFAULT_SYMBOLS.get(symbol, dict(point=1e-05, digits=5, currency_base=symbol[:3], currency_profit=symbol[3:6]))
+    return SymbolInfo(name=symbol, point=meta['point'], digits=meta['digits'], trade_contract_size=100000.0,
+                      currency_base=meta['currency_base'], currency_profit=meta['currency_profit'],
+                      currency_margin=meta['currency_base'], volume_min=0.01, volume_max=100.0,
+                      volume_step=0.01, spread=DEFAULT_SPREAD_POINTS)
+
+
+def symbol_info_tick(symbol):
+    bars, idx = _current_index(symbol)
+    if bars is None or idx < 0:
+        return _fail(-4, f'No tick for {symbol}')
+    bar = bars[idx]
+    point = DEFAULT_SYMBOLS.get(symbol, {}).get('point', 1e-05)
+    bid = float(bar['close'])
+    ask = bid + int(bar['spread'] or DEFAULT_SPREAD_POINTS) * point
+    return Tick(time=_sim.now, bid=bid, ask=ask, last=bid, volume=int(bar['tick_volume']), time_msc=_sim.now * 1000)
+
+
+def positions_get(symbol=None, ticket=None, **kwargs):
+    result = []
+    for pos in _sim.positions.values():
+        if symbol is not None and pos['symbol'] != symbol:
+            continue
+        if ticket is not None and pos['ticket'] != ticket:
+            continue
+        tick = symbol_info_tick(pos['symbol'])
+        price = (tick.bid if pos['type'] == POSITION_TYPE_BUY else tick.ask) if tick else pos['price_open']
+        result.append(TradePosition(price_current=price, profit=_profit(pos, price), **pos))
+    return tuple(result)
+
+
+def history_deals_get(date_from=None, date_to=None, group=None, position=None, **kwargs):
+    deals = _sim.deals
+    if position is not None:
+        deals = [d for d in deals if d.position_id == position]
+    if date_from is not None and date_to is not None:
+        start, end = _to_seconds(date_from), _to_seconds(date_to)
+        deals = [d for d in deals if start <= d.time <= end]
+    return tuple(deals)
+
+
+def account_info():
+    if not _sim.initialized:
+        return _fail(-10004, 'Not initialized')
+    floating = sum(p.profit for p in positions_get())
+    return AccountInfo(login=0, balance=_sim.balance, equity=_sim.balance + floating, profit=floating,
+                       margin=0.0, margin_free=_sim.balance + floating, leverage=100, currency=_sim.currency)
+
+
+def order_send(request):
+    symbol = request.get('symbol')
+    tick = symbol_info_tick(symbol)
+    if tick is None:
+        return _result(TRADE_RETCODE_INVALID, request, comment='No prices')
+
+    if request.get('action') == TRADE_ACTION_SLTP:
+        pos = _sim.positions.get(request.get('position'))
+        if pos is None:
+            return _result(TRADE_RETCODE_POSITION_CLOSED, request, comment='Position doesn\'t exist')
+        sl, tp = request.get('sl', pos['sl']), request.get('tp', pos['tp'])
+        if (sl, tp) == (pos['sl'], pos['tp']):
+            return _result(TRADE_RETCODE_NO_CHANGES, request, comment='No changes')
+        is_buy = pos['type'] == POSITION_TYPE_BUY
+        if sl and ((is_buy and sl >= tick.bid) or (not is_buy and sl <= tick.ask)):
+            return _result(TRADE_RETCODE_INVALID_STOPS, request, comment='Invalid stops')
+        pos['sl'], pos['tp'] = sl, tp
+        return _result(TRADE_RETCODE_DONE, request, order=pos['ticket'], comment='Request executed')
+
+    if request.get('action') != TRADE_ACTION_DEAL:
+        return _result(TRADE_RETCODE_INVALID, request, comment='Unsupported action')
+
+    if request.get('position'):
+        pos = _sim.positions.get(request['position'])
+        if pos is None:
+            return _result(TRADE_RETCODE_POSITION_CLOSED, request, comment='Position doesn\'t exist')
+        price = tick.bid if pos['type'] == POSITION_TYPE_BUY else tick.ask
+        deal = _close(pos['ticket'], price, _sim.now, DEAL_REASON_EXPERT)
+        return _result(TRADE_RETCODE_DONE, request, deal=deal.ticket, order=deal.order, volume=deal.volume,
+                       price=price, bid=tick.bid, ask=tick.ask, comment='Request executed')
+
+    volume = request.get('volume')
+    info = symbol_info(symbol)
+    if not volume or volume < info.volume_min or volume > info.volume_max:
+        return _result(TRADE_RETCODE_INVALID_VOLUME, request, comment='Invalid volume')
+    is_buy = request.get('type') == ORDER_TYPE_BUY
+    price = tick.ask if is_buy else tick.bid
+    sl, tp = request.get('sl', 0.0), request.get('tp', 0.0)
+    if (sl and ((is_buy and sl >= price) or (not is_buy and sl <= price))) or \
+       (tp and ((is_buy and tp <= price) or (not is_buy and tp >= price))):
+        return _result(TRADE_RETCODE_INVALID_STOPS, request, comment='Invalid stops')
+
+    ticket = _new_ticket()
+    _sim.positions[ticket] = dict(ticket=ticket, time=_sim.now, type=POSITION_TYPE_BUY if is_buy else POSITION_TYPE_SELL,
+                                  magic=request.get('magic', 0), volume=float(volume), price_open=price, sl=sl, tp=tp,
+                                  symbol=symbol, comment=request.get('comment', ''))
+    deal = _add_deal(_sim.positions[ticket], DEAL_TYPE_BUY if is_buy else DEAL_TYPE_SELL, DEAL_ENTRY_IN,
+                     price, _sim.now, 0.0, DEAL_REASON_EXPERT)
+    return _result(TRADE_RETCODE_DONE, request, deal=deal.ticket, order=ticket, volume=float(volume), price=price,
+                   bid=tick.bid, ask=tick.ask, comment='Request executed')
+
+
+# --- Auxiliares ---
+
+def _to_seconds(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def _new_ticket():
+    ticket = _sim.next_ticket
+    _sim.next_ticket += 1
+    return ticket
+
+
+def _to_account_currency(symbol, amount, price):
+    meta = DEFAULT_SYMBOLS.get(symbol, dict(currency_base=symbol[:3], currency_profit=symbol[3:6]))
+    if meta['currency_profit'] == _sim.currency:
+        return amount
+    if meta['currency_base'] == _sim.currency:
+        return amount / price
+    tick = symbol_info_tick(f"{meta['currency_profit']}{_sim.currency}")
+    return amount * tick.bid if tick else amount
+
+
+def _profit(pos, price):
+    direction = 1.0 if pos['type'] == POSITION_TYPE_BUY else -1.0
+    amount = (price - pos['price_open']) * direction * pos['volume'] * 100000.0
+    return _to_account_currency(pos['symbol'], amount, price)
+
+
+def _add_deal(pos, deal_type, entry, price, time, profit, reason):
+    deal = TradeDeal(ticket=_new_ticket(), order=pos['ticket'], time=int(time), time_msc=int(time) * 1000,
+                     type=deal_type, entry=entry, magic=pos['magic'], position_id=pos['ticket'], reason=reason,
+                     volume=pos['volume'], price=price, commission=0.0, swap=0.0, profit=profit, fee=0.0,
+                     symbol=pos['symbol'], comment=pos['comment'], external_id='')
+    _sim.deals.append(deal)
+    return deal
+
+
+def _close(ticket, price, time, reason):
+    pos = _sim.positions.pop(ticket)
+    profit = _profit(pos, price)
+    _sim.balance += profit
+    deal_type = DEAL_TYPE_SELL if pos['type'] == POSITION_TYPE_BUY else DEAL_TYPE_BUY
+    return _add_deal(pos, deal_type, DEAL_ENTRY_OUT, price, time, profit, reason)
+
+
+def _result(retcode, request, deal=0, order=0, volume=0.0, price=0.0, bid=0.0, ask=0.0, comment=''):
+    return OrderSendResult(retcode=retcode, deal=deal, order=order, volume=volume, price=price, bid=bid, ask=ask,
+                           comment=comment, request_id=0, request=request)
+
+
+def reset():
+    """Vacía velas, posiciones, historial y reloj (para empezar un replay desde cero)."""
+    _sim.reset()
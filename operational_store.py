@@ -0,0 +1,171 @@
+# /operational_store.py
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# Almacén operativo local en SQLite: estado del trailing stop, cada evaluación de señal (con su
+# razón y la confianza del modelo) y cada resultado de order_send, para poder consultarlos en
+# reportes y post-mortems en lugar de buscar en los logs.
+# Las señales y órdenes se acumulan en memoria y se insertan por lotes (executemany, una
+# transacción) al final de cada ciclo. Las sentencias son fijas, así que sqlite3 las reutiliza
+# preparadas desde su caché.
+# Las filas llevan la hora del ciclo que las produjo (set_cycle_time): la del servidor en vivo y
+# la del reloj simulado en el replay, para que los post-mortems del replay tengan la hora de la vela.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trailing_stops (
+    symbol TEXT NOT NULL,
+    magic INTEGER NOT NULL,
+    ticket INTEGER NOT NULL,
+    sl REAL NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (symbol, magic, ticket)
+);
+CREATE TABLE IF NOT EXISTS signals (
+    time TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    signal TEXT NOT NULL,
+    reason TEXT,
+    confidence REAL,
+    model_version TEXT,
+    accepted INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_signals_symbol_time ON signals (symbol, time);
+CREATE TABLE IF NOT EXISTS orders (
+    time TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    action TEXT,
+    position INTEGER,
+    volume REAL,
+    price REAL,
+    sl REAL,
+    tp REAL,
+    attempt INTEGER,
+    retcode INTEGER,
+    result_order INTEGER,
+    comment TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_orders_symbol_time ON orders (symbol, time);
+"""
+
+_INSERT_SIGNAL = "INSERT INTO signals VALUES (?, ?, ?, ?, ?, ?, ?)"
+_INSERT_ORDER = "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_UPSERT_TRAILING = ("INSERT INTO trailing_stops VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (symbol, magic, ticket) DO UPDATE SET sl = excluded.sl, updated_at = excluded.updated_at")
+_DELETE_TRAILING = "DELETE FROM trailing_stops WHERE symbol = ? AND magic = ? AND ticket = ?"
+
+
+_cycle_time = None  # Segundos UNIX del ciclo en curso (None: reloj local)
+
+def set_cycle_time(seconds):
+    """Fija la hora del ciclo en curso (hora del servidor o del simulador, segundos UNIX)."""
+    global _cycle_time
+    _cycle_time = seconds
+
+def timestamp():
+    """Hora del ciclo en curso en ISO (como las velas de MT5, sin zona), o la del reloj local si no se fijó."""
+    if _cycle_time is None:
+        return datetime.now().isoformat(timespec='seconds')
+    return datetime.fromtimestamp(_cycle_time, timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds')
+
+
+class OperationalStore:
+    """Conexión SQLite (modo WAL) con inserciones por lotes. Segura entre hilos mediante un lock."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signals = []
+        self._orders = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def record_signal(self, symbol, signal, reason, confidence=None, model_version=None, accepted=None):
+        self._signals.append((timestamp(), symbol, signal, reason,
+                              confidence, model_version, None if accepted is None else int(accepted)))
+
+    def record_order(self, symbol, request, attempt, result):
+        self._orders.append((
+            timestamp(), symbol,
+            str(request.get('action_description', request.get('action'))), request.get('position'),
+            request.get('volume'), request.get('price'), request.get('sl'), request.get('tp'), attempt,
+            getattr(result, 'retcode', None), getattr(result, 'order', None), getattr(result, 'comment', None),
+        ))
+
+    def record_trailing_stops(self, records):
+        """
+        Aplica cambios (symbol, magic, ticket, sl, hora ISO) al estado; sl=None elimina el ticket.
+        La hora es la del ciclo que encoló el cambio (lo escribe más tarde el hilo de fondo).
+        """
+        upserts = [(symbol, magic, ticket, sl, at) for symbol, magic, ticket, sl, at in records if sl is not None]
+        deletes = [(symbol, magic, ticket) for symbol, magic, ticket, sl, _ in records if sl is None]
+        with self._lock, self._conn:
+            if upserts:
+                self._conn.executemany(_UPSERT_TRAILING, upserts)
+            if deletes:
+                self._conn.executemany(_DELETE_TRAILING, deletes)
+
+    def flush(self):
+        """Inserta en una sola transacción las señales y órdenes acumuladas."""
+        signals, self._signals = self._signals, []
+        orders, self._orders = self._orders, []
+        if not signals and not orders:
+            return
+        with self._lock, self._conn:
+            if signals:
+                self._conn.executemany(_INSERT_SIGNAL, signals)
+            if orders:
+                self._conn.executemany(_INSERT_ORDER, orders)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+# --- Instancia global del bot (None si el almacén está desactivado) ---
+_store = None
+
+def open_store(path):
+    global _store
+    try:
+        _store = OperationalStore(path)
+    except sqlite3.Error as e:
+        logging.error(f"No se pudo abrir el almacén operativo '{path}': {e}")
+        print(f"⚠️ No se pudo abrir el almacén operativo '{path}'. Se continúa sin él.")
+        _store = None
+    return _store
+
+def record_signal(symbol, signal, reason, confidence=None, model_version=None, accepted=None):
+    if _store is not None:
+        _store.record_signal(symbol, signal, reason, confidence, model_version, accepted)
+
+def record_order(symbol, request, attempt, result):
+    if _store is not None:
+        _store.record_order(symbol, request, attempt, result)
+
+def record_trailing_stops(records):
+    if _store is not None:
+        try:
+            _store.record_trailing_stops(records)
+        except sqlite3.Error as e:
+            logging.error(f"Error al guardar el trailing stop en el almacén operativo: {e}")
+
+def flush():
+    if _store is not None:
+        try:
+            _store.flush()
+        except sqlite3.Error as e:
+            logging.error(f"Error al volcar el almacén operativo: {e}")
+
+def close_store():
+    global _store
+    if _store is not None:
+        try:
+            _store.close()
+        except sqlite3.Error as e:
+            logging.error(f"Error al cerrar el almacén operativo: {e}")
+        _store = None
@@ -0,0 +1,128 @@
+# /performance.py
+import numpy as np
+import pandas as pd
+
+# Métricas de rendimiento compartidas por todos los backtesters, calculadas de forma vectorizada
+# sobre un array estructurado de trades (una fila por trade cerrado, en orden de apertura):
+# curva de equity, drawdown máximo, Sharpe/Sortino, expectativa, rachas y desgloses por hora
+# y por día de la semana. Los resultados van en pips (con el point de symbol_metadata).
+
+TRADE_DTYPE = np.dtype([('entry_time', 'M8[s]'), ('exit_time', 'M8[s]'), ('direction', 'i1'),
+                        ('entry_price', 'f8'), ('exit_price', 'f8')])
+
+WEEKDAYS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+_SECONDS_PER_YEAR = 365.25 * 86400
+
+
+def trades_to_array(trades):
+    """
+    Convierte los trades de un backtester (lista de dicts o DataFrame con type, entry_price,
+    exit_price, entry_time y exit_time) al array estructurado TRADE_DTYPE.
+    """
+    df = trades if isinstance(trades, pd.DataFrame) else pd.DataFrame(list(trades))
+    array = np.zeros(len(df), dtype=TRADE_DTYPE)
+    if not len(df):
+        return array
+    array['entry_time'] = pd.to_datetime(df['entry_time']).to_numpy().astype('M8[s]')
+    array['exit_time'] = pd.to_datetime(df['exit_time']).to_numpy().astype('M8[s]')
+    array['direction'] = np.where(df['type'].to_numpy() == 'BUY', 1, -1)
+    array['entry_price'] = df['entry_price'].to_numpy(dtype=float)
+    array['exit_price'] = df['exit_price'].to_numpy(dtype=float)
+    return array
+
+
+def _max_streaks(wins):
+    """Racha máxima de ganadoras y de perdedoras (longitud de las corridas de valores iguales)."""
+    if not len(wins):
+        return 0, 0
+    starts = np.flatnonzero(np.r_[True, wins[1:] != wins[:-1]])
+    lengths = np.diff(np.r_[starts, len(wins)])
+    values = wins[starts]
+    return int(lengths[values].max(initial=0)), int(lengths[~values].max(initial=0))
+
+
+def _breakdown(keys, size, pips, wins, labels):
+    """Trades, tasa de acierto y pips netos por clave (hora o día), solo con las claves que tienen trades."""
+    count = np.bincount(keys, minlength=size)
+    won = np.bincount(keys, weights=wins, minlength=size)
+    net = np.bincount(keys, weights=pips, minlength=size)
+    used = count > 0
+    return pd.DataFrame({
+        labels[0]: labels[1][used],
+        'trades': count[used],
+        'win_rate': won[used] / count[used] * 100,
+        'net_pips': net[used],
+        'avg_pips': net[used] / count[used],
+    })
+
+
+def analyze(trades, point):
+    """
+    Estadísticas de un array TRADE_DTYPE con `point` como tamaño del pip.
+    Devuelve un dict con los totales, la curva de equity (pips acumulados al cierre de cada
+    trade) y los desgloses `by_hour` / `by_weekday` (DataFrames, según la hora de entrada).
+    """
+    pips = (trades['exit_price'] - trades['entry_price']) * trades['direction'] / point
+    n = len(pips)
+    wins = pips > 0
+    equity = np.cumsum(pips)
+    # El pico parte de 0: un primer trade perdedor ya es drawdown
+    peak = np.maximum.accumulate(np.r_[0.0, equity])[1:]
+    drawdown = peak - equity
+
+    gross_profit = pips[wins].sum()
+    gross_loss = -pips[~wins].sum()
+    n_wins = int(wins.sum())
+    mean = pips.mean() if n else 0.0
+    std = pips.std(ddof=1) if n > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(pips, 0.0) ** 2)) if n else 0.0
+    # Anualización por número de trades al año en el periodo del backtest
+    span = (trades['exit_time'][-1] - trades['entry_time'][0]).astype('i8') if n else 0
+    annual = np.sqrt(n / (span / _SECONDS_PER_YEAR)) if span > 0 else 1.0
+    longest_win, longest_loss = _max_streaks(wins)
+
+    entry_seconds = trades['entry_time'].astype('i8')
+    hours = (entry_seconds // 3600 % 24).astype(np.int64)
+    weekdays = ((entry_seconds // 86400 + 3) % 7).astype(np.int64)  # 1970-01-01 fue jueves
+    return {
+        'trades': n,
+        'wins': n_wins,
+        'losses': n - n_wins,
+        'win_rate': n_wins / n * 100 if n else 0.0,
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else float('inf'),
+        'net_pips': equity[-1] if n else 0.0,
+        'expectancy': mean,
+        'avg_win': pips[wins].mean() if n_wins else 0.0,
+        'avg_loss': -pips[~wins].mean() if n - n_wins else 0.0,
+        'max_drawdown': drawdown.max(initial=0.0),
+        'sharpe': mean / std * annual if std > 0 else 0.0,
+        'sortino': mean / downside * annual if downside > 0 else 0.0,
+        'max_win_streak': longest_win,
+        'max_loss_streak': longest_loss,
+        'pips': pips,
+        'equity': equity,
+        'equity_time': trades['exit_time'],
+        'by_hour': _breakdown(hours, 24, pips, wins, ('hour', np.arange(24))),
+        'by_weekday': _breakdown(weekdays, 7, pips, wins, ('weekday', np.array(WEEKDAYS))),
+    }
+
+
+def print_report(stats, breakdowns=False):
+    """Imprime el resumen de analyze() con el formato de los backtesters."""
+    print(f"Operaciones Totales:    {stats['trades']}")
+    print(f"Operaciones Ganadoras:  {stats['wins']}")
+    print(f"Operaciones Perdedoras: {stats['losses']}")
+    print(f"Tasa de Acierto:        {stats['win_rate']:.2f}%")
+    print(f"Ganancia Neta (pips):   {stats['net_pips']:.2f}")
+    print(f"Profit Factor:          {stats['profit_factor']:.2f}  (>1.5 es bueno)")
+    print(f"Expectativa (pips):     {stats['expectancy']:.2f}  (ganancia media {stats['avg_win']:.2f} / pérdida media {stats['avg_loss']:.2f})")
+    print(f"Drawdown Máximo (pips): {stats['max_drawdown']:.2f}")
+    print(f"Sharpe / Sortino:       {stats['sharpe']:.2f} / {stats['sortino']:.2f}  (anualizados)")
+    print(f"Rachas Máximas:         {stats['max_win_streak']} ganadoras / {stats['max_loss_streak']} perdedoras")
+    if breakdowns:
+        print("\n--- 🕐 Por hora de entrada ---")
+        print(stats['by_hour'].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+        print("\n--- 📅 Por día de la semana ---")
+        print(stats['by_weekday'].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
@@ -0,0 +1,140 @@
+# cache_deals.py
+import calendar
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+# Copia local (SQLite) del historial de deals del terminal. Cada sincronización solo pide a MT5
+# los deals desde el último sincronizado (con un margen de solape; el ticket es la clave, así
+# que repetir deals no duplica nada). Los reportes de cualquier rango se calculan desde aquí.
+
+DEAL_COLUMNS = ['ticket', 'order', 'time', 'time_msc', 'type', 'entry', 'magic', 'position_id', 'reason',
+                'volume', 'price', 'commission', 'swap', 'profit', 'fee', 'symbol', 'comment', 'external_id']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deals (
+    ticket INTEGER PRIMARY KEY,
+    "order" INTEGER,
+    time INTEGER NOT NULL,
+    time_msc INTEGER,
+    type INTEGER,
+    entry INTEGER,
+    magic INTEGER,
+    position_id INTEGER,
+    reason INTEGER,
+    volume REAL,
+    price REAL,
+    commission REAL,
+    swap REAL,
+    profit REAL,
+    fee REAL,
+    symbol TEXT,
+    comment TEXT,
+    external_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_deals_time ON deals (time);
+CREATE INDEX IF NOT EXISTS idx_deals_magic_time ON deals (magic, time);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_INSERT_DEAL = f"INSERT OR REPLACE INTO deals VALUES ({', '.join('?' * len(DEAL_COLUMNS))})"
+_SELECT_COLUMNS = ', '.join(f'"{column}"' for column in DEAL_COLUMNS)
+SYNC_OVERLAP_SECONDS = 6 * 3600  # Se vuelve a pedir este margen por si el terminal registró deals con retraso
+
+
+def to_timestamp(value):
+    """datetime (naive = UTC, como la API de MT5) o segundos -> segundos UNIX."""
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+    return int(value)
+
+
+class DealCache:
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def synced_until(self):
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'synced_until'").fetchone()
+        return row[0] if row else None
+
+    def history_start(self):
+        """Inicio (segundos) del historial cubierto por la caché, o None si nunca se sincronizó."""
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'synced_from'").fetchone()
+        if row is None:  # Cachés anteriores a 'synced_from': el deal más antiguo guardado
+            row = self._conn.execute("SELECT MIN(time) FROM deals").fetchone()
+        return row[0] if row else None
+
+    def sync(self, mt5, history_days=365):
+        """
+        Trae del terminal (ya inicializado) los deals nuevos. La primera vez descarga
+        `history_days` días; después, solo desde la última sincronización. Devuelve cuántos deals recibió.
+        """
+        now = datetime.now(timezone.utc)
+        last = self.synced_until()
+        if last is None:
+            date_from = now - timedelta(days=history_days)
+        else:
+            date_from = datetime.fromtimestamp(max(last - SYNC_OVERLAP_SECONDS, 0), timezone.utc)
+        # La hora del servidor suele ir por delante de UTC: el límite superior deja un día de margen
+        date_to = now + timedelta(days=1)
+        deals = mt5.history_deals_get(date_from, date_to)
+        if deals is None:
+            raise RuntimeError(f"history_deals_get falló: {mt5.last_error()}")
+        rows = [tuple(getattr(deal, column) for column in DEAL_COLUMNS) for deal in deals]
+        # Sincronizado hasta ahora aunque no haya deals (sin el día de margen, que aún no ha pasado)
+        upper = max([to_timestamp(now)] + [row[2] for row in rows])
+        with self._conn:
+            self._conn.executemany(_INSERT_DEAL, rows)
+            self._conn.execute("INSERT INTO sync_state VALUES ('synced_until', ?) "
+                               "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)", (upper,))
+            self._conn.execute("INSERT INTO sync_state VALUES ('synced_from', ?) "
+                               "ON CONFLICT (key) DO UPDATE SET value = MIN(value, excluded.value)",
+                               (to_timestamp(date_from),))
+        return len(rows)
+
+    def _where(self, date_from, date_to, magic):
+        where = "WHERE time BETWEEN ? AND ?"
+        params = [to_timestamp(date_from), to_timestamp(date_to)]
+        if magic is not None:
+            where += " AND magic = ?"
+            params.append(magic)
+        return where, params
+
+    def load(self, date_from, date_to, magic=None):
+        """DataFrame con los deals de [date_from, date_to] (columna time en segundos), opcionalmente de un magic."""
+        import pandas as pd
+        where, params = self._where(date_from, date_to, magic)
+        return pd.read_sql_query(f"SELECT {_SELECT_COLUMNS} FROM deals {where} ORDER BY time, ticket",
+                                 self._conn, params=params)
+
+    def iter_deals(self, date_from, date_to, magic=None, chunk_rows=50000):
+        """Como load(), pero en bloques de `chunk_rows` filas: memoria constante sea cual sea el rango."""
+        import pandas as pd
+        where, params = self._where(date_from, date_to, magic)
+        yield from pd.read_sql_query(f"SELECT {_SELECT_COLUMNS} FROM deals {where} ORDER BY time, ticket",
+                                     self._conn, params=params, chunksize=chunk_rows)
+
+    def iter_positions(self, date_from, date_to, magic=None, chunk_rows=50000):
+        """
+        Una fila por position_id con los deals del rango, agregada en SQLite y leída por bloques:
+        símbolo, apertura y cierre (segundos), volumen, número de deals, ganancia, resultado neto
+        (con comisión, swap y fee) y si la posición tiene deal de salida.
+        """
+        import pandas as pd
+        where, params = self._where(date_from, date_to, magic)
+        query = f"""
+            SELECT position_id, MIN(symbol) AS simbolo, MIN(time) AS apertura, MAX(time) AS cierre,
+                   MAX(volume) AS volumen, COUNT(*) AS deals, SUM(profit) AS ganancia,
+                   SUM(profit + commission + swap + fee) AS neto, MAX(entry IN (1, 2, 3)) AS cerrada
+            FROM deals {where}
+            GROUP BY position_id
+            ORDER BY apertura, position_id"""
+        yield from pd.read_sql_query(query, self._conn, params=params, chunksize=chunk_rows)
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,92 @@
+# escritores.py
+import os
+
+# Escritores de reportes por bloques: cada hoja se escribe a trozos (DataFrames de tamaño fijo)
+# sin montar nunca el reporte completo en memoria.
+#  - xlsx: openpyxl en modo write_only (las filas van directas a disco, una hoja por tabla).
+#  - csv: un archivo por hoja, <base>_<hoja>.csv
+#  - parquet: un archivo por hoja, <base>_<hoja>.parquet (pyarrow, un row group por bloque).
+
+FORMATOS = ('xlsx', 'csv', 'parquet')
+
+
+def _nombre_hoja(hoja):
+    return hoja.replace(' ', '_')
+
+
+class EscritorExcel:
+    def __init__(self, ruta_base):
+        from openpyxl import Workbook
+        self.rutas = [f"{ruta_base}.xlsx"]
+        self._libro = Workbook(write_only=True)
+        self._hojas = {}
+
+    def escribir(self, hoja, df):
+        ws = self._hojas.get(hoja)
+        if ws is None:
+            ws = self._hojas[hoja] = self._libro.create_sheet(hoja)
+            ws.append(list(df.columns))
+        for fila in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            ws.append(fila)
+
+    def cerrar(self):
+        self._libro.save(self.rutas[0])
+
+
+class EscritorCSV:
+    def __init__(self, ruta_base):
+        self.ruta_base = ruta_base
+        self.rutas = []
+        self._archivos = {}
+
+    def escribir(self, hoja, df):
+        archivo = self._archivos.get(hoja)
+        nueva = archivo is None
+        if nueva:
+            ruta = f"{self.ruta_base}_{_nombre_hoja(hoja)}.csv"
+            archivo = self._archivos[hoja] = open(ruta, 'w', encoding='utf-8', newline='')
+            self.rutas.append(ruta)
+        df.to_csv(archivo, header=nueva, index=False)
+
+    def cerrar(self):
+        for archivo in self._archivos.values():
+            archivo.close()
+
+
+class EscritorParquet:
+    def __init__(self, ruta_base):
+        import pyarrow
+        import pyarrow.parquet
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.ruta_base = ruta_base
+        self.rutas = []
+        self._escritores = {}
+
+    def escribir(self, hoja, df):
+        escritor = self._escritores.get(hoja)
+        if escritor is None:
+            tabla = self._pa.Table.from_pandas(df, preserve_index=False)
+            ruta = f"{self.ruta_base}_{_nombre_hoja(hoja)}.parquet"
+            escritor = self._escritores[hoja] = self._pq.ParquetWriter(ruta, tabla.schema)
+            self.rutas.append(ruta)
+        else:
+            # Todos los bloques con el esquema del primero (p. ej. columnas que en un bloque son todo nulos)
+            tabla = self._pa.Table.from_pandas(df, schema=escritor.schema, preserve_index=False)
+        escritor.write_table(tabla)
+
+    def cerrar(self):
+        for escritor in self._escritores.values():
+            escritor.close()
+
+
+def abrir_escritor(formato, ruta_base):
+    """Devuelve el escritor para `formato` ('xlsx', 'csv' o 'parquet'); `ruta_base` va sin extensión."""
+    ruta_base = os.path.splitext(ruta_base)[0] if ruta_base.endswith(('.xlsx', '.csv', '.parquet')) else ruta_base
+    if formato == 'xlsx':
+        return EscritorExcel(ruta_base)
+    if formato == 'csv':
+        return EscritorCSV(ruta_base)
+    if formato == 'parquet':
+        return EscritorParquet(ruta_base)
+    raise ValueError(f"Formato de reporte no soportado: {formato}. Opciones: {', '.join(FORMATOS)}")
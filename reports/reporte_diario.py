@@ -1,90 +1,177 @@
 # reporte_diario.py
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
 import pandas as pd
-import MetaTrader5 as mt5
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 # Importamos la configuración para usar el MAGIC_NUMBER
 import config as cfg
+from mt5_backend import get_mt5
+from cache_deals import DealCache, to_timestamp
+from escritores import FORMATOS, abrir_escritor
 
-def generar_reporte_diario():
-    # --- Conexión a MT5 ---
+# Seleccionar y renombrar columnas para mayor claridad
+COLUMNAS_REPORTE = {
+    'time': 'Fecha y Hora',
+    'symbol': 'Símbolo',
+    'type': 'Tipo', # 0: BUY, 1: SELL
+    'entry': 'Entrada/Salida', # 0: IN, 1: OUT, 2: IN/OUT
+    'volume': 'Volumen',
+    'price': 'Precio',
+    'profit': 'Ganancia',
+    'fee': 'Comisión',
+    'swap': 'Swap',
+    'order': 'Orden Ticket',
+    'position_id': 'ID Posición'
+}
+
+def sincronizar_cache(cache):
+    """Trae del terminal solo los deals nuevos desde la última sincronización."""
+    mt5 = get_mt5(cfg.MT5_BACKEND) # Solo se importa el terminal si hay que sincronizar
     if not mt5.initialize():
         print("❌ initialize() falló, error code =", mt5.last_error())
-        return
-
-    # --- Definir el rango de fechas (el día de ayer completo) ---
-    hoy = datetime.now()
-    ayer = hoy - timedelta(days=1)
-    fecha_inicio = datetime(ayer.year, ayer.month, ayer.day, 0, 0, 0)
-    fecha_fin = datetime(ayer.year, ayer.month, ayer.day, 23, 59, 59)
-    
-    print(f"🚀 Generando reporte para el día: {fecha_inicio.strftime('%Y-%m-%d')}...")
-
-    # --- Obtener el historial de tratos (deals) ---
+        return False
     try:
-        deals = mt5.history_deals_get(fecha_inicio, fecha_fin)
+        nuevos = cache.sync(mt5, cfg.DEALS_CACHE_HISTORY_DAYS)
+        print(f"🔄 Caché de deals sincronizada ({nuevos} deals recibidos del terminal).")
+        return True
     except Exception as e:
         print(f"❌ Error al obtener el historial de tratos: {e}")
+        return False
+    finally:
+        # --- Desconexión ---
         mt5.shutdown()
-        return
-
-    if deals is None or len(deals) == 0:
-        print("ℹ️ No se encontraron operaciones para el día especificado.")
-        mt5.shutdown()
-        return
-
-    # --- Procesar los datos ---
-    df_deals = pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
-    
-    # Filtrar solo por el número mágico de nuestro bot
-    df_bot_deals = df_deals[df_deals['magic'] == cfg.MAGIC_NUMBER].copy()
-
-    if df_bot_deals.empty:
-        print(f"ℹ️ No se encontraron operaciones con el MAGIC_NUMBER {cfg.MAGIC_NUMBER}.")
-        mt5.shutdown()
-        return
 
+def preparar_trades(df_deals):
+    """Columnas y textos del reporte de trades a partir de un bloque de deals de la caché."""
     # Convertir el tiempo a un formato legible
-    df_bot_deals['time'] = pd.to_datetime(df_bot_deals['time'], unit='s')
-    
-    # Seleccionar y renombrar columnas para mayor claridad
-    columnas_reporte = {
-        'time': 'Fecha y Hora',
-        'symbol': 'Símbolo',
-        'type': 'Tipo', # 0: BUY, 1: SELL
-        'entry': 'Entrada/Salida', # 0: IN, 1: OUT, 2: IN/OUT
-        'volume': 'Volumen',
-        'price': 'Precio',
-        'profit': 'Ganancia',
-        'fee': 'Comisión',
-        'swap': 'Swap',
-        'order': 'Orden Ticket',
-        'position_id': 'ID Posición'
-    }
-    df_reporte = df_bot_deals[columnas_reporte.keys()].rename(columns=columnas_reporte)
+    df_deals['time'] = pd.to_datetime(df_deals['time'], unit='s')
+    df_reporte = df_deals[COLUMNAS_REPORTE.keys()].rename(columns=COLUMNAS_REPORTE)
 
     # Reemplazar números por texto para mayor claridad
     df_reporte['Tipo'] = df_reporte['Tipo'].map({0: 'COMPRA', 1: 'VENTA'})
     df_reporte['Entrada/Salida'] = df_reporte['Entrada/Salida'].map({0: 'ENTRADA', 1: 'SALIDA', 2: 'ENTRADA/SALIDA'})
+    return df_reporte
+
+def preparar_posiciones(posiciones):
+    """Fechas legibles y duración de un bloque de posiciones agregadas (DealCache.iter_positions)."""
+    posiciones['apertura'] = pd.to_datetime(posiciones['apertura'], unit='s')
+    posiciones['cierre'] = pd.to_datetime(posiciones['cierre'], unit='s')
+    posiciones['cerrada'] = posiciones['cerrada'].astype(bool)
+    posiciones['duracion_min'] = (posiciones['cierre'] - posiciones['apertura']).dt.total_seconds() / 60
+    return posiciones
 
-    # --- Guardar en Excel ---
-    nombre_archivo = f"Reporte_Trades_{fecha_inicio.strftime('%Y-%m-%d')}.xlsx"
+def _parcial_por_simbolo(posiciones):
+    """Sumas por símbolo de un bloque de posiciones cerradas (se combinan al final)."""
+    cerradas = posiciones[posiciones['cerrada']]
+    ganadora = cerradas['neto'] > 0
+    return cerradas.assign(operaciones=1, ganadoras=ganadora.astype(int),
+                           ganancia_bruta=cerradas['neto'].where(ganadora, 0.0),
+                           perdida_bruta=-cerradas['neto'].where(~ganadora, 0.0)).groupby('simbolo')[
+        ['operaciones', 'ganadoras', 'neto', 'ganancia_bruta', 'perdida_bruta']].sum()
+
+def resumen_por_simbolo(parciales):
+    """Operaciones cerradas, aciertos, resultado neto y profit factor por símbolo."""
+    por_simbolo = pd.concat(parciales).groupby(level=0).sum()
+    por_simbolo['tasa_acierto'] = por_simbolo['ganadoras'] / por_simbolo['operaciones']
+    por_simbolo['profit_factor'] = por_simbolo['ganancia_bruta'] / por_simbolo['perdida_bruta'].where(por_simbolo['perdida_bruta'] > 0)
+    return por_simbolo.reset_index()
+
+def generar_reporte(fecha_inicio, fecha_fin, sincronizar=True, nombre_archivo=None, formato='xlsx'):
+    """
+    Reporte de los deals del bot entre dos fechas, calculado desde la caché local de deals.
+    Los deals y las posiciones se leen y se escriben por bloques (cfg.REPORT_CHUNK_ROWS filas),
+    así que la memoria no depende de la longitud del historial.
+    """
+    cache = DealCache(cfg.DEALS_CACHE_FILE)
     try:
-        df_reporte.to_excel(nombre_archivo, index=False, sheet_name='Trades')
-        print(f"\n✅ ¡Éxito! Reporte guardado como '{nombre_archivo}'")
-        
-        # Calcular un resumen
-        total_profit = df_reporte['Ganancia'].sum()
-        total_trades = len(df_reporte[df_reporte['Entrada/Salida'] == 'SALIDA'])
-        print("\n--- Resumen del Día ---")
-        print(f"Operaciones cerradas: {total_trades}")
-        print(f"Ganancia/Pérdida neta: {total_profit:.2f}")
+        if sincronizar and not sincronizar_cache(cache):
+            print("⚠️ Se usará el contenido actual de la caché.")
 
-    except Exception as e:
-        print(f"❌ Error al guardar el archivo de Excel: {e}")
+        inicio_cache = cache.history_start()
+        if inicio_cache is None or to_timestamp(fecha_inicio) < inicio_cache:
+            desde = 'vacía' if inicio_cache is None else f"desde {datetime.fromtimestamp(inicio_cache, timezone.utc):%Y-%m-%d %H:%M}"
+            print(f"⚠️ El periodo empieza antes del historial de la caché ({desde}). "
+                  f"Los deals anteriores no aparecerán en el reporte (DEALS_CACHE_HISTORY_DAYS).")
+
+        periodo = fecha_inicio.strftime('%Y-%m-%d')
+        if fecha_fin.date() != fecha_inicio.date():
+            periodo += f"_a_{fecha_fin.strftime('%Y-%m-%d')}"
+        print(f"🚀 Generando reporte para: {periodo}...")
+
+        escritor = None
+        total_profit, total_trades = 0.0, 0
+        try:
+            # Filtrar solo por el número mágico de nuestro bot
+            for bloque in cache.iter_deals(fecha_inicio, fecha_fin, cfg.MAGIC_NUMBER, cfg.REPORT_CHUNK_ROWS):
+                if bloque.empty:  # pandas devuelve un bloque vacío si la consulta no tiene filas
+                    continue
+                if escritor is None:
+                    escritor = abrir_escritor(formato, nombre_archivo or f"Reporte_Trades_{periodo}")
+                df_reporte = preparar_trades(bloque)
+                escritor.escribir('Trades', df_reporte)
+                total_profit += df_reporte['Ganancia'].sum()
+                total_trades += int((df_reporte['Entrada/Salida'] == 'SALIDA').sum())
+
+            if escritor is None:
+                print(f"ℹ️ No se encontraron operaciones con el MAGIC_NUMBER {cfg.MAGIC_NUMBER} en el periodo especificado.")
+                return
+
+            parciales = []
+            for posiciones in cache.iter_positions(fecha_inicio, fecha_fin, cfg.MAGIC_NUMBER, cfg.REPORT_CHUNK_ROWS):
+                posiciones = preparar_posiciones(posiciones)
+                escritor.escribir('Por posición', posiciones)
+                parciales.append(_parcial_por_simbolo(posiciones))
+            por_simbolo = resumen_por_simbolo(parciales)
+            escritor.escribir('Por símbolo', por_simbolo)
+            escritor.cerrar()
+            print(f"\n✅ ¡Éxito! Reporte guardado como {', '.join(repr(ruta) for ruta in escritor.rutas)}")
+        except Exception as e:
+            print(f"❌ Error al guardar el reporte: {e}")
+            return
+    finally:
+        cache.close()
+
+    # Calcular un resumen
+    print("\n--- Resumen del Periodo ---")
+    print(f"Operaciones cerradas: {total_trades}")
+    print(f"Ganancia/Pérdida neta: {total_profit:.2f}")
+    for fila in por_simbolo.itertuples():
+        print(f"  {fila.simbolo}: {fila.operaciones} operaciones, acierto {fila.tasa_acierto:.2%}, neto {fila.neto:.2f}")
+
+def generar_reporte_diario():
+    # --- Definir el rango de fechas (el día de ayer completo) ---
+    hoy = datetime.now()
+    ayer = hoy - timedelta(days=1)
+    fecha_inicio = datetime(ayer.year, ayer.month, ayer.day, 0, 0, 0)
+    fecha_fin = datetime(ayer.year, ayer.month, ayer.day, 23, 59, 59)
+    generar_reporte(fecha_inicio, fecha_fin)
 
-    # --- Desconexión ---
-    mt5.shutdown()
+def _rango_desde_argumentos(args):
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if args.desde:
+        inicio = datetime.strptime(args.desde, '%Y-%m-%d')
+        fin = datetime.strptime(args.hasta, '%Y-%m-%d') if args.hasta else hoy
+    elif args.dias:
+        inicio, fin = hoy - timedelta(days=args.dias), hoy - timedelta(days=1)
+    else:
+        inicio = fin = hoy - timedelta(days=1)
+    return inicio, fin.replace(hour=23, minute=59, second=59)
 
 if __name__ == "__main__":
-    generar_reporte_diario()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Reporte de operaciones del bot (desde la caché local de deals).")
+    parser.add_argument('--desde', help="Fecha inicial YYYY-MM-DD (por defecto, ayer).")
+    parser.add_argument('--hasta', help="Fecha final YYYY-MM-DD, incluida (por defecto, hoy).")
+    parser.add_argument('--dias', type=int, help="Últimos N días completos (7 = semanal, 30 = mensual).")
+    parser.add_argument('--sin-sincronizar', action='store_true',
+                        help="No conecta con el terminal: usa solo lo que ya está en la caché.")
+    parser.add_argument('--salida', help="Nombre del archivo (sin extensión).")
+    parser.add_argument('--formato', choices=FORMATOS, default='xlsx',
+                        help="xlsx (un libro con una hoja por tabla), csv o parquet (un archivo por tabla).")
+    args = parser.parse_args()
+    inicio, fin = _rango_desde_argumentos(args)
+    generar_reporte(inicio, fin, sincronizar=not args.sin_sincronizar, nombre_archivo=args.salida,
+                    formato=args.formato)
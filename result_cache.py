@@ -0,0 +1,167 @@
+# /result_cache.py
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+import numpy as np
+
+import config as cfg
+
+# Caché en disco de resultados de backtests, direccionada por contenido: la clave es un hash de
+# las velas usadas (valores, no nombre de archivo), los parámetros de la estrategia, la versión del
+# modelo (hash del archivo) y el código que produce el resultado. Si algo de eso cambia la clave
+# cambia sola, así que nunca hay que invalidar a mano. Cuando el directorio pasa de
+# RESULT_CACHE_MAX_MB se borran primero las entradas usadas hace más tiempo.
+
+_BAR_COLUMNS = ('time', 'open', 'high', 'low', 'close')
+_file_hashes = {}  # (ruta, tamaño, mtime) -> hash: un archivo que no cambia no se vuelve a leer
+
+
+def fingerprint_frame(df, columns=_BAR_COLUMNS):
+    """Hash de las velas de un DataFrame (rango de fechas incluido: son los propios valores)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(df)).encode())
+    for column in columns:
+        values = df[column].to_numpy()
+        if values.dtype.kind == 'M':
+            values = values.astype('datetime64[s]').astype(np.int64)
+        digest.update(column.encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint_file(path):
+    """Hash del contenido de un archivo (modelo, código); '' si no existe."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ''
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def _plain(value):
+    """Tipos de numpy a tipos de Python para que el JSON de la clave sea estable."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def make_key(kind, data, params, model_path=None, code_paths=()):
+    """
+    Clave de un resultado: `kind` (qué se calcula), huella de los datos, parámetros (dict
+    serializable), modelo usado y archivos de código de los que depende el resultado.
+    """
+    payload = {
+        'kind': kind,
+        'data': data,
+        'params': params,
+        'model': fingerprint_file(model_path) if model_path else None,
+        'code': [fingerprint_file(path) for path in code_paths],
+    }
+    text = json.dumps(payload, sort_keys=True, default=_plain)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=None, max_mb=None):
+        self.directory = directory or cfg.RESULT_CACHE_DIR
+        self.max_bytes = int((cfg.RESULT_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # Bytes en disco: se mide con un recorrido en el primer put y después se lleva la cuenta
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        """Resultado guardado con `key`, o None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logging.warning(f"Entrada de caché ilegible {path}: {e}. Se recalcula.")
+            self.misses += 1
+            return None
+        os.utime(path)  # La fecha de modificación hace de "último uso" para el desalojo
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Guarda `value` con `key`. El directorio solo se recorre (evict) cuando la cuenta de bytes
+        pasa del límite, no en cada put (el optimizador guarda una entrada por trial).
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        written = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += written - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Devuelve el resultado guardado o lo calcula con `compute()` y lo guarda."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _entries(self):
+        """(mtime, tamaño, ruta) de cada entrada del directorio."""
+        entries = []
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith('.pkl'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """
+        Borra las entradas usadas hace más tiempo hasta quedar por debajo del límite de tamaño.
+        Recorre el directorio, así que también cuenta lo que hayan escrito otros procesos.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                if total <= self.max_bytes:
+                    break
+        self._size = total
+        return removed
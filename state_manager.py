@@ -1,27 +1,208 @@
 # /state_manager.py
+import atexit
 import json
 import logging
-from config import STATE_FILE
+import os
+import threading
+import operational_store as ops
+import metrics
+from config import STATE_FILE, STATE_JOURNAL_FILE, STATE_COMPACT_EVERY, STATE_WRITE_BEHIND, STATE_FLUSH_INTERVAL
+
+# El estado está particionado por (símbolo, magic): {(symbol, magic): {ticket: sl}}.
+# Se guarda en dos archivos:
+#  - STATE_FILE: snapshot completo (JSON, una clave "SYMBOL|MAGIC" por partición), que solo
+#    se reescribe al compactar.
+#  - STATE_JOURNAL_FILE: un registro JSON por línea con cada cambio (alta/actualización o baja).
+# Cada cambio cuesta un append; al arrancar se aplica el journal sobre el snapshot.
+
+_journal_records = 0  # Registros en el journal desde la última compactación
+
+# --- Escritura diferida (write-behind) ---
+# El hilo de trading solo deja los cambios en _pending (coalescidos por ticket); un hilo en
+# segundo plano los escribe de una vez al final de cada ciclo o, como mucho, cada
+# STATE_FLUSH_INTERVAL segundos. El escritor mantiene su propia copia del estado para compactar,
+# así nunca recorre el diccionario que el hilo de trading está modificando.
+_pending = {}  # (symbol, magic, ticket) -> (sl, hora del ciclo); sl None = baja
+_pending_lock = threading.Lock()
+_write_lock = threading.Lock()  # Una sola escritura a la vez (hilo de fondo o cierre síncrono)
+_flush_requested = threading.Event()
+_stop_requested = threading.Event()
+_writer_thread = None
+_writer_state = {}
+_atexit_registered = False
+
+def _write_snapshot(state_dict):
+    """Escribe el snapshot de forma atómica: archivo temporal + fsync + rename."""
+    tmp_file = f"{STATE_FILE}.tmp"
+    snapshot = {f"{symbol}|{magic}": tickets for (symbol, magic), tickets in state_dict.items() if tickets}
+    with open(tmp_file, 'w') as f:
+        json.dump(snapshot, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, STATE_FILE)
 
 def save_trailing_stop_state(state_dict):
-    """Guarda el diccionario de estado del trailing stop en un archivo JSON."""
+    """Compacta el estado: guarda el snapshot completo y vacía el journal."""
+    global _journal_records
     try:
-        with open(STATE_FILE, 'w') as f:
-            json.dump(state_dict, f, indent=4)
+        _write_snapshot(state_dict)
+        # Si se cae aquí, el journal se vuelve a aplicar sobre un snapshot que ya lo incluye: es idempotente
+        with open(STATE_JOURNAL_FILE, 'w') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        _journal_records = 0
+        metrics.increment('state_snapshot_writes')
     except Exception as e:
         logging.error(f"Error al guardar el estado del trailing stop: {e}")
         print(f"❌ Error al guardar estado: {e}")
 
+def append_trailing_stop_records(state_dict, records):
+    """
+    Añade al journal los cambios de `records`, una lista de (symbol, magic, ticket, sl); sl=None
+    indica que el ticket dejó de gestionarse. Todos los registros van en una sola escritura con fsync.
+    `state_dict` debe reflejar ya los cambios: se usa para compactar cuando el journal crece.
+    """
+    global _journal_records
+    if not records:
+        return
+    lines = ''.join(
+        json.dumps({'symbol': symbol, 'magic': magic, 'ticket': ticket, 'sl': sl} if sl is not None
+                   else {'symbol': symbol, 'magic': magic, 'ticket': ticket, 'removed': True}) + '\n'
+        for symbol, magic, ticket, sl in records
+    )
+    try:
+        with open(STATE_JOURNAL_FILE, 'a') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        _journal_records += len(records)
+        metrics.increment('state_journal_writes')
+        metrics.increment('state_records_written', len(records))
+    except Exception as e:
+        logging.error(f"Error al escribir el journal del trailing stop: {e}")
+        print(f"❌ Error al guardar estado: {e}")
+        return
+    if _journal_records >= STATE_COMPACT_EVERY:
+        save_trailing_stop_state(state_dict)
+
+def _replay_journal(state):
+    """Aplica el journal sobre `state`. Devuelve (registros aplicados, hubo línea dañada)."""
+    applied, damaged = 0, False
+    try:
+        with open(STATE_JOURNAL_FILE, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    key = (record['symbol'], int(record['magic']))
+                    ticket = int(record['ticket'])
+                except (ValueError, KeyError, TypeError):
+                    # Típicamente la última línea, cortada por una caída a mitad de escritura
+                    damaged = True
+                    continue
+                if record.get('removed'):
+                    state.get(key, {}).pop(ticket, None)
+                else:
+                    state.setdefault(key, {})[ticket] = record['sl']
+                applied += 1
+    except FileNotFoundError:
+        pass
+    return applied, damaged
+
 def load_trailing_stop_state():
-    """Carga el diccionario de estado del trailing stop desde un archivo JSON."""
+    """Carga el estado del trailing stop ({(symbol, magic): {ticket: sl}}): snapshot más journal."""
+    global _journal_records
     try:
         with open(STATE_FILE, 'r') as f:
             state_data = json.load(f)
+        state = {}
+        for key, tickets in state_data.items():
+            if not isinstance(tickets, dict):
+                # Formato antiguo {ticket: sl} sin símbolo: se descarta; el SL vigente se vuelve
+                # a leer de la posición (pos.sl) la próxima vez que se gestione.
+                logging.info(f"Estado de trailing stop en formato antiguo (ticket {key}). Se reconstruirá desde MT5.")
+                continue
+            symbol, magic = key.rsplit('|', 1)
             # Asegurarse de que las claves del diccionario sean enteros (ticket IDs)
-            return {int(k): v for k, v in state_data.items()}
+            state[(symbol, int(magic))] = {int(k): v for k, v in tickets.items()}
     except FileNotFoundError:
-        return {}
+        state = {}
     except Exception as e:
         logging.error(f"Error al cargar el estado del trailing stop: {e}")
         print(f"❌ Error al cargar estado: {e}")
-        return {}
\ No newline at end of file
+        state = {}
+
+    try:
+        applied, damaged = _replay_journal(state)
+    except Exception as e:
+        logging.error(f"Error al leer el journal del trailing stop: {e}")
+        print(f"❌ Error al cargar estado: {e}")
+        applied, damaged = 0, False
+    _journal_records = applied
+    if damaged:
+        logging.warning("Journal del trailing stop con registros dañados (escritura interrumpida). Compactando.")
+        save_trailing_stop_state(state)
+    _writer_state.clear()
+    _writer_state.update({key: dict(tickets) for key, tickets in state.items()})
+    return state
+
+def _write_pending():
+    """Escribe en el journal, en una sola escritura, todo lo acumulado desde la última vez."""
+    global _pending
+    with _write_lock:
+        with _pending_lock:
+            if not _pending:
+                return
+            batch, _pending = _pending, {}
+        for (symbol, magic, ticket), (sl, _) in batch.items():
+            if sl is None:
+                _writer_state.get((symbol, magic), {}).pop(ticket, None)
+            else:
+                _writer_state.setdefault((symbol, magic), {})[ticket] = sl
+        append_trailing_stop_records(_writer_state, [(*key, sl) for key, (sl, _) in batch.items()])
+        ops.record_trailing_stops([(*key, sl, at) for key, (sl, at) in batch.items()])
+
+def _writer_loop():
+    while not _stop_requested.is_set():
+        _flush_requested.wait(timeout=STATE_FLUSH_INTERVAL)
+        _flush_requested.clear()
+        _write_pending()
+
+def queue_trailing_stop_records(symbol, magic, records):
+    """
+    Encola cambios (ticket, sl) de la partición (symbol, magic); sl=None indica baja.
+    Con STATE_WRITE_BEHIND los escribe el hilo de fondo; si no, se escriben en el momento.
+    """
+    global _writer_thread, _atexit_registered
+    if not records:
+        return
+    at = ops.timestamp()
+    with _pending_lock:
+        _pending.update(((symbol, magic, ticket), (sl, at)) for ticket, sl in records)
+    metrics.increment('state_records_queued', len(records))
+    if not STATE_WRITE_BEHIND:
+        _write_pending()
+        return
+    if _writer_thread is None:
+        _writer_thread = threading.Thread(target=_writer_loop, name="state-writer", daemon=True)
+        _writer_thread.start()
+        if not _atexit_registered:
+            atexit.register(shutdown_state_writer)
+            _atexit_registered = True
+
+def flush_trailing_stop_state():
+    """Pide al hilo de fondo que escriba ya lo pendiente (al final de cada ciclo). No bloquea."""
+    _flush_requested.set()
+
+def shutdown_state_writer():
+    """
+    Detiene el hilo de fondo y escribe de forma síncrona lo que quede pendiente. Si el hilo
+    sigue escribiendo tras el timeout, _write_lock hace que esta escritura espere a la suya.
+    """
+    global _writer_thread
+    if _writer_thread is not None:
+        _stop_requested.set()
+        _flush_requested.set()
+        _writer_thread.join(timeout=10)
+        _writer_thread = None
+        _stop_requested.clear()
+    _write_pending()
@@ -0,0 +1,98 @@
+# /symbol_metadata.py
+import json
+import logging
+import os
+from collections import namedtuple
+
+import config as cfg
+
+# Tabla local con los metadatos de cada símbolo (point, dígitos, tamaño de contrato, divisas,
+# límites de volumen) para que los backtests y análisis no necesiten conectarse al terminal.
+# Se guarda en cfg.SYMBOL_METADATA_FILE; si un símbolo no está en el archivo se usan los valores
+# por defecto de una cuenta estándar. `refresh()` actualiza el archivo desde un terminal conectado.
+
+FIELDS = ('point', 'digits', 'trade_contract_size', 'currency_base', 'currency_profit', 'currency_margin',
+          'volume_min', 'volume_max', 'volume_step')
+
+SymbolMetadata = namedtuple('SymbolMetadata', ('name',) + FIELDS)
+
+# Metadatos por defecto de los símbolos (los mismos que muestra el terminal en una cuenta estándar)
+DEFAULT_SYMBOLS = {
+    'EURUSD': dict(point=1e-05, digits=5, currency_base='EUR', currency_profit='USD'),
+    'GBPUSD': dict(point=1e-05, digits=5, currency_base='GBP', currency_profit='USD'),
+    'USDJPY': dict(point=1e-03, digits=3, currency_base='USD', currency_profit='JPY'),
+    'AUDUSD': dict(point=1e-05, digits=5, currency_base='AUD', currency_profit='USD'),
+    'USDCHF': dict(point=1e-05, digits=5, currency_base='USD', currency_profit='CHF'),
+    'USDCAD': dict(point=1e-05, digits=5, currency_base='USD', currency_profit='CAD'),
+}
+DEFAULT_CONTRACT_SIZE = 100000.0
+DEFAULT_VOLUME_MIN = 0.01
+DEFAULT_VOLUME_MAX = 100.0
+DEFAULT_VOLUME_STEP = 0.01
+
+_table = None  # símbolo -> dict, cargada del archivo la primera vez que se pide
+
+
+def _default(symbol):
+    meta = DEFAULT_SYMBOLS.get(symbol, dict(point=1e-05, digits=5, currency_base=symbol[:3],
+                                            currency_profit=symbol[3:6]))
+    return dict(meta, trade_contract_size=DEFAULT_CONTRACT_SIZE, currency_margin=meta['currency_base'],
+                volume_min=DEFAULT_VOLUME_MIN, volume_max=DEFAULT_VOLUME_MAX, volume_step=DEFAULT_VOLUME_STEP)
+
+
+def _load(path=None):
+    global _table
+    if _table is None:
+        path = path or cfg.SYMBOL_METADATA_FILE
+        _table = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    _table = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"No se pudo leer la tabla de símbolos {path}: {e}. Se usan valores por defecto.")
+    return _table
+
+
+def get(symbol):
+    """Metadatos de `symbol` (mismos atributos que mt5.symbol_info) sin conectar con el terminal."""
+    meta = _default(symbol)
+    meta.update({k: v for k, v in _load().get(symbol, {}).items() if k in FIELDS})
+    return SymbolMetadata(name=symbol, **meta)
+
+
+def refresh(mt5, symbols, path=None):
+    """
+    Pide symbol_info al terminal (ya inicializado) para `symbols` y guarda la tabla local.
+    Devuelve cuántos símbolos se actualizaron.
+    """
+    global _table
+    path = path or cfg.SYMBOL_METADATA_FILE
+    table = dict(_load(path))
+    updated = 0
+    for symbol in symbols:
+        info = mt5.symbol_info(symbol)
+        if info is None:
+            logging.warning(f"[{symbol}] symbol_info no disponible; se conserva el valor anterior.")
+            continue
+        table[symbol] = {field: getattr(info, field) for field in FIELDS}
+        updated += 1
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    _table = table
+    return updated
+
+
+if __name__ == "__main__":
+    from mt5_backend import get_mt5
+    mt5 = get_mt5(cfg.MT5_BACKEND)
+    if not mt5.initialize():
+        print("❌ initialize() falló, error code =", mt5.last_error())
+    else:
+        try:
+            updated = refresh(mt5, cfg.SYMBOLS)
+            print(f"✅ Tabla de símbolos actualizada ({updated}/{len(cfg.SYMBOLS)}) en '{cfg.SYMBOL_METADATA_FILE}'.")
+        finally:
+            mt5.shutdown()
@@ -1,10 +1,16 @@
 # backtest_diario.py (versión con detalles de trades)
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 import pandas as pd
-import numpy as np
 import joblib
 import MetaTrader5 as mt5
 from datetime import datetime
 
+import performance
+import symbol_metadata
+
 # --- PARÁMETROS (Sin cambios) ---
 SYMBOL_TO_TEST = "EURUSD"
 TIMEFRAME = mt5.TIMEFRAME_M5
@@ -122,17 +128,17 @@ def run_daily_backtest():
                     open_trade = {'type': signal, 'entry_price': entry_price, 'sl': sl, 'tp': tp, 'entry_time': current_row['time']}
 
     # --- SECCIÓN DE REPORTE MODIFICADA ---
-    symbol_info = mt5.symbol_info(SYMBOL_TO_TEST)
     mt5.shutdown()
+    symbol_info = symbol_metadata.get(SYMBOL_TO_TEST)
 
     print(f"\n--- 📊 Reporte de Backtesting del Día ({start_date.strftime('%Y-%m-%d')}) ---")
     if not trades:
         print("No se realizó ninguna operación en lo que va del día.")
         return
 
+    stats = performance.analyze(performance.trades_to_array(trades), symbol_info.point)
     df_trades = pd.DataFrame(trades)
-    df_trades['profit'] = (df_trades['exit_price'] - df_trades['entry_price']) * np.where(df_trades['type'] == 'BUY', 1, -1)
-    df_trades['pips'] = df_trades['profit'] / symbol_info.point
+    df_trades['pips'] = stats['pips']
     
     # --- LÍNEAS AÑADIDAS PARA MOSTRAR DETALLES ---
     print("\n--- 📋 Detalles de las Operaciones ---")
@@ -142,17 +148,7 @@ def run_daily_backtest():
     # --- FIN DE LÍNEAS AÑADIDAS ---
 
     print("\n--- Resumen General ---")
-    total_trades = len(df_trades)
-    winning_trades = df_trades[df_trades['profit'] > 0]
-    win_rate = (len(winning_trades) / total_trades) * 100 if total_trades > 0 else 0
-    gross_profit = winning_trades['pips'].sum()
-    gross_loss = abs(df_trades[df_trades['profit'] <= 0]['pips'].sum())
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-    
-    print(f"Operaciones Totales:    {total_trades}")
-    print(f"Tasa de Acierto:        {win_rate:.2f}%")
-    print(f"Ganancia Neta (pips):   {df_trades['pips'].sum():.2f}")
-    print(f"Profit Factor:          {profit_factor:.2f}")
+    performance.print_report(stats)
 
 if __name__ == "__main__":
     run_daily_backtest()
\ No newline at end of file
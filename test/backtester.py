@@ -6,11 +6,12 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pandas as pd
-import MetaTrader5 as mt5
 
 # Importamos nuestros módulos y configuraciones
 import config as cfg
 import indicators as ind
+import performance
+import symbol_metadata
 
 # --- PARÁMETROS DEL BACKTEST ---
 # Apunta al archivo CSV que generaste en el paso anterior
@@ -64,17 +65,8 @@ def run_local_backtest():
         print("Asegúrate de que el archivo está en la misma carpeta y el nombre es correcto.")
         return
 
-    # Breve conexión a MT5 solo para obtener datos del símbolo (valor del pip)
-    if not mt5.initialize():
-        print("❌ No se pudo conectar a MT5 para obtener la info del símbolo.")
-        symbol_info = None
-    else:
-        symbol_info = mt5.symbol_info(SYMBOL_FOR_INFO)
-        mt5.shutdown() # Nos desconectamos inmediatamente
-
-    if symbol_info is None:
-        print(f"❌ No se pudo obtener la info para {SYMBOL_FOR_INFO}. El cálculo de pips puede fallar.")
-        return
+    # Info del símbolo (valor del pip) desde la tabla local: no hace falta conectar con MT5
+    symbol_info = symbol_metadata.get(SYMBOL_FOR_INFO)
 
     print(f"✅ Datos locales cargados: {len(df_history)} velas.")
     
@@ -135,25 +127,8 @@ def run_local_backtest():
         print("No se realizó ninguna operación.")
         return
 
-    df_trades = pd.DataFrame(trades)
-    df_trades['pips'] = df_trades['profit'] / symbol_info.point
-    
-    total_trades = len(df_trades)
-    winning_trades = df_trades[df_trades['profit'] > 0]
-    losing_trades = df_trades[df_trades['profit'] <= 0]
-    
-    win_rate = (len(winning_trades) / total_trades) * 100 if total_trades > 0 else 0
-    gross_profit = winning_trades['pips'].sum()
-    gross_loss = abs(losing_trades['pips'].sum())
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-    net_profit_pips = df_trades['pips'].sum()
-
-    print(f"Operaciones Totales:    {total_trades}")
-    print(f"Operaciones Ganadoras:  {len(winning_trades)}")
-    print(f"Operaciones Perdedoras: {len(losing_trades)}")
-    print(f"Tasa de Acierto:        {win_rate:.2f}%")
-    print(f"Ganancia Neta (pips):   {net_profit_pips:.2f}")
-    print(f"Profit Factor:          {profit_factor:.2f}  (>1.5 es bueno)")
+    stats = performance.analyze(performance.trades_to_array(trades), symbol_info.point)
+    performance.print_report(stats)
 
 if __name__ == "__main__":
     run_local_backtest()
\ No newline at end of file
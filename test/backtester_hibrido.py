@@ -4,10 +4,16 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
+import argparse
 import pandas as pd
 import numpy as np
 import joblib
-import MetaTrader5 as mt5
+
+import performance
+import result_cache
+import symbol_metadata
+
+from backtest_engine import FEATURE_COLUMNS, add_v4_indicators, v4_candidates, sweep_thresholds
 
 # --- PARÁMETROS DEL BACKTEST HÍBRIDO ---
 DATA_FILE_PATH = "EURUSD_M5_data_1Y.csv"
@@ -28,20 +34,17 @@ MACD_SIGNAL = 9
 ADX_PERIOD = 14
 ATR_PERIOD = 14
 
-def run_hybrid_backtest():
-    print(f"🚀 Iniciando Backtest Híbrido (V4 + Filtro ML)...")
-    print(f"Umbral de confianza del ML: {ML_CONFIDENCE_THRESHOLD:.2%}")
+STRATEGY_PARAMS = dict(adx_threshold=ADX_THRESHOLD, sl_mult=SL_MULT, tp_mult=TP_MULT, rsi_period=RSI_PERIOD,
+                       macd_fast=MACD_FAST, macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL,
+                       adx_period=ADX_PERIOD, atr_period=ATR_PERIOD)
+# Código del que dependen los resultados: si cambia, la caché de resultados deja de coincidir
+CODE_FILES = (os.path.abspath(__file__), os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backtest_engine.py')))
 
-    # 1. Cargar el modelo y los datos
-    try:
-        ml_model = joblib.load(MODEL_FILE_PATH)
-    except FileNotFoundError:
-        print(f"❌ ERROR: No se encontró el archivo del modelo '{MODEL_FILE_PATH}'.")
-        return
-    
-    df = pd.read_csv(DATA_FILE_PATH, parse_dates=['time'])
-    print(f"✅ Datos y modelo cargados.")
+# Umbrales que se evalúan con --sweep (de 0.50 a 0.70 en pasos de 0.01)
+SWEEP_THRESHOLDS = np.round(np.arange(0.50, 0.705, 0.01), 2)
 
+def simulate_hybrid(df, ml_model):
+    """Indicadores V4 y simulación con el filtro ML (una posición a la vez). Devuelve la lista de trades."""
     # 2. Pre-cálculo de indicadores (idéntico a los scripts anteriores)
     print("⏳ Pre-calculando indicadores...")
     # ... (Cálculos de MACD, RSI, ATR, ADX. Es el mismo bloque que antes)
@@ -120,34 +123,97 @@ def run_hybrid_backtest():
                     sl = entry_price - atr_val * SL_MULT if signal == "BUY" else entry_price + atr_val * SL_MULT
                     tp = entry_price + atr_val * TP_MULT if signal == "BUY" else entry_price - atr_val * TP_MULT
                     open_trade = {'type': signal, 'entry_price': entry_price, 'sl': sl, 'tp': tp, 'entry_time': current_row['time']}
+    return trades
 
-    # 4. Reporte de resultados
-    # ... (Bloque de reporte idéntico a los scripts anteriores)
-    if not mt5.initialize(): return
-    symbol_info = mt5.symbol_info(SYMBOL_FOR_INFO)
-    mt5.shutdown()
-    if symbol_info is None: return
+def run_hybrid_backtest(use_cache=True):
+    print(f"🚀 Iniciando Backtest Híbrido (V4 + Filtro ML)...")
+    print(f"Umbral de confianza del ML: {ML_CONFIDENCE_THRESHOLD:.2%}")
 
+    # 1. Cargar los datos y buscar el resultado en la caché (mismas velas, parámetros, modelo y código)
+    if not os.path.exists(MODEL_FILE_PATH):
+        print(f"❌ ERROR: No se encontró el archivo del modelo '{MODEL_FILE_PATH}'.")
+        return
+
+    df = pd.read_csv(DATA_FILE_PATH, parse_dates=['time'])
+    cache = result_cache.ResultCache() if use_cache else None
+    key = result_cache.make_key('backtester_hibrido', result_cache.fingerprint_frame(df),
+                                dict(STRATEGY_PARAMS, threshold=ML_CONFIDENCE_THRESHOLD),
+                                MODEL_FILE_PATH, CODE_FILES)
+    trades = cache.get(key) if cache is not None else None
+    if trades is not None:
+        print(f"⚡ Resultado recuperado de la caché ({len(trades)} trades).")
+    else:
+        ml_model = joblib.load(MODEL_FILE_PATH)
+        print(f"✅ Datos y modelo cargados.")
+        trades = simulate_hybrid(df, ml_model)
+        if cache is not None:
+            cache.put(key, trades)
+
+    # 4. Reporte de resultados
     print(f"\n--- 📊 Reporte de Backtesting Híbrido (Umbral: {ML_CONFIDENCE_THRESHOLD:.0%}) ---")
     if not trades:
         print("No se realizó ninguna operación con este nivel de confianza.")
         return
 
-    df_trades = pd.DataFrame(trades)
-    df_trades['profit'] = (df_trades['exit_price'] - df_trades['entry_price']) * np.where(df_trades['type'] == 'BUY', 1, -1)
-    df_trades['pips'] = df_trades['profit'] / symbol_info.point
-    
-    total_trades = len(df_trades)
-    winning_trades = df_trades[df_trades['profit'] > 0]
-    win_rate = (len(winning_trades) / total_trades) * 100 if total_trades > 0 else 0
-    gross_profit = winning_trades['pips'].sum()
-    gross_loss = abs(df_trades[df_trades['profit'] <= 0]['pips'].sum())
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-    
-    print(f"Operaciones Totales:    {total_trades}")
-    print(f"Tasa de Acierto:        {win_rate:.2f}%")
-    print(f"Ganancia Neta (pips):   {df_trades['pips'].sum():.2f}")
-    print(f"Profit Factor:          {profit_factor:.2f}")
+    stats = performance.analyze(performance.trades_to_array(trades), symbol_metadata.get(SYMBOL_FOR_INFO).point)
+    performance.print_report(stats, breakdowns=True)
+
+def run_threshold_sweep(thresholds=SWEEP_THRESHOLDS, use_cache=True):
+    """
+    Barrido de umbrales de confianza en una sola pasada: el modelo puntúa todas las
+    candidatas V4 de una vez (un único predict_proba por lotes) y el motor evalúa todos
+    los umbrales a la vez respetando la regla de una posición abierta.
+    """
+    print(f"🚀 Barrido de umbrales del filtro ML ({len(thresholds)} umbrales)...")
+    if not os.path.exists(MODEL_FILE_PATH):
+        print(f"❌ ERROR: No se encontró el archivo del modelo '{MODEL_FILE_PATH}'.")
+        return None
+
+    df = pd.read_csv(DATA_FILE_PATH, parse_dates=['time'])
+    cache = result_cache.ResultCache() if use_cache else None
+    key = result_cache.make_key('backtester_hibrido_sweep', result_cache.fingerprint_frame(df),
+                                dict(STRATEGY_PARAMS, thresholds=[float(t) for t in thresholds]),
+                                MODEL_FILE_PATH, CODE_FILES)
+    table = cache.get(key) if cache is not None else None
+    if table is None:
+        table = _sweep(df, thresholds)
+        if cache is not None:
+            cache.put(key, table)
+    else:
+        print("⚡ Resultado recuperado de la caché.")
+    print("\n--- 📊 Resultados por umbral de confianza ---")
+    print(table.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    return table
+
+def _sweep(df, thresholds):
+    """
+    Puntúa las candidatas con el modelo y evalúa todos los umbrales (sin caché). El resultado
+    neto se da en pips (net_pips), como en el reporte de un solo umbral.
+    """
+    ml_model = joblib.load(MODEL_FILE_PATH)
+    add_v4_indicators(df, RSI_PERIOD, MACD_FAST, MACD_SLOW, MACD_SIGNAL, ADX_PERIOD, ATR_PERIOD)
+    df.dropna(inplace=True)
+
+    buy, sell = v4_candidates(df, ADX_THRESHOLD)
+    candidates = np.flatnonzero(buy | sell)
+    confidence = np.full(len(df), np.nan)
+    if len(candidates):
+        confidence[candidates] = ml_model.predict_proba(df[FEATURE_COLUMNS].iloc[candidates])[:, 1]
+    print(f"✅ {len(candidates)} señales candidatas puntuadas.")
+
+    table = sweep_thresholds(df, confidence, thresholds, ADX_THRESHOLD, SL_MULT, TP_MULT)
+    table['net_profit'] /= symbol_metadata.get(SYMBOL_FOR_INFO).point
+    return table.rename(columns={'net_profit': 'net_pips'})
 
 if __name__ == "__main__":
-    run_hybrid_backtest()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backtest híbrido V4 + filtro ML.")
+    parser.add_argument('--sweep', nargs='*', type=float, default=None,
+                        help="Evalúa varios umbrales en una pasada (sin valores: de 0.50 a 0.70)")
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="Recalcula aunque haya un resultado guardado para las mismas velas y parámetros.")
+    args = parser.parse_args()
+
+    if args.sweep is None:
+        run_hybrid_backtest(not args.sin_cache)
+    else:
+        run_threshold_sweep(args.sweep or SWEEP_THRESHOLDS, not args.sin_cache)
\ No newline at end of file
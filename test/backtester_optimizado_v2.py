@@ -3,11 +3,13 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import argparse
 import pandas as pd
-import MetaTrader5 as mt5
-import numpy as np
 
 import config as cfg
+import performance
+import result_cache
+import symbol_metadata
 
 # --- PARÁMETROS ---
 DATA_FILE_PATH = "EURUSD_5_data_1Y.csv" 
@@ -16,14 +18,12 @@ ADX_THRESHOLD = 20
 # Volvemos a los multiplicadores que mejor funcionaron
 SL_MULT = 2.0
 TP_MULT = 4.0
+STRATEGY_PARAMS = dict(adx_threshold=ADX_THRESHOLD, sl_mult=SL_MULT, tp_mult=TP_MULT, rsi_period=cfg.RSI_PERIOD,
+                       macd_fast=cfg.MACD_FAST, macd_slow=cfg.MACD_SLOW, macd_signal=cfg.MACD_SIGNAL,
+                       adx_period=cfg.ADX_PERIOD, atr_period=cfg.ATR_PERIOD)
 
-def run_optimized_backtest_v4():
-    print(f"🚀 Iniciando Backtest V4 (Entrada por Confluencia MACD+RSI)...")
-
-    # 1. Cargar y preparar datos (idéntico a V2)
-    df = pd.read_csv(DATA_FILE_PATH, parse_dates=['time'])
-    print(f"✅ Datos locales cargados: {len(df)} velas.")
-
+def simulate_v4(df):
+    """Indicadores y simulación V4 (confluencia MACD+RSI) sobre las velas. Devuelve la lista de trades."""
     print("⏳ Pre-calculando indicadores...")
     # MACD
     ema_fast = df['close'].ewm(span=cfg.MACD_FAST, adjust=False).mean()
@@ -124,34 +124,39 @@ def run_optimized_backtest_v4():
                     tp = entry_price - atr_val * TP_MULT
                 
                 open_trade = {'type': signal, 'entry_price': entry_price, 'sl': sl, 'tp': tp, 'entry_time': current_row['time']}
+    return trades
 
-    # Reporte de resultados
-    if not mt5.initialize(): return
-    symbol_info = mt5.symbol_info(SYMBOL_FOR_INFO)
-    mt5.shutdown()
-    if symbol_info is None: return
+def run_optimized_backtest_v4(use_cache=True):
+    print(f"🚀 Iniciando Backtest V4 (Entrada por Confluencia MACD+RSI)...")
 
+    # 1. Cargar y preparar datos (idéntico a V2)
+    df = pd.read_csv(DATA_FILE_PATH, parse_dates=['time'])
+    print(f"✅ Datos locales cargados: {len(df)} velas.")
+
+    # Mismas velas, parámetros y código que una ejecución anterior: se reutiliza su resultado
+    cache = result_cache.ResultCache() if use_cache else None
+    key = result_cache.make_key('backtester_optimizado_v4', result_cache.fingerprint_frame(df), STRATEGY_PARAMS,
+                                code_paths=(os.path.abspath(__file__),))
+    trades = cache.get(key) if cache is not None else None
+    if trades is not None:
+        print(f"⚡ Resultado recuperado de la caché ({len(trades)} trades).")
+    else:
+        trades = simulate_v4(df)
+        if cache is not None:
+            cache.put(key, trades)
+
+    # Reporte de resultados
     print("\n--- 📊 Reporte de Backtesting (V4 - Confluencia MACD+RSI) ---")
     if not trades:
         print("No se realizó ninguna operación.")
         return
 
-    df_trades = pd.DataFrame(trades)
-    df_trades['profit'] = (df_trades['exit_price'] - df_trades['entry_price']) * np.where(df_trades['type'] == 'BUY', 1, -1)
-    df_trades['pips'] = df_trades['profit'] / symbol_info.point
-    
-    total_trades = len(df_trades)
-    winning_trades = df_trades[df_trades['profit'] > 0]
-    win_rate = (len(winning_trades) / total_trades) * 100 if total_trades > 0 else 0
-    gross_profit = winning_trades['pips'].sum()
-    gross_loss = abs(df_trades[df_trades['profit'] <= 0]['pips'].sum())
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-    
-    print(f"Operaciones Totales:    {total_trades}")
-    print(f"Tasa de Acierto:        {win_rate:.2f}%")
-    print(f"Ganancia Neta (pips):   {df_trades['pips'].sum():.2f}")
-    print(f"Profit Factor:          {profit_factor:.2f}  (>1.5 es bueno)")
-
+    stats = performance.analyze(performance.trades_to_array(trades), symbol_metadata.get(SYMBOL_FOR_INFO).point)
+    performance.print_report(stats, breakdowns=True)
 
 if __name__ == "__main__":
-    run_optimized_backtest_v4()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backtest V4 (confluencia MACD+RSI) sobre velas locales.")
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="Recalcula aunque haya un resultado guardado para las mismas velas y parámetros.")
+    args = parser.parse_args()
+    run_optimized_backtest_v4(not args.sin_cache)
\ No newline at end of file
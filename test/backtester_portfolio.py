@@ -0,0 +1,171 @@
+# backtester_portfolio.py
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import config as cfg
+import bar_store
+import performance
+import symbol_metadata
+from backtest_engine import FEATURE_COLUMNS, add_v4_indicators, v4_candidates, simulate_v4_trades
+
+# Backtest de cartera: la V4 (parámetros de config) sobre todos los símbolos de cfg.SYMBOLS, cada
+# símbolo en un proceso que lee sus velas mapeadas en memoria desde bar_store. Los trades se unen
+# en una línea de tiempo común (una posición por símbolo, como el bot) para calcular la equity
+# de la cartera con riesgo fijo RISK_PERCENT sobre el balance y la exposición simultánea.
+
+def simulate_symbol(symbol, model_path=None, use_m1=False, store_dir=None):
+    """
+    Trades V4 de un símbolo, con su R-múltiplo y sus pips. Se ejecuta en un proceso del pool.
+    Con `use_m1`, las velas M5 que tocan SL y TP se resuelven con las M1 de bar_store.
+    """
+    df = bar_store.to_frame(bar_store.open_bars(symbol, 'M5', store_dir))
+    intrabar = bar_store.open_intrabar(symbol, store_dir=store_dir) if use_m1 else None
+    add_v4_indicators(df, cfg.RSI_PERIOD, cfg.MACD_FAST, cfg.MACD_SLOW, cfg.MACD_SIGNAL, cfg.ADX_PERIOD, cfg.ATR_PERIOD)
+    # Los NaN de los indicadores suelen estar solo al principio: se corta en lugar de usar dropna,
+    # que copiaría también las columnas de precios mapeadas en memoria
+    valid = df.notna().all(axis=1).to_numpy()
+    first = int(valid.argmax())
+    df = (df.iloc[first:] if valid[first:].all() else df[valid]).reset_index(drop=True)
+    accept = None
+    if model_path:
+        import joblib
+        ml_model = joblib.load(model_path)
+        buy, sell = v4_candidates(df, cfg.ADX_THRESHOLD)
+        candidates = np.flatnonzero(buy | sell)
+        accept = np.zeros(len(df), dtype=bool)
+        if len(candidates):
+            accept[candidates] = ml_model.predict_proba(df[FEATURE_COLUMNS].iloc[candidates])[:, 1] >= cfg.ML_CONFIDENCE_THRESHOLD
+    # Trailing stop solo si el bot en vivo mueve los SL (LIVE_TRAILING_STOP y TRAILING_STOP_ACTIVE)
+    trailing = None
+    if cfg.LIVE_TRAILING_STOP and cfg.TRAILING_STOP_ACTIVE:
+        trailing = (cfg.TRAILING_STOP_DISTANCE_ATR, cfg.MIN_PROFIT_TO_TRAIL_ATR, cfg.ATR_PERIOD)
+    trades = simulate_v4_trades(df, cfg.ADX_THRESHOLD, cfg.SL_ATR_MULT, cfg.TP_ATR_MULT, accept=accept, trailing=trailing,
+                                intrabar=intrabar)
+    direction = np.where(trades['type'] == 'BUY', 1.0, -1.0)
+    move = (trades['exit_price'] - trades['entry_price']) * direction
+    trades['r'] = move / (trades['entry_price'] - trades['sl']).abs()
+    trades['pips'] = move / symbol_metadata.get(symbol).point
+    trades.insert(0, 'symbol', symbol)
+    return trades.drop(columns=['entry_idx', 'exit_idx'])
+
+def portfolio_equity(trades, initial_balance, risk_percent):
+    """
+    Recorre entradas y salidas de todos los símbolos en orden temporal (a igual hora, primero las
+    salidas). Cada trade arriesga `risk_percent` del balance cerrado al abrirse y al cerrarse suma
+    R * riesgo. Devuelve la curva de equity (un punto por salida) y la exposición por evento.
+    """
+    n = len(trades)
+    times = np.concatenate([trades['entry_time'].to_numpy(), trades['exit_time'].to_numpy()])
+    is_entry = np.r_[np.ones(n, dtype=bool), np.zeros(n, dtype=bool)]
+    trade = np.r_[np.arange(n), np.arange(n)]
+    order = np.lexsort((is_entry, times))
+    r = trades['r'].to_numpy()
+
+    balance = float(initial_balance)
+    at_risk = np.zeros(n)
+    open_positions, open_risk = 0, 0.0
+    equity_time, equity = [], []
+    exposure = np.zeros((len(order), 2))  # posiciones abiertas y riesgo abierto (% del balance) tras cada evento
+    for k, event in enumerate(order):
+        t = trade[event]
+        if is_entry[event]:
+            at_risk[t] = balance * risk_percent
+            open_positions += 1
+            open_risk += at_risk[t]
+        else:
+            balance += at_risk[t] * r[t]
+            open_positions -= 1
+            open_risk -= at_risk[t]
+            equity_time.append(times[event])
+            equity.append(balance)
+        exposure[k] = open_positions, open_risk / balance * 100
+    curve = pd.DataFrame({'time': equity_time, 'equity': equity})
+    exposure = pd.DataFrame({'time': times[order], 'open_positions': exposure[:, 0].astype(int),
+                             'open_risk_pct': exposure[:, 1]})
+    return curve, exposure
+
+def exposure_summary(exposure):
+    """Tiempo con posiciones abiertas (ponderado por duración) y máximos de exposición."""
+    seconds = np.diff(exposure['time'].to_numpy()).astype('timedelta64[s]').astype(float)
+    total = seconds.sum()
+    counts = exposure['open_positions'].to_numpy()[:-1]
+    share = {k: seconds[counts == k].sum() / total * 100 if total else 0.0 for k in range(counts.max(initial=0) + 1)}
+    return {
+        'max_positions': int(exposure['open_positions'].max()),
+        'max_open_risk_pct': float(exposure['open_risk_pct'].max()),
+        'avg_positions': float((counts * seconds).sum() / total) if total else 0.0,
+        'time_share_pct': share,
+    }
+
+def run_portfolio_backtest(symbols, model_path=None, workers=None, output=None, use_m1=False):
+    print(f"🚀 Backtest de cartera V4: {', '.join(symbols)}...")
+    started = time.perf_counter()
+    available = []
+    for symbol in symbols:
+        try:
+            bar_store.build(symbol, 'M5')
+            available.append(symbol)
+        except FileNotFoundError as e:
+            print(f"⚠️ {e}. Símbolo omitido.")
+    if not available:
+        return None
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or len(available)) as pool:
+        futures = {pool.submit(simulate_symbol, symbol, model_path, use_m1): symbol for symbol in available}
+        for future in as_completed(futures):
+            trades = future.result()
+            print(f"  -> {futures[future]}: {len(trades)} trades")
+            results.append(trades)
+    trades = pd.concat(results, ignore_index=True).sort_values(['entry_time', 'symbol'], ignore_index=True)
+    print(f"✅ Simulación de {len(available)} símbolos en {time.perf_counter() - started:.1f}s.")
+    if trades.empty:
+        print("No se realizó ninguna operación.")
+        return trades
+
+    for symbol, group in trades.groupby('symbol'):
+        print(f"\n--- 📊 {symbol} ---")
+        stats = performance.analyze(performance.trades_to_array(group), symbol_metadata.get(symbol).point)
+        performance.print_report(stats)
+
+    curve, exposure = portfolio_equity(trades, cfg.BACKTEST_INITIAL_BALANCE, cfg.RISK_PERCENT)
+    equity = curve['equity'].to_numpy()
+    peak = np.maximum.accumulate(np.r_[cfg.BACKTEST_INITIAL_BALANCE, equity])[1:]
+    summary = exposure_summary(exposure)
+    daily = trades.assign(day=trades['exit_time'].dt.floor('D')).pivot_table(
+        index='day', columns='symbol', values='r', aggfunc='sum', fill_value=0.0)
+
+    print(f"\n--- 💼 Cartera (riesgo {cfg.RISK_PERCENT:.2%} por operación) ---")
+    print(f"Operaciones Totales:    {len(trades)}")
+    print(f"Balance Final:          {equity[-1]:.2f}  ({(equity[-1] / cfg.BACKTEST_INITIAL_BALANCE - 1) * 100:.2f}%)")
+    print(f"Drawdown Máximo:        {((peak - equity) / peak).max() * 100:.2f}%")
+    print(f"Posiciones Simultáneas: máx {summary['max_positions']}, media {summary['avg_positions']:.2f}")
+    print(f"Riesgo Abierto Máximo:  {summary['max_open_risk_pct']:.2f}% del balance")
+    for k, share in summary['time_share_pct'].items():
+        print(f"  {k} posiciones abiertas: {share:.1f}% del tiempo")
+    if daily.shape[1] > 1:
+        print("\n--- 🔗 Correlación de resultados diarios (R) ---")
+        print(daily.corr().to_string(float_format=lambda v: f"{v:.2f}"))
+    if output:
+        curve.to_csv(output, index=False)
+        print(f"\n💾 Curva de equity guardada en '{output}'")
+    return trades
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest V4 de cartera sobre varios símbolos en paralelo.")
+    parser.add_argument('--symbols', nargs='+', default=cfg.SYMBOLS)
+    parser.add_argument('--modelo', default=None, help="Aplica el filtro ML con este modelo (.joblib).")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos del pool (por defecto, uno por símbolo)")
+    parser.add_argument('--salida', default=None, help="CSV donde guardar la curva de equity de la cartera.")
+    parser.add_argument('--m1', action='store_true',
+                        help="Resuelve con velas M1 las velas M5 que tocan SL y TP (requiere los CSV M1).")
+    args = parser.parse_args()
+    run_portfolio_backtest(args.symbols, args.modelo, args.workers, args.salida, args.m1)
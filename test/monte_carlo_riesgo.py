@@ -0,0 +1,82 @@
+# monte_carlo_riesgo.py
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+import config as cfg
+import monte_carlo
+import symbol_metadata
+from backtest_engine import FEATURE_COLUMNS, add_v4_indicators, v4_candidates, simulate_v4_trades
+
+# --- PARÁMETROS ---
+DATA_FILE_PATH = "EURUSD_M5_data_1Y.csv"
+SYMBOL = "EURUSD"
+
+def backtest_trades(df, sl_mult, tp_mult, model_path=None):
+    """Trades de la V4 con los parámetros de config (y el filtro ML si se indica un modelo)."""
+    add_v4_indicators(df, cfg.RSI_PERIOD, cfg.MACD_FAST, cfg.MACD_SLOW, cfg.MACD_SIGNAL, cfg.ADX_PERIOD, cfg.ATR_PERIOD)
+    df.dropna(inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    accept = None
+    if model_path:
+        import joblib
+        ml_model = joblib.load(model_path)
+        buy, sell = v4_candidates(df, cfg.ADX_THRESHOLD)
+        candidates = np.flatnonzero(buy | sell)
+        accept = np.zeros(len(df), dtype=bool)
+        if len(candidates):
+            confidence = ml_model.predict_proba(df[FEATURE_COLUMNS].iloc[candidates])[:, 1]
+            accept[candidates] = confidence >= cfg.ML_CONFIDENCE_THRESHOLD
+    # Trailing stop solo si el bot en vivo mueve los SL (LIVE_TRAILING_STOP y TRAILING_STOP_ACTIVE)
+    trailing = None
+    if cfg.LIVE_TRAILING_STOP and cfg.TRAILING_STOP_ACTIVE:
+        trailing = (cfg.TRAILING_STOP_DISTANCE_ATR, cfg.MIN_PROFIT_TO_TRAIL_ATR, cfg.ATR_PERIOD)
+    return simulate_v4_trades(df, cfg.ADX_THRESHOLD, sl_mult, tp_mult, accept=accept, trailing=trailing)
+
+def run_monte_carlo(risk_percents, sl_mult, tp_mult, n_sims, n_trades=None, model_path=None, seed=None,
+                    conversion_rate=None):
+    print(f"🚀 Monte Carlo de riesgo para {SYMBOL} (SL {sl_mult:.2f} ATR / TP {tp_mult:.2f} ATR)...")
+    df = pd.read_csv(DATA_FILE_PATH, parse_dates=['time'])
+    trades = backtest_trades(df, sl_mult, tp_mult, model_path)
+    if trades.empty:
+        print("No se realizó ninguna operación en el backtest.")
+        return
+    meta = symbol_metadata.get(SYMBOL)
+    r = monte_carlo.r_multiples(trades)
+    try:
+        risk_per_lot = monte_carlo.loss_per_lot(trades, meta, cfg.BACKTEST_ACCOUNT_CURRENCY, conversion_rate)
+    except ValueError as e:
+        print(f"❌ {e} (usa --conversion).")
+        return
+    print(f"✅ {len(trades)} trades del backtest (R medio {r.mean():.3f}, acierto {(r > 0).mean():.2%}).")
+
+    for risk_percent in risk_percents:
+        started = time.perf_counter()
+        results = monte_carlo.simulate(r, risk_per_lot, meta, risk_percent, cfg.BACKTEST_INITIAL_BALANCE, n_sims,
+                                       n_trades, cfg.MC_RUIN_LEVEL, cfg.MC_CHUNK_SIMS, seed)
+        table, ruin = monte_carlo.summarize(results, cfg.BACKTEST_INITIAL_BALANCE)
+        print(f"\n--- 🎲 Riesgo {risk_percent:.2%} por operación: {n_sims} simulaciones de "
+              f"{n_trades or len(r)} trades ({time.perf_counter() - started:.1f}s) ---")
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+        print(f"Probabilidad de ruina (balance < {cfg.MC_RUIN_LEVEL:.0%} del inicial): {ruin:.2%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo de drawdown y ruina sobre los trades del backtest V4.")
+    parser.add_argument('--riesgo', nargs='+', type=float, default=[cfg.RISK_PERCENT],
+                        help="Uno o varios RISK_PERCENT a comparar (fracción: 0.005 = 0.5%%).")
+    parser.add_argument('--sl', type=float, default=cfg.SL_ATR_MULT, help="Multiplicador ATR del SL.")
+    parser.add_argument('--tp', type=float, default=cfg.TP_ATR_MULT, help="Multiplicador ATR del TP.")
+    parser.add_argument('--sims', type=int, default=cfg.MC_SIMULATIONS)
+    parser.add_argument('--trades', type=int, default=None,
+                        help="Trades por simulación (por defecto, los del backtest).")
+    parser.add_argument('--modelo', default=None, help="Aplica el filtro ML con este modelo (.joblib).")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--conversion', type=float, default=None,
+                        help="Precio de <divisa de margen><divisa de la cuenta> si el símbolo es un cruce.")
+    args = parser.parse_args()
+    run_monte_carlo(args.riesgo, args.sl, args.tp, args.sims, args.trades, args.modelo, args.seed, args.conversion)
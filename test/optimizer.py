@@ -2,15 +2,41 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # optimizer.py
+import argparse
 import pandas as pd
 import numpy as np
 import optuna
-import MetaTrader5 as mt5
+
+import result_cache
+from backtest_engine import add_v4_indicators, simulate_v4_trades
 
 # --- CONFIGURACIÓN ---
 DATA_FILE_PATH = "EURUSD_5_data_1Y.csv"
 SYMBOL_FOR_INFO = "EURUSD"
 N_TRIALS = 100 # Número de combinaciones a probar. Empieza con 50-100.
+ATR_PERIOD = 14 # Fijo para no complicar demasiado (SL/TP y trailing stop)
+OPTIMIZE_TRAILING = False # Con --trailing también se optimizan la distancia y el beneficio mínimo del trailing stop
+
+USE_CACHE = True # Con --sin-cache se recalculan también las combinaciones ya evaluadas
+# Código del que depende el resultado de un trial (forma parte de la clave de la caché)
+CODE_FILES = (os.path.abspath(__file__), os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backtest_engine.py')))
+
+_data = None
+_data_fingerprint = None
+_cache = None
+
+def load_data():
+    global _data, _data_fingerprint
+    if _data is None:
+        _data = pd.read_csv(DATA_FILE_PATH, parse_dates=['time'])
+        _data_fingerprint = result_cache.fingerprint_frame(_data)
+    return _data
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = result_cache.ResultCache()
+    return _cache
 
 def objective(trial):
     """
@@ -29,112 +55,76 @@ def objective(trial):
     sl_mult = trial.suggest_float('sl_mult', 1.5, 3.0)
     tp_mult = trial.suggest_float('tp_mult', 2.5, 6.0)
 
-    # 2. Cargamos los datos
-    df = pd.read_csv(DATA_FILE_PATH, parse_dates=['time'])
+    trailing = None
+    if OPTIMIZE_TRAILING:
+        trailing = (trial.suggest_float('trailing_distance_atr', 0.5, 3.0),
+                    trial.suggest_float('min_profit_to_trail_atr', 0.0, 2.0), ATR_PERIOD)
 
-    # 3. Calculamos los indicadores con los parámetros del 'trial' actual
-    # MACD
-    ema_fast = df['close'].ewm(span=macd_fast, adjust=False).mean()
-    ema_slow = df['close'].ewm(span=macd_slow, adjust=False).mean()
-    df['macd_line'] = ema_fast - ema_slow
-    df['macd_signal'] = df['macd_line'].ewm(span=macd_signal, adjust=False).mean()
-    df['macd_hist'] = df['macd_line'] - df['macd_signal']
-    df['macd_hist_prev'] = df['macd_hist'].shift(1)
-
-    # RSI
-    delta = df['close'].diff(1)
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.ewm(span=rsi_period, adjust=False).mean()
-    avg_loss = loss.ewm(span=rsi_period, adjust=False).mean()
-    rs = avg_gain / avg_loss
-    df['rsi'] = 100 - (100 / (1 + rs))
-
-    # ATR (usamos un periodo fijo para no complicar demasiado)
-    high_low = df['high'] - df['low']
-    high_prev_close = abs(df['high'] - df['close'].shift())
-    low_prev_close = abs(df['low'] - df['close'].shift())
-    tr = pd.concat([high_low, high_prev_close, low_prev_close], axis=1).max(axis=1)
-    df['atr'] = tr.ewm(span=14, adjust=False).mean()
-
-    # ADX
-    plus_dm = df['high'].diff()
-    minus_dm = df['low'].diff()
-    plus_dm[plus_dm < 0] = 0
-    minus_dm[minus_dm > 0] = 0
-    tr_adx = pd.DataFrame({'tr': tr, 'plus_dm': plus_dm, 'minus_dm': abs(minus_dm)})
-    atr_adx = tr_adx['tr'].ewm(span=adx_period, adjust=False).mean()
-    plus_di = 100 * (tr_adx['plus_dm'].ewm(span=adx_period, adjust=False).mean() / atr_adx)
-    minus_di = 100 * (tr_adx['minus_dm'].ewm(span=adx_period, adjust=False).mean() / atr_adx)
-    dx = 100 * (abs(plus_di - minus_di) / (plus_di + minus_di))
-    df['adx'] = dx.ewm(span=adx_period, adjust=False).mean()
+    # 2. Cargamos los datos (una sola vez para todo el estudio)
+    data = load_data()
 
+    # Optuna puede volver a sugerir una combinación ya evaluada (en este estudio o en uno anterior)
+    key = result_cache.make_key('optimizer_profit_factor', _data_fingerprint, trial.params, code_paths=CODE_FILES)
+    if USE_CACHE:
+        cached = get_cache().get(key)
+        if cached is not None:
+            return cached
+    df = data.copy()
+
+    # 3. Calculamos los indicadores con los parámetros del 'trial' actual
+    # (ATR con un periodo fijo para no complicar demasiado)
+    add_v4_indicators(df, rsi_period, macd_fast, macd_slow, macd_signal, adx_period, ATR_PERIOD)
     df.dropna(inplace=True)
+    df.reset_index(drop=True, inplace=True)
 
-    # 4. Ejecutamos la simulación (lógica de la V4)
-    trades = []
-    open_trade = None
-
-    for i in range(len(df)):
-        current_row = df.iloc[i]
-
-        if open_trade:
-            if (open_trade['type'] == 'BUY' and current_row['low'] <= open_trade['sl']) or \
-               (open_trade['type'] == 'SELL' and current_row['high'] >= open_trade['sl']):
-                open_trade.update({'exit_price': open_trade['sl'], 'exit_time': current_row['time']})
-                trades.append(open_trade)
-                open_trade = None
-                continue
-
-            if (open_trade['type'] == 'BUY' and current_row['high'] >= open_trade['tp']) or \
-               (open_trade['type'] == 'SELL' and current_row['low'] <= open_trade['tp']):
-                open_trade.update({'exit_price': open_trade['tp'], 'exit_time': current_row['time']})
-                trades.append(open_trade)
-                open_trade = None
-                continue
-
-        if not open_trade:
-            buy_condition = (current_row['adx'] > adx_threshold and current_row['macd_hist'] > 0 and
-                             current_row['macd_hist_prev'] < 0 and current_row['rsi'] > 50)
-            sell_condition = (current_row['adx'] > adx_threshold and current_row['macd_hist'] < 0 and
-                              current_row['macd_hist_prev'] > 0 and current_row['rsi'] < 50)
-
-            if buy_condition or sell_condition:
-                signal = "BUY" if buy_condition else "SELL"
-                entry_price = current_row['open']
-                atr_val = current_row['atr']
-                sl = entry_price - atr_val * sl_mult if signal == "BUY" else entry_price + atr_val * sl_mult
-                tp = entry_price + atr_val * tp_mult if signal == "BUY" else entry_price - atr_val * tp_mult
-                open_trade = {'type': signal, 'entry_price': entry_price, 'sl': sl, 'tp': tp, 'entry_time': current_row['time']}
+    # 4. Ejecutamos la simulación (lógica de la V4) con el motor vectorizado
+    trades = simulate_v4_trades(df, adx_threshold, sl_mult, tp_mult, trailing=trailing)
 
     # 5. Calculamos y devolvemos el resultado a optimizar (Profit Factor)
-    if not trades:
+    profit_factor = profit_factor_of(trades)
+    if USE_CACHE:
+        get_cache().put(key, profit_factor)
+    return profit_factor
+
+def profit_factor_of(trades):
+    """Profit factor (en precio) de los trades del motor."""
+    if trades.empty:
         return 0.0 # Si no hay trades, el PF es 0
 
-    df_trades = pd.DataFrame(trades)
-    df_trades['profit'] = (df_trades['exit_price'] - df_trades['entry_price']) * np.where(df_trades['type'] == 'BUY', 1, -1)
+    profit = (trades['exit_price'] - trades['entry_price']) * np.where(trades['type'] == 'BUY', 1, -1)
 
-    gross_profit = df_trades[df_trades['profit'] > 0]['profit'].sum()
-    gross_loss = abs(df_trades[df_trades['profit'] <= 0]['profit'].sum())
+    gross_profit = profit[profit > 0].sum()
+    gross_loss = abs(profit[profit <= 0].sum())
 
     if gross_loss == 0:
         return float('inf') # Evitar división por cero
 
-    profit_factor = gross_profit / gross_loss
-    return profit_factor
+    return float(gross_profit / gross_loss)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimización de la V4 con Optuna.")
+    parser.add_argument('--trials', type=int, default=N_TRIALS)
+    parser.add_argument('--trailing', action='store_true',
+                        help="Simula el trailing stop del bot y optimiza también sus parámetros.")
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="No reutiliza resultados de combinaciones ya evaluadas.")
+    args = parser.parse_args()
+    OPTIMIZE_TRAILING = args.trailing
+    USE_CACHE = not args.sin_cache
+
     # Creamos el "estudio" de optimización
     # Le decimos que queremos maximizar el resultado de la función 'objective'
     study = optuna.create_study(direction="maximize")
 
     # Lanzamos la optimización
-    study.optimize(objective, n_trials=N_TRIALS)
+    study.optimize(objective, n_trials=args.trials)
 
     # Imprimimos los resultados
     print("\n" + "="*50)
     print("OPTIMIZACIÓN FINALIZADA")
     print(f"Mejor Profit Factor encontrado: {study.best_value:.4f}")
+    if USE_CACHE:
+        print(f"Trials servidos desde la caché: {get_cache().hits} de {len(study.trials)}")
     print("Mejores Parámetros:")
     for key, value in study.best_params.items():
         print(f"  - {key}: {value}")